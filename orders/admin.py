@@ -1,5 +1,26 @@
-from django.contrib import admin
-from .models import Order, OrderItem, DeliveryAddress
+from django import forms
+from django.contrib import admin, messages
+from django.db import transaction
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, DeliveryAddress
+from .tasks import send_order_status_emails
+
+
+def make_status_action(new_status, label):
+    """Действие админки: массовый перевод выбранных заказов в new_status"""
+    def action(modeladmin, request, queryset):
+        updated, skipped = Order.bulk_transition(list(queryset.values_list('id', flat=True)), new_status)
+        if updated:
+            transaction.on_commit(lambda: send_order_status_emails.delay(updated, new_status))
+            modeladmin.message_user(request, f'Статус изменен: {len(updated)}')
+        if skipped:
+            modeladmin.message_user(
+                request,
+                f'Пропущено (переход недопустим): {len(skipped)}',
+                level=messages.WARNING
+            )
+    action.__name__ = f'mark_{new_status}'
+    action.short_description = f'Перевести в статус «{label}»'
+    return action
 
 
 class OrderItemInline(admin.TabularInline):
@@ -15,16 +36,45 @@ class OrderItemInline(admin.TabularInline):
     get_total.short_description = 'Итого'
 
 
+class OrderAdminForm(forms.ModelForm):
+    """Форма заказа: статус меняется только по Order.STATUS_TRANSITIONS"""
+    
+    class Meta:
+        model = Order
+        fields = '__all__'
+    
+    def clean_status(self):
+        new_status = self.cleaned_data['status']
+        if not self.instance.pk:
+            # Корзину подтверждает только оформление заказа со списанием остатков
+            if new_status != 'pending':
+                raise forms.ValidationError('Новый заказ создается в статусе «Ожидает подтверждения»')
+            return new_status
+        current = Order.objects.filter(pk=self.instance.pk).values_list('status', flat=True).first()
+        if current is not None and new_status != current and new_status not in Order.STATUS_TRANSITIONS[current]:
+            raise forms.ValidationError(
+                f'Переход из статуса «{dict(Order.STATUS_CHOICES)[current]}» '
+                f'в «{dict(Order.STATUS_CHOICES)[new_status]}» недопустим'
+            )
+        return new_status
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     list_display = ('id', 'user', 'status', 'total_amount', 'get_items_count', 'created_at', 'confirmed_at')
     list_filter = ('status', 'created_at', 'confirmed_at')
     search_fields = ('user__email', 'user__username', 'id')
-    readonly_fields = ('total_amount', 'created_at', 'updated_at', 'confirmed_at')
+    readonly_fields = ('total_amount', 'stock_reserved', 'created_at', 'updated_at', 'confirmed_at')
     inlines = [OrderItemInline]
+    actions = [
+        make_status_action(status, label)
+        for status, label in Order.STATUS_CHOICES
+        if any(status in targets for targets in Order.STATUS_TRANSITIONS.values())
+    ]
     fieldsets = (
         ('Основная информация', {
-            'fields': ('user', 'status', 'delivery_address')
+            'fields': ('user', 'status', 'delivery_address', 'stock_reserved')
         }),
         ('Сумма', {
             'fields': ('total_amount',)
@@ -37,6 +87,35 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        new_status = obj.status
+        if not change or 'status' not in form.changed_data:
+            super().save_model(request, obj, form, change)
+            return
+        
+        # Статус меняется через Order.bulk_transition: переход повторно проверяется
+        # под блокировкой строки, при отмене остатки возвращаются один раз
+        obj.status = form.initial['status']
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            updated, skipped = Order.bulk_transition([obj.pk], new_status)
+        if updated:
+            transaction.on_commit(lambda: send_order_status_emails.delay(updated, new_status))
+        else:
+            self.message_user(
+                request,
+                f'Статус не изменен: переход из «{skipped.get(obj.pk)}» в «{new_status}» недопустим',
+                level=messages.ERROR
+            )
+        obj.refresh_from_db(fields=['status', 'stock_reserved', 'updated_at'])
+        obj._loaded_status = obj.status
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Сверяем сумму заказа после изменения позиций в инлайне
+        form.instance.calculate_total()
+        form.instance.save(update_fields=['total_amount', 'updated_at'])
+    
     def get_items_count(self, obj):
         return obj.get_items_count()
     get_items_count.short_description = 'Позиций'
@@ -71,3 +150,29 @@ class DeliveryAddressAdmin(admin.ModelAdmin):
             'fields': ('created_at',)
         }),
     )
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    fields = ('product', 'product_name', 'sku', 'store', 'quantity', 'price', 'created_at')
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Архив только для просмотра: заказы попадают сюда через orders/archive.py"""
+    list_display = ('id', 'user', 'status', 'total_amount', 'created_at', 'archive_month', 'archived_at')
+    list_filter = ('status', 'archive_month')
+    search_fields = ('user__email', 'user__username', 'id')
+    inlines = [ArchivedOrderItemInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,98 @@
+"""
+Перенос старых закрытых заказов в архивные таблицы
+
+Доставленные и отмененные заказы, созданные раньше ORDER_ARCHIVE_AFTER_DAYS
+дней назад, переносятся из orders_order / orders_orderitem в
+orders_archivedorder / orders_archivedorderitem. Рабочие таблицы и их
+индексы (в том числе (status, created_at)) перестают расти с возрастом
+магазина, а история заказов покупателя читает обе таблицы (см. OrderViewSet).
+
+Перенос идет пакетами по ORDER_ARCHIVE_BATCH_SIZE заказов, каждый пакет -
+отдельная короткая транзакция: копирование bulk_create и удаление исходных
+строк. Периодическая задача orders.tasks.archive_orders переносит за запуск
+не больше ORDER_ARCHIVE_MAX_BATCHES пакетов.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .rollups import moving_to_archive
+
+# Статусы, после которых заказ больше не меняется
+CLOSED_STATUSES = ('delivered', 'cancelled')
+
+
+def archive_batch(cutoff, batch_size) -> int:
+    """
+    Переносит в архив один пакет закрытых заказов, созданных до cutoff
+
+    Returns:
+        int: Количество перенесенных заказов
+    """
+    with transaction.atomic():
+        # skip_locked: заказы, которые сейчас меняются, перенесет следующий запуск
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status__in=CLOSED_STATUSES, created_at__lt=cutoff)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        orders = Order.objects.filter(id__in=order_ids).values(
+            'id', 'user_id', 'delivery_address_id', 'status', 'total_amount', 'notes',
+            'created_at', 'updated_at', 'confirmed_at',
+        )
+        # Месяц создания - в часовом поясе магазина, как и даты в отчетах
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(archive_month=timezone.localdate(order['created_at']).replace(day=1), **order)
+            for order in orders
+        ])
+        items = OrderItem.objects.filter(order_id__in=order_ids).values(
+            'id', 'order_id', 'product_id', 'store_id', 'product__store_id', 'product__name',
+            'product__sku', 'quantity', 'price', 'status', 'created_at',
+        )
+        ArchivedOrderItem.objects.bulk_create(
+            [
+                ArchivedOrderItem(
+                    id=item['id'], order_id=item['order_id'], product_id=item['product_id'],
+                    store_id=item['store_id'] or item['product__store_id'], product_name=item['product__name'],
+                    sku=item['product__sku'], quantity=item['quantity'], price=item['price'],
+                    status=item['status'], created_at=item['created_at'],
+                )
+                for item in items
+            ],
+            batch_size=1000
+        )
+
+        # Сумма архивного заказа уже сохранена; у позиций нет сигналов удаления,
+        # поэтому каскад удаляет их одним DELETE без загрузки объектов.
+        # Сводки продаж учитывают архив - дни перенесенных заказов не отмечаются
+        with moving_to_archive():
+            Order.objects.filter(id__in=order_ids).delete()
+    return len(order_ids)
+
+
+def archive_closed_orders(older_than_days=None, batch_size=None, max_batches=None) -> int:
+    """
+    Переносит закрытые заказы старше older_than_days дней пакетами
+
+    Returns:
+        int: Количество перенесенных заказов
+    """
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+    return archived
@@ -0,0 +1,440 @@
+"""
+Хранилища корзин для CartViewSet
+
+CART_BACKEND выбирает, где живет корзина до оформления заказа:
+    database - заказ со статусом pending и его позиции (по умолчанию)
+    redis    - хэш в Redis, заказ создается только при оформлении
+    local    - то же, что redis, но в памяти процесса (разработка, один процесс)
+
+В Redis корзина пользователя - хэш cart:<user_id> с полями
+q:<product_id> (количество), p:<product_id> (цена на момент добавления)
+и t:<product_id> (время добавления). Ключ истекает через CART_TTL секунд
+после последнего изменения. ID позиции корзины в этом режиме - ID товара.
+
+Корзины в БД, не менявшиеся дольше CART_TTL секунд, удаляет
+purge_abandoned_carts (периодическая задача orders.tasks.purge_abandoned_carts
+и команда purge_carts) - так же, как истекают корзины в Redis.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import lru_cache
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from products.models import Product
+from .models import Order, OrderItem
+
+
+class Cart:
+    """Содержимое корзины: позиции (OrderItem, возможно несохраненные) и сумма"""
+
+    def __init__(self, order_id, items, total_amount=None):
+        self.order_id = order_id
+        self.items = items
+        if total_amount is None:
+            total_amount = sum((item.get_total() for item in items), Decimal('0.00'))
+        self.total_amount = total_amount
+
+
+class DatabaseCartStore:
+    """Корзина - заказ со статусом pending"""
+
+    def get_order(self, user):
+        """Получает или создает корзину (заказ со статусом pending)"""
+        order, created = Order.objects.get_or_create(
+            user=user,
+            status='pending',
+            defaults={'total_amount': 0}
+        )
+        return order
+
+    def get_cart(self, user):
+        order = self.get_order(user)
+        items = list(order.items.select_related('product__store'))
+        return Cart(order.id, items, order.total_amount)
+
+    def add(self, user, product, quantity):
+        """
+        Добавляет товар; новая позиция меняет сумму заказа в OrderItem.save
+
+        Количество существующей позиции увеличивается F-выражением, сумма заказа -
+        на цену позиции * quantity в той же транзакции: параллельные добавления
+        не теряют ни количество, ни сумму.
+        """
+        with transaction.atomic():
+            order = self.get_order(user)
+            order_item, created = OrderItem.objects.get_or_create(
+                order=order,
+                product=product,
+                defaults={'quantity': quantity, 'price': product.price}
+            )
+            if not created:
+                OrderItem.objects.filter(pk=order_item.pk).update(quantity=F('quantity') + quantity)
+                Order.increment_total(order.id, order_item.price * quantity)
+                order_item.refresh_from_db(fields=['quantity'])
+                order_item._saved_total = order_item.get_total()
+        return order_item
+
+    def remove(self, user, item_id):
+        """Удаляет позицию; возвращает False, если ее нет в корзине"""
+        with transaction.atomic():
+            order = self.get_order(user)
+            try:
+                # Блокировка: параллельное добавление не изменит количество между чтением и удалением
+                order_item = OrderItem.objects.select_for_update().get(id=item_id, order=order)
+            except (OrderItem.DoesNotExist, ValueError, TypeError):
+                return False
+            # Сумма заказа уменьшается на сумму позиции в OrderItem.delete
+            order_item.delete()
+        return True
+
+    def add_many(self, user, quantities, prices):
+        """
+        Добавляет много товаров пакетными запросами
+
+        Args:
+            quantities: {product_id: количество}
+            prices: {product_id: цена} для новых позиций
+
+        Returns:
+            Cart: корзина с ID заказа и суммой (без позиций)
+        """
+        with transaction.atomic():
+            order = self.get_order(user)
+            existing = {
+                item.product_id: item
+                for item in order.items.filter(product_id__in=quantities)
+            }
+            for product_id, item in existing.items():
+                item.quantity += quantities[product_id]
+            OrderItem.objects.bulk_update(existing.values(), ['quantity'])
+            OrderItem.objects.bulk_create(self.build_items(order, {
+                product_id: quantity for product_id, quantity in quantities.items()
+                if product_id not in existing
+            }, prices))
+            order.calculate_total()
+            order.save(update_fields=['total_amount', 'updated_at'])
+        return Cart(order.id, [], order.total_amount)
+
+    def get_quantities(self, user):
+        """Возвращает {product_id: количество} одним запросом"""
+        return dict(
+            OrderItem.objects.filter(order__user=user, order__status='pending')
+            .values_list('product_id', 'quantity')
+        )
+
+    def set_quantities(self, user, quantities, prices):
+        """
+        Устанавливает количества позиций пакетными запросами в одной транзакции
+
+        Args:
+            quantities: {product_id: новое количество}; 0 - удалить позицию
+            prices: {product_id: цена} для новых позиций
+
+        Returns:
+            Cart: корзина с ID заказа и суммой (без позиций)
+        """
+        with transaction.atomic():
+            order = self.get_order(user)
+            existing = {
+                item.product_id: item
+                for item in order.items.filter(product_id__in=quantities)
+            }
+            removed = [product_id for product_id, quantity in quantities.items() if not quantity]
+            if removed:
+                order.items.filter(product_id__in=removed).delete()
+            updated = []
+            for product_id, item in existing.items():
+                if quantities[product_id] and quantities[product_id] != item.quantity:
+                    item.quantity = quantities[product_id]
+                    updated.append(item)
+            OrderItem.objects.bulk_update(updated, ['quantity'])
+            OrderItem.objects.bulk_create(self.build_items(order, {
+                product_id: quantity for product_id, quantity in quantities.items()
+                if quantity and product_id not in existing
+            }, prices))
+            # Сумма пересчитывается один раз на весь пакет
+            order.calculate_total()
+            order.save(update_fields=['total_amount', 'updated_at'])
+        return Cart(order.id, [], order.total_amount)
+
+    def persist(self, user, cart):
+        """Возвращает заказ корзины для оформления"""
+        return Order.objects.get(pk=cart.order_id)
+
+    @staticmethod
+    def build_items(order, quantities, prices):
+        """Новые позиции для bulk_create; магазины товаров читаются одним запросом"""
+        if not quantities:
+            return []
+        stores = dict(Product.objects.filter(id__in=list(quantities)).values_list('id', 'store_id'))
+        return [
+            OrderItem(
+                order=order, product_id=product_id, store_id=stores.get(product_id),
+                status=order.status, quantity=quantity, price=prices[product_id],
+            )
+            for product_id, quantity in quantities.items()
+        ]
+
+
+def purge_abandoned_carts(idle_seconds=None, batch_size=None, pause=None, max_batches=None):
+    """
+    Удаляет корзины в БД (заказы pending), не менявшиеся дольше idle_seconds
+
+    Корзины выбираются пакетами по batch_size в порядке (updated_at, id) от
+    последнего обработанного ключа, каждый пакет удаляется в своей короткой
+    транзакции; между пакетами - пауза pause секунд, чтобы не мешать
+    оформлению заказов. Корзина, которую меняют прямо сейчас (строка
+    заблокирована), пропускается.
+
+    Returns:
+        Dict: {'carts': удалено корзин, 'items': удалено позиций, 'batches': пакетов}
+    """
+    if idle_seconds is None:
+        idle_seconds = settings.CART_TTL
+    batch_size = batch_size or settings.CART_GC_BATCH_SIZE
+    if pause is None:
+        pause = settings.CART_GC_PAUSE
+    cutoff = timezone.now() - timedelta(seconds=idle_seconds)
+
+    idle = Order.objects.filter(status='pending', updated_at__lt=cutoff)
+    result = {'carts': 0, 'items': 0, 'batches': 0}
+    last = None
+    while max_batches is None or result['batches'] < max_batches:
+        if result['batches'] and pause:
+            time.sleep(pause)
+        queryset = idle
+        if last is not None:
+            queryset = queryset.filter(
+                Q(updated_at__gt=last[0]) | Q(updated_at=last[0], id__gt=last[1])
+            )
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True)
+                .order_by('updated_at', 'id')
+                .values_list('updated_at', 'id')[:batch_size]
+            )
+            if not rows:
+                break
+            last = rows[-1]
+            # Выбранные корзины заблокированы до конца транзакции. У позиций нет
+            # сигналов удаления - каскад удаляет их одним DELETE без загрузки
+            _, deleted = Order.objects.filter(id__in=[order_id for _, order_id in rows]).delete()
+        result['carts'] += deleted.get(Order._meta.label, 0)
+        result['items'] += deleted.get(OrderItem._meta.label, 0)
+        result['batches'] += 1
+        if len(rows) < batch_size:
+            break
+    return result
+
+
+class RedisCartStore:
+    """Корзина в хэше Redis; в БД записывается только при оформлении заказа"""
+
+    def __init__(self, client, ttl):
+        self.client = client
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user):
+        return f'cart:{user.pk}'
+
+    def read_lines(self, user):
+        """Возвращает {product_id: (количество, цена, время добавления)}"""
+        data = self.client.hgetall(self.key(user))
+        lines = {}
+        for field, value in data.items():
+            kind, product_id = field.split(':', 1)
+            lines.setdefault(int(product_id), {})[kind] = value
+        return {
+            product_id: (
+                int(line['q']),
+                Decimal(line['p']),
+                datetime.fromtimestamp(float(line['t']), tz=dt_timezone.utc),
+            )
+            for product_id, line in lines.items()
+            if {'q', 'p', 't'} <= line.keys()
+        }
+
+    def get_cart(self, user):
+        lines = self.read_lines(user)
+        products = Product.objects.select_related('store').in_bulk(lines)
+        items = [
+            OrderItem(
+                id=product_id, product=products[product_id],
+                quantity=quantity, price=price, created_at=created_at,
+            )
+            for product_id, (quantity, price, created_at) in sorted(
+                lines.items(), key=lambda line: line[1][2]
+            )
+            if product_id in products
+        ]
+        return Cart(None, items)
+
+    def add(self, user, product, quantity):
+        item = self.add_many(user, {product.id: quantity}, {product.id: product.price}).items[0]
+        item.product = product
+        return item
+
+    def add_many(self, user, quantities, prices):
+        """Добавляет товары одним пайплайном; возвращает добавленные позиции и сумму корзины"""
+        key = self.key(user)
+        now = str(time.time())
+        pipeline = self.client.pipeline()
+        for product_id, quantity in quantities.items():
+            pipeline.hincrby(key, f'q:{product_id}', quantity)
+            # Цена фиксируется при первом добавлении товара, как в OrderItem
+            pipeline.hsetnx(key, f'p:{product_id}', str(prices[product_id]))
+            pipeline.hsetnx(key, f't:{product_id}', now)
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+        lines = self.read_lines(user)
+        items = [
+            OrderItem(id=product_id, product_id=product_id, quantity=quantity, price=price, created_at=created_at)
+            for product_id, (quantity, price, created_at) in lines.items()
+            if product_id in quantities
+        ]
+        total_amount = sum(
+            (price * quantity for quantity, price, _ in lines.values()), Decimal('0.00')
+        )
+        return Cart(None, items, total_amount)
+
+    def get_quantities(self, user):
+        return {
+            product_id: quantity
+            for product_id, (quantity, _, _) in self.read_lines(user).items()
+        }
+
+    def set_quantities(self, user, quantities, prices):
+        """Устанавливает количества одним пайплайном; 0 - удалить позицию"""
+        key = self.key(user)
+        now = str(time.time())
+        pipeline = self.client.pipeline()
+        for product_id, quantity in quantities.items():
+            if quantity:
+                pipeline.hset(key, f'q:{product_id}', quantity)
+                pipeline.hsetnx(key, f'p:{product_id}', str(prices[product_id]))
+                pipeline.hsetnx(key, f't:{product_id}', now)
+            else:
+                pipeline.hdel(key, f'q:{product_id}', f'p:{product_id}', f't:{product_id}')
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+        total_amount = sum(
+            (price * quantity for quantity, price, _ in self.read_lines(user).values()),
+            Decimal('0.00')
+        )
+        return Cart(None, [], total_amount)
+
+    def remove(self, user, item_id):
+        key = self.key(user)
+        removed = self.client.hdel(key, f'q:{item_id}', f'p:{item_id}', f't:{item_id}')
+        return bool(removed)
+
+    def persist(self, user, cart):
+        """
+        Создает заказ и все позиции корзины пакетно в текущей транзакции;
+        корзина в Redis очищается после коммита
+        """
+        order = Order.objects.create(
+            user=user,
+            status='pending',
+            total_amount=cart.total_amount,
+        )
+        items = [
+            OrderItem(
+                order=order, product=item.product, store_id=item.product.store_id,
+                status=order.status, quantity=item.quantity, price=item.price,
+            )
+            for item in cart.items
+        ]
+        OrderItem.objects.bulk_create(items)
+        transaction.on_commit(lambda: self.client.delete(self.key(user)))
+        return order
+
+
+class LocalCartClient:
+    """Минимальная замена клиента Redis в памяти процесса (хэши с истечением)"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _hash(self, key):
+        if key in self.expires and self.expires[key] < time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.setdefault(key, {})
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self._hash(key))
+
+    def hincrby(self, key, field, amount):
+        with self.lock:
+            values = self._hash(key)
+            values[field] = str(int(values.get(field, 0)) + amount)
+            return int(values[field])
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self._hash(key)[field] = str(value)
+            return 1
+
+    def hsetnx(self, key, field, value):
+        with self.lock:
+            values = self._hash(key)
+            if field in values:
+                return 0
+            values[field] = value
+            return 1
+
+    def hdel(self, key, *fields):
+        with self.lock:
+            values = self._hash(key)
+            return sum(values.pop(field, None) is not None for field in fields)
+
+    def expire(self, key, seconds):
+        with self.lock:
+            self.expires[key] = time.monotonic() + seconds
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((getattr(self.client, name), args))
+            return self
+        return command
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [method(*args) for method, args in commands]
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    """Возвращает хранилище корзин по настройке CART_BACKEND"""
+    if settings.CART_BACKEND == 'redis':
+        client = redis.Redis.from_url(settings.CART_REDIS_URL, decode_responses=True)
+        return RedisCartStore(client, settings.CART_TTL)
+    if settings.CART_BACKEND == 'local':
+        return RedisCartStore(LocalCartClient(), settings.CART_TTL)
+    return DatabaseCartStore()
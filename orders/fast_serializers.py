@@ -0,0 +1,230 @@
+"""
+Облегченная сериализация заказов для списковых эндпоинтов
+
+Заказы, позиции, адреса и товары читаются через .values() фиксированным
+числом запросов на страницу. Результат совпадает с выводом OrderSerializer.
+OrderSummarySerializer отдает краткую сводку заказа без позиций для истории.
+Архивные заказы (orders/archive.py) рендерятся FastArchivedOrderSerializer
+в том же формате с дополнительным признаком archived.
+"""
+from products.fast_serializers import (
+    FastProductSerializer, make_datetime_converter, make_decimal_converter,
+)
+from django.db.models import Count
+from .models import ArchivedOrderItem, DeliveryAddress, Order, OrderItem
+
+
+class FastDeliveryAddressSerializer:
+    """Облегченный аналог DeliveryAddressSerializer для чтения"""
+
+    fields = (
+        'id', 'user_id', 'city', 'street', 'house', 'apartment',
+        'postal_code', 'is_default', 'created_at',
+    )
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.to_datetime = make_datetime_converter()
+
+    def load(self, address_ids):
+        address_ids = {address_id for address_id in address_ids if address_id}
+        if not address_ids:
+            return {}
+        rows = DeliveryAddress.objects.filter(id__in=address_ids).values(*self.fields)
+        return {row['id']: self.render_row(row) for row in rows}
+
+    def render_row(self, row):
+        return {
+            'id': row['id'],
+            'user': row['user_id'],
+            'city': row['city'],
+            'street': row['street'],
+            'house': row['house'],
+            'apartment': row['apartment'],
+            'postal_code': row['postal_code'],
+            'is_default': row['is_default'],
+            'created_at': self.to_datetime(row['created_at']),
+            'full_address': DeliveryAddress(**row).get_full_address(),
+        }
+
+
+class FastOrderItemSerializer:
+    """Облегченный аналог OrderItemSerializer для чтения"""
+
+    model = OrderItem
+    fields = ('id', 'order_id', 'product_id', 'quantity', 'price', 'created_at')
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.product_serializer = FastProductSerializer(context=self.context)
+        self.to_decimal = make_decimal_converter(OrderItem, 'price')
+        self.to_datetime = make_datetime_converter()
+
+    def load(self, order_ids):
+        """Возвращает словарь {order_id: [позиции]} для указанных заказов"""
+        rows = list(
+            self.model.objects.filter(order_id__in=set(order_ids))
+            .order_by('id')
+            .values(*self.fields)
+        )
+        products = self.product_serializer.load(row['product_id'] for row in rows)
+        items = {}
+        for row in rows:
+            items.setdefault(row['order_id'], []).append(
+                self.render_row(row, products.get(row['product_id']))
+            )
+        return items
+
+    def render_row(self, row, product):
+        return {
+            'id': row['id'],
+            'product': product,
+            'quantity': row['quantity'],
+            'price': self.to_decimal(row['price']),
+            'created_at': self.to_datetime(row['created_at']),
+            # OrderItemSerializer отдает total как Decimal без приведения к строке
+            'total': row['price'] * row['quantity'],
+        }
+
+
+class FastOrderSerializer:
+    """
+    Облегченный аналог OrderSerializer для чтения
+
+    Страница заказов сериализуется за пять запросов независимо от числа
+    заказов и позиций: заказы, позиции, товары, магазины (+ счетчики), адреса.
+    """
+
+    fields = (
+        'id', 'user_id', 'delivery_address_id', 'status', 'total_amount',
+        'notes', 'created_at', 'updated_at', 'confirmed_at',
+    )
+
+    item_serializer_class = FastOrderItemSerializer
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.item_serializer = self.item_serializer_class(context=self.context)
+        self.address_serializer = FastDeliveryAddressSerializer(context=self.context)
+        self.to_decimal = make_decimal_converter(Order, 'total_amount')
+        self.to_datetime = make_datetime_converter()
+        self.status_display = dict(Order.STATUS_CHOICES)
+
+    def prepare_queryset(self, queryset):
+        """Переводит queryset на чтение только нужных колонок"""
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def render(self, rows):
+        rows = list(rows)
+        items = self.item_serializer.load(row['id'] for row in rows)
+        addresses = self.address_serializer.load(
+            row['delivery_address_id'] for row in rows
+        )
+        return [
+            self.render_row(
+                row,
+                items.get(row['id'], []),
+                addresses.get(row['delivery_address_id']),
+            )
+            for row in rows
+        ]
+
+    def render_row(self, row, items, delivery_address):
+        to_datetime = self.to_datetime
+        return {
+            'id': row['id'],
+            'user': row['user_id'],
+            'delivery_address': delivery_address,
+            'status': row['status'],
+            'status_display': self.status_display.get(row['status'], row['status']),
+            'total_amount': self.to_decimal(row['total_amount']),
+            'items': items,
+            'notes': row['notes'],
+            'created_at': to_datetime(row['created_at']),
+            'updated_at': to_datetime(row['updated_at']),
+            'confirmed_at': to_datetime(row['confirmed_at']),
+            'items_count': len(items),
+        }
+
+
+class FastArchivedOrderItemSerializer(FastOrderItemSerializer):
+    """Позиция архивного заказа: товар мог быть удален, название и артикул сохранены в позиции"""
+
+    model = ArchivedOrderItem
+    fields = FastOrderItemSerializer.fields + ('product_name', 'sku')
+
+    def render_row(self, row, product):
+        data = super().render_row(row, product)
+        data['product_name'] = row['product_name']
+        data['sku'] = row['sku']
+        return data
+
+
+class FastArchivedOrderSerializer(FastOrderSerializer):
+    """Детальное представление архивного заказа в формате FastOrderSerializer"""
+
+    item_serializer_class = FastArchivedOrderItemSerializer
+
+    def render_row(self, row, items, delivery_address):
+        data = super().render_row(row, items, delivery_address)
+        data['archived'] = True
+        return data
+
+
+class OrderSummarySerializer:
+    """
+    Краткая сводка заказа для истории заказов: без позиций и товаров
+
+    Количество позиций и магазинов считается одним агрегирующим запросом
+    на страницу, поэтому страница истории читается за два запроса
+    (плюс COUNT пагинации) при любом числе заказов и позиций. Строки с
+    archived=True (UNION с архивом в истории заказов) считаются по позициям
+    архивных заказов - еще один запрос, только если они есть на странице.
+    """
+
+    fields = ('id', 'status', 'total_amount', 'created_at', 'updated_at', 'confirmed_at')
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.to_decimal = make_decimal_converter(Order, 'total_amount')
+        self.to_datetime = make_datetime_converter()
+        self.status_display = dict(Order.STATUS_CHOICES)
+
+    def prepare_queryset(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def render(self, rows):
+        rows = list(rows)
+        hot_ids = [row['id'] for row in rows if not row.get('archived')]
+        archived_ids = [row['id'] for row in rows if row.get('archived')]
+        counts = {}
+        if hot_ids:
+            counts.update(
+                (row['order_id'], row)
+                for row in OrderItem.objects.filter(order_id__in=hot_ids)
+                .order_by().values('order_id')
+                .annotate(items_count=Count('id'), stores_count=Count('product__store_id', distinct=True))
+            )
+        if archived_ids:
+            counts.update(
+                (row['order_id'], row)
+                for row in ArchivedOrderItem.objects.filter(order_id__in=archived_ids)
+                .order_by().values('order_id')
+                .annotate(items_count=Count('id'), stores_count=Count('store_id', distinct=True))
+            )
+        return [self.render_row(row, counts.get(row['id'], {})) for row in rows]
+
+    def render_row(self, row, counts):
+        to_datetime = self.to_datetime
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'status_display': self.status_display.get(row['status'], row['status']),
+            'total_amount': self.to_decimal(row['total_amount']),
+            'items_count': counts.get('items_count', 0),
+            'stores_count': counts.get('stores_count', 0),
+            'created_at': to_datetime(row['created_at']),
+            'updated_at': to_datetime(row['updated_at']),
+            'confirmed_at': to_datetime(row['confirmed_at']),
+            'archived': bool(row.get('archived', False)),
+        }
@@ -0,0 +1,279 @@
+"""
+Прогноз спроса и рекомендации по пополнению остатков
+
+История продаж берется из ежедневных сводок ProductDailySales
+(orders/rollups.py) - продажи товара за день уже сложены по позициям
+заказов. Сводки за FORECAST_HISTORY_DAYS дней загружаются в массивы NumPy
+(товар, день, единицы), и все показатели считаются для всех товаров сразу
+через np.bincount без циклов по товарам:
+
+    daily_demand     - экспоненциально сглаженный спрос в день
+                       (вес продажи падает вдвое за FORECAST_HALF_LIFE_DAYS)
+    сезонность       - профиль спроса товара по дням недели, сглаженный к
+                       общему профилю каталога, пока у товара мало продаж
+    lead_time_demand - прогноз спроса на REPLENISHMENT_LEAD_TIME_DAYS дней
+                       вперед с учетом дней недели
+    safety_stock     - z * отклонение спроса в день * sqrt(срок поставки),
+                       z - квантиль REPLENISHMENT_SERVICE_LEVEL
+    reorder_point    - lead_time_demand + safety_stock
+
+Если остаток товара не выше точки заказа, рекомендуется дозаказать до
+прогноза на срок поставки и REPLENISHMENT_REVIEW_DAYS дней следующей
+проверки плюс страховой запас.
+
+Использование:
+    python manage.py forecast_demand
+"""
+import time
+from datetime import timedelta
+from itertools import islice
+from statistics import NormalDist
+from typing import Dict
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from products.models import Product
+from .models import ProductDailySales, ReplenishmentSuggestion
+
+# Строк сводок в одном пакете чтения и товаров в одном пакете записи
+CHUNK_SIZE = 100000
+BATCH_SIZE = 5000
+# Сколько проданных единиц нужно товару, чтобы его профиль по дням недели
+# весил столько же, сколько общий профиль каталога
+SEASONALITY_PRIOR_UNITS = 30.0
+# Меньше недели истории - не для каждого дня недели есть хотя бы один день
+MIN_HISTORY_DAYS = 7
+
+
+def load_daily_demand(first, last):
+    """
+    Загружает продажи товаров по дням first..last (без отмененных заказов)
+
+    Returns:
+        Tuple: массивы (ID товаров, номер дня от first, единицы) одной длины
+    """
+    rows = (
+        ProductDailySales.objects.filter(date__gte=first, date__lte=last)
+        .exclude(status='cancelled')
+        .order_by().values('product_id', 'date')
+        .annotate(total=Sum('units'))
+        .values_list('product_id', 'date', 'total')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    product_ids, days, units = [], [], []
+    first = np.datetime64(first, 'D')
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        chunk_ids, chunk_dates, chunk_units = zip(*chunk)
+        product_ids.append(np.fromiter(chunk_ids, dtype=np.int64, count=len(chunk)))
+        days.append((np.array(chunk_dates, dtype='datetime64[D]') - first).astype(np.int32))
+        units.append(np.fromiter(chunk_units, dtype=np.float64, count=len(chunk)))
+    if not product_ids:
+        return np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.float64)
+    return np.concatenate(product_ids), np.concatenate(days), np.concatenate(units)
+
+
+def weekday_counts(first_weekday, days):
+    """Сколько раз каждый день недели встречается в days днях, начиная с first_weekday"""
+    return np.bincount((first_weekday + np.arange(days)) % 7, minlength=7)
+
+
+def forecast_demand(product_ids, day_index, units, history_days, first_weekday, forecast_weekday,
+                    lead_time_days, review_days, half_life_days) -> Dict[str, np.ndarray]:
+    """
+    Прогноз спроса для всех товаров сразу
+
+    Args:
+        product_ids, day_index, units: продажи (товар, день от начала истории, единицы);
+            пара (товар, день) встречается один раз
+        history_days: длина истории в днях, не меньше MIN_HISTORY_DAYS
+        first_weekday: день недели первого дня истории (0 - понедельник)
+        forecast_weekday: день недели первого дня прогноза
+
+    Returns:
+        Dict: 'product_id' и показатели по товарам (массивы одной длины)
+    """
+    if history_days < MIN_HISTORY_DAYS:
+        raise ValueError(f'История продаж должна быть не короче {MIN_HISTORY_DAYS} дней')
+    ids, inverse = np.unique(product_ids, return_inverse=True)
+    count = len(ids)
+
+    # Средний спрос и отклонение по всем дням истории, включая дни без продаж
+    total = np.bincount(inverse, weights=units, minlength=count)
+    mean = total / history_days
+    squares = np.bincount(inverse, weights=units * units, minlength=count)
+    std = np.sqrt(np.maximum(squares / history_days - mean * mean, 0))
+
+    # Экспоненциальное сглаживание: вчерашняя продажа весит 1, продажа
+    # half_life_days дней назад - 0.5
+    decay = 0.5 ** (np.arange(history_days)[::-1] / half_life_days)
+    level = np.bincount(inverse, weights=units * decay[day_index], minlength=count) / decay.sum()
+
+    # Профиль по дням недели: средний спрос в этот день недели / средний спрос
+    history_weekdays = weekday_counts(first_weekday, history_days)
+    weekday = (first_weekday + day_index) % 7
+    by_weekday = np.bincount(
+        inverse * 7 + weekday, weights=units, minlength=count * 7
+    ).reshape(count, 7) / history_weekdays
+    own_profile = np.divide(
+        by_weekday, mean[:, None], out=np.ones_like(by_weekday), where=mean[:, None] > 0
+    )
+    catalogue_mean = total.sum() / history_days
+    catalogue_profile = (
+        np.bincount(weekday, weights=units, minlength=7) / history_weekdays / catalogue_mean
+        if catalogue_mean > 0 else np.ones(7)
+    )
+    weight = (total / (total + SEASONALITY_PRIOR_UNITS))[:, None]
+    profile = weight * own_profile + (1 - weight) * catalogue_profile
+
+    # Сумма коэффициентов дней недели за горизонт = профиль @ число таких дней в горизонте
+    lead_time_demand = level * (profile @ weekday_counts(forecast_weekday, lead_time_days))
+    horizon_demand = level * (profile @ weekday_counts(forecast_weekday, lead_time_days + review_days))
+    return {
+        'product_id': ids,
+        'daily_demand': level,
+        'demand_std': std,
+        'lead_time_demand': lead_time_demand,
+        'horizon_demand': horizon_demand,
+    }
+
+
+def suggest_orders(forecast, stock, lead_time_days, service_level) -> Dict[str, np.ndarray]:
+    """Добавляет к прогнозу страховой запас, точку заказа и рекомендуемое количество"""
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * forecast['demand_std'] * np.sqrt(lead_time_days)
+    reorder_point = forecast['lead_time_demand'] + safety_stock
+    order_up_to = forecast['horizon_demand'] + safety_stock
+    # Округление до 6 знаков убирает погрешность float перед ceil (28.0000001 -> 29)
+    suggested = np.where(stock <= reorder_point, np.ceil(np.round(order_up_to - stock, 6)), 0)
+    level = forecast['daily_demand']
+    days_of_cover = np.divide(
+        np.maximum(stock, 0), level, out=np.full(len(level), np.nan), where=level > 0
+    )
+    return {
+        **forecast,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'suggested_quantity': np.maximum(suggested, 0).astype(np.int64),
+        'days_of_cover': days_of_cover,
+    }
+
+
+def load_stock(product_ids):
+    """
+    Остатки доступных товаров из product_ids (отсортированы)
+
+    Returns:
+        Tuple: (маска найденных товаров, ID магазинов, остатки)
+    """
+    found = np.zeros(len(product_ids), dtype=bool)
+    store_ids = np.zeros(len(product_ids), dtype=np.int64)
+    stock = np.zeros(len(product_ids), dtype=np.float64)
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        batch = product_ids[start:start + BATCH_SIZE]
+        rows = list(
+            Product.objects.filter(id__in=batch.tolist(), is_available=True)
+            .values_list('id', 'store_id', 'stock_quantity')
+        )
+        if not rows:
+            continue
+        ids, stores, quantities = (np.array(column) for column in zip(*rows))
+        positions = start + np.searchsorted(batch, ids)
+        found[positions] = True
+        store_ids[positions] = stores
+        stock[positions] = quantities
+    return found, store_ids, stock
+
+
+def save_suggestions(result, store_ids, stock, computed_at) -> int:
+    """Записывает рекомендации пакетами и удаляет рекомендации товаров без продаж"""
+    columns = {
+        name: result[name].round(3).tolist()
+        for name in ('daily_demand', 'demand_std', 'lead_time_demand', 'safety_stock', 'reorder_point')
+    }
+    product_ids = result['product_id'].tolist()
+    suggested = result['suggested_quantity'].tolist()
+    days_of_cover = [
+        None if np.isnan(value) else round(value, 1) for value in result['days_of_cover'].tolist()
+    ]
+    store_ids = store_ids.tolist()
+    stock = stock.astype(np.int64).tolist()
+
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        ReplenishmentSuggestion.objects.bulk_create(
+            [
+                ReplenishmentSuggestion(
+                    product_id=product_ids[index],
+                    store_id=store_ids[index],
+                    stock_quantity=stock[index],
+                    suggested_quantity=suggested[index],
+                    days_of_cover=days_of_cover[index],
+                    computed_at=computed_at,
+                    **{name: values[index] for name, values in columns.items()},
+                )
+                for index in range(start, min(start + BATCH_SIZE, len(product_ids)))
+            ],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=[
+                'store', 'daily_demand', 'demand_std', 'lead_time_demand', 'safety_stock',
+                'reorder_point', 'stock_quantity', 'suggested_quantity', 'days_of_cover', 'computed_at',
+            ],
+        )
+    ReplenishmentSuggestion.objects.filter(computed_at__lt=computed_at).delete()
+    return len(product_ids)
+
+
+def refresh_replenishment(history_days=None, lead_time_days=None, review_days=None,
+                          service_level=None) -> Dict:
+    """
+    Пересчитывает прогноз спроса и рекомендации по пополнению для всех товаров
+
+    Returns:
+        Dict: {'products': товаров с рекомендациями, 'to_order': из них требуют заказа,
+               'timings': {этап: секунды}}
+    """
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    lead_time_days = lead_time_days or settings.REPLENISHMENT_LEAD_TIME_DAYS
+    review_days = review_days if review_days is not None else settings.REPLENISHMENT_REVIEW_DAYS
+    service_level = service_level or settings.REPLENISHMENT_SERVICE_LEVEL
+    if history_days < MIN_HISTORY_DAYS:
+        raise ValueError(f'История продаж должна быть не короче {MIN_HISTORY_DAYS} дней')
+
+    computed_at = timezone.now()
+    # Сегодняшний день еще не закончился - история по вчерашний день
+    last = timezone.localdate() - timedelta(days=1)
+    first = last - timedelta(days=history_days - 1)
+    timings = {}
+
+    started = time.perf_counter()
+    product_ids, day_index, units = load_daily_demand(first, last)
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    forecast = forecast_demand(
+        product_ids, day_index, units, history_days,
+        first_weekday=first.weekday(),
+        forecast_weekday=(last + timedelta(days=1)).weekday(),
+        lead_time_days=lead_time_days,
+        review_days=review_days,
+        half_life_days=settings.FORECAST_HALF_LIFE_DAYS,
+    )
+    found, store_ids, stock = load_stock(forecast['product_id'])
+    # Удаленные и недоступные товары не пополняются
+    forecast = {name: values[found] for name, values in forecast.items()}
+    store_ids, stock = store_ids[found], stock[found]
+    result = suggest_orders(forecast, stock, lead_time_days, service_level)
+    timings['forecast'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    saved = save_suggestions(result, store_ids, stock, computed_at)
+    timings['save'] = time.perf_counter() - started
+    return {
+        'products': saved,
+        'to_order': int((result['suggested_quantity'] > 0).sum()),
+        'timings': timings,
+    }
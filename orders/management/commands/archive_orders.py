@@ -0,0 +1,53 @@
+"""
+Management команда для переноса старых закрытых заказов в архив
+Использование: python manage.py archive_orders [--days 180] [--batch-size 500] [--max-batches 10]
+
+Переносит доставленные и отмененные заказы старше --days дней в архивные
+таблицы пакетами (см. orders/archive.py). По умолчанию переносит все
+подходящие заказы; периодическая задача orders.tasks.archive_orders
+ограничена ORDER_ARCHIVE_MAX_BATCHES пакетами за запуск.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from orders.archive import archive_closed_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые доставленные и отмененные заказы в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help=f'Возраст заказа в днях (по умолчанию {settings.ORDER_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+            help=f'Заказов в одной транзакции (по умолчанию {settings.ORDER_ARCHIVE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Максимум пакетов за запуск (по умолчанию без ограничения)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--days не может быть отрицательным, --batch-size должен быть больше нуля')
+        if options['max_batches'] is not None and options['max_batches'] <= 0:
+            raise CommandError('--max-batches должен быть больше нуля')
+
+        started = time.perf_counter()
+        archived = archive_closed_orders(
+            older_than_days=options['days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив заказов: {archived} за {time.perf_counter() - started:.1f} с'
+        ))
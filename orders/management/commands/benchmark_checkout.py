@@ -0,0 +1,167 @@
+"""
+Management команда для нагрузочной проверки списания остатков при оформлении
+Использование: python manage.py benchmark_checkout [--checkouts 500] [--workers 32]
+                                                   [--skus 5] [--stock 1000] [--shards 16]
+
+Создает тестовый магазин с несколькими "горячими" товарами и параллельно
+выполняет оформления корзин из случайных позиций этих товаров через
+orders.stock.reserve_stock. Проверяет, что остатки не ушли в минус и что
+списано ровно столько, сколько подтверждено успешными оформлениями.
+С --shards остатки товаров делятся на шарды (products/shards.py) - запустите
+с --skus 1 с шардами и без, чтобы сравнить пропускную способность на одном товаре.
+Результаты показательны на PostgreSQL; SQLite выполняет записи по одной.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from orders.stock import InsufficientStock, reserve_stock
+from products.models import Product
+from products.shards import enable_stock_shards, sync_stock_shards
+from stores.models import Store
+
+
+class Command(BaseCommand):
+    help = 'Параллельные оформления заказов на одни и те же товары: проверка отсутствия перепродажи'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkouts',
+            type=int,
+            default=500,
+            help='Количество оформлений (по умолчанию 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=32,
+            help='Количество параллельных потоков (по умолчанию 32)',
+        )
+        parser.add_argument(
+            '--skus',
+            type=int,
+            default=5,
+            help='Количество общих товаров (по умолчанию 5)',
+        )
+        parser.add_argument(
+            '--stock',
+            type=int,
+            default=1000,
+            help='Начальный остаток каждого товара (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=0,
+            help='Разделить остаток каждого товара на столько шардов (по умолчанию 0 - без шардов)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не удалять тестовый магазин и товары после проверки',
+        )
+
+    def handle(self, *args, **options):
+        checkouts = options['checkouts']
+        workers = options['workers']
+        skus = options['skus']
+        stock = options['stock']
+        if min(checkouts, workers, skus) <= 0 or stock < 0 or options['shards'] < 0:
+            raise CommandError(
+                '--checkouts, --workers и --skus должны быть больше нуля, --stock и --shards - не меньше нуля'
+            )
+
+        store = Store.objects.create(name=f'Benchmark checkout {time.time_ns()}', is_active=True)
+        product_ids = [
+            Product.objects.create(
+                store=store, name=f'Benchmark SKU {index}', sku=f'BENCH-{store.id}-{index}',
+                price=100, stock_quantity=stock
+            ).id
+            for index in range(skus)
+        ]
+        if options['shards']:
+            for product_id in product_ids:
+                enable_stock_shards(product_id, options['shards'])
+
+        # Корзины готовятся заранее: 1-3 случайных товара по 1-5 шт.
+        rng = random.Random(0)
+        baskets = [
+            {
+                product_id: rng.randint(1, 5)
+                for product_id in rng.sample(product_ids, rng.randint(1, min(3, skus)))
+            }
+            for _ in range(checkouts)
+        ]
+
+        lock = threading.Lock()
+        reserved = dict.fromkeys(product_ids, 0)
+        results = {'confirmed': 0, 'rejected': 0, 'errors': 0}
+        durations = []
+
+        def checkout(basket):
+            started = time.perf_counter()
+            try:
+                reserve_stock(basket)
+                outcome = 'confirmed'
+            except InsufficientStock:
+                outcome = 'rejected'
+            except Exception as e:
+                outcome = 'errors'
+                self.stderr.write(f'Ошибка оформления: {e}')
+            finally:
+                # Каждый поток работает со своим соединением
+                connection.close()
+            with lock:
+                results[outcome] += 1
+                durations.append(time.perf_counter() - started)
+                if outcome == 'confirmed':
+                    for product_id, quantity in basket.items():
+                        reserved[product_id] += quantity
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(checkout, baskets))
+        elapsed = time.perf_counter() - started
+
+        final = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'stock_quantity'))
+        # Остаток шардированных товаров - сумма шардов
+        final.update(sync_stock_shards(product_ids))
+        oversold = [
+            product_id for product_id in product_ids
+            if final[product_id] < 0 or stock - final[product_id] != reserved[product_id]
+        ]
+
+        durations.sort()
+        self.stdout.write(
+            f'Оформлений: {checkouts} в {workers} потоков за {elapsed:.2f} с '
+            f'({checkouts / elapsed:.0f} в секунду)'
+        )
+        self.stdout.write(
+            f'  Подтверждено: {results["confirmed"]}, отказано (нет остатка): {results["rejected"]}, '
+            f'ошибок: {results["errors"]}'
+        )
+        self.stdout.write(
+            f'  Время оформления: p50 {self.percentile(durations, 50) * 1000:.1f} мс, '
+            f'p95 {self.percentile(durations, 95) * 1000:.1f} мс'
+        )
+        for product_id in product_ids:
+            self.stdout.write(
+                f'  Товар #{product_id}: списано {reserved[product_id]}, остаток {final[product_id]}'
+            )
+
+        if not options['keep']:
+            store.delete()
+
+        if oversold:
+            raise CommandError(f'Остатки не сходятся для товаров: {oversold}')
+        if results['errors']:
+            raise CommandError(f'Ошибок оформления: {results["errors"]}')
+        self.stdout.write(self.style.SUCCESS('Перепродажи нет: списания совпадают с подтвержденными оформлениями'))
+
+    @staticmethod
+    def percentile(values, percent):
+        if not values:
+            return 0
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
@@ -0,0 +1,100 @@
+"""
+Management команда для сравнения скорости сериализаторов списков
+Использование: python manage.py benchmark_serializers [--rows 1000] [--repeat 5]
+
+Сравнивает ProductSerializer / OrderSerializer с облегченными
+FastProductSerializer / FastOrderSerializer на данных из текущей БД,
+проверяет побайтовое совпадение JSON и выводит время на 1000 строк.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from products.models import Product
+from products.serializers import ProductSerializer
+from products.fast_serializers import FastProductSerializer
+from orders.models import Order
+from orders.serializers import OrderSerializer
+from orders.fast_serializers import FastOrderSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость стандартных и облегченных сериализаторов списков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Количество строк для сериализации (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов, берется лучшее время (по умолчанию 5)',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        if rows <= 0 or repeat <= 0:
+            raise CommandError('--rows и --repeat должны быть больше нуля')
+
+        request = Request(RequestFactory().get('/api/products/'))
+        context = {'request': request}
+        renderer = JSONRenderer()
+
+        products = Product.objects.select_related('store').order_by('id')[:rows]
+        self.compare(
+            'Товары',
+            lambda: renderer.render(ProductSerializer(products.all(), many=True, context=context).data),
+            lambda: renderer.render(self.fast(FastProductSerializer(context=context), products)),
+            products.count(),
+            repeat,
+        )
+
+        orders = Order.objects.prefetch_related('items__product').order_by('id')[:rows]
+        self.compare(
+            'Заказы',
+            lambda: renderer.render(OrderSerializer(orders.all(), many=True, context=context).data),
+            lambda: renderer.render(self.fast(FastOrderSerializer(context=context), orders)),
+            orders.count(),
+            repeat,
+        )
+
+    @staticmethod
+    def fast(serializer, queryset):
+        return serializer.render(serializer.prepare_queryset(queryset.all()))
+
+    def compare(self, title, regular, fast, count, repeat):
+        if not count:
+            self.stdout.write(self.style.WARNING(f'{title}: нет данных для сравнения'))
+            return
+
+        regular_output = regular()
+        fast_output = fast()
+
+        if regular_output != fast_output:
+            self.stdout.write(self.style.ERROR(f'{title}: вывод сериализаторов отличается'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{title}: вывод совпадает ({len(fast_output)} байт)'))
+
+        regular_time = self.measure(regular, repeat)
+        fast_time = self.measure(fast, repeat)
+        per_1k = 1000 / count
+        self.stdout.write(f"  Стандартный: {regular_time * per_1k * 1000:.1f} мс на 1000 объектов")
+        self.stdout.write(f"  Облегченный: {fast_time * per_1k * 1000:.1f} мс на 1000 объектов")
+        if fast_time:
+            self.stdout.write(f"  Ускорение: x{regular_time / fast_time:.1f}")
+
+    @staticmethod
+    def measure(func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,61 @@
+"""
+Management команда для удаления брошенных корзин в БД
+Использование: python manage.py purge_carts [--idle-hours 168] [--batch-size 500] [--pause 0.1]
+                                            [--max-batches 10]
+
+Удаляет заказы pending (корзины при CART_BACKEND=database) и их позиции,
+если корзина не менялась дольше --idle-hours часов (по умолчанию CART_TTL).
+Работает короткими пакетами с паузами (см. orders.carts.purge_abandoned_carts).
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from orders.carts import purge_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Удаляет корзины в БД (заказы pending), не менявшиеся дольше заданного времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle-hours',
+            type=float,
+            default=settings.CART_TTL / 3600,
+            help=f'Время без изменений в часах (по умолчанию CART_TTL: {settings.CART_TTL / 3600:g})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.CART_GC_BATCH_SIZE,
+            help=f'Корзин в одной транзакции (по умолчанию {settings.CART_GC_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=settings.CART_GC_PAUSE,
+            help=f'Пауза между пакетами в секундах (по умолчанию {settings.CART_GC_PAUSE:g})',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Максимум пакетов за запуск (по умолчанию без ограничения)',
+        )
+
+    def handle(self, *args, **options):
+        if options['idle_hours'] < 0 or options['pause'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--idle-hours и --pause не могут быть отрицательными, --batch-size должен быть больше нуля')
+        if options['max_batches'] is not None and options['max_batches'] <= 0:
+            raise CommandError('--max-batches должен быть больше нуля')
+
+        started = time.perf_counter()
+        result = purge_abandoned_carts(
+            idle_seconds=options['idle_hours'] * 3600,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено корзин: {result["carts"]}, позиций: {result["items"]}, '
+            f'пакетов: {result["batches"]} за {time.perf_counter() - started:.1f} с'
+        ))
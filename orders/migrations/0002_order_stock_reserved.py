@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=False, help_text='Остатки товаров списаны при оформлении и еще не возвращены', verbose_name='Остатки списаны'),
+        ),
+    ]
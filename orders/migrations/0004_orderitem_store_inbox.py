@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_store_and_status(apps, schema_editor):
+    """Заполняет магазин и статус существующих позиций из товара и заказа"""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('products', 'Product')
+    Order = apps.get_model('orders', 'Order')
+    OrderItem.objects.update(
+        store_id=models.Subquery(
+            Product.objects.filter(id=models.OuterRef('product_id')).values('store_id')[:1]
+        ),
+        status=models.Subquery(
+            Order.objects.filter(id=models.OuterRef('order_id')).values('status')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0002_store_stats'),
+        ('orders', '0003_order_history_index'),
+        ('products', '0007_stock_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтвержден'), ('processing', 'В обработке'), ('shipped', 'Отправлен'), ('delivered', 'Доставлен'), ('cancelled', 'Отменен')], default='pending', help_text='Копия статуса заказа для входящих позиций магазина', max_length=20, verbose_name='Статус заказа'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='store',
+            field=models.ForeignKey(help_text='Магазин товара на момент создания позиции', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='stores.store', verbose_name='Магазин'),
+        ),
+        migrations.RunPython(fill_store_and_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['store', 'status', 'created_at', 'id'], name='orderitem_store_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'updated_at', 'id'], name='order_status_updated_idx'),
+        ),
+    ]
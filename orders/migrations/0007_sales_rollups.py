@@ -0,0 +1,119 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0003_store_managers'),
+        ('products', '0007_stock_shards'),
+        ('orders', '0006_order_status_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День продаж')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтвержден'), ('processing', 'В обработке'), ('shipped', 'Отправлен'), ('delivered', 'Доставлен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус заказа')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Позиций')),
+                ('units', models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День продаж')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтвержден'), ('processing', 'В обработке'), ('shipped', 'Отправлен'), ('delivered', 'Доставлен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус заказа')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Позиций')),
+                ('units', models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='Обработаны изменения до')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчета')),
+            ],
+            options={
+                'verbose_name': 'Состояние сводок продаж',
+                'verbose_name_plural': 'Состояние сводок продаж',
+            },
+        ),
+        migrations.CreateModel(
+            name='StoreDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День продаж')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтвержден'), ('processing', 'В обработке'), ('shipped', 'Отправлен'), ('delivered', 'Доставлен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус заказа')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Позиций')),
+                ('units', models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи магазина за день',
+                'verbose_name_plural': 'Продажи магазинов по дням',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['confirmed_at'], name='archived_order_confirmed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['confirmed_at'], name='order_confirmed_idx'),
+        ),
+        migrations.AddField(
+            model_name='storedailysales',
+            name='store',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='stores.store', verbose_name='Магазин'),
+        ),
+        migrations.AddField(
+            model_name='productdailysales',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products.product', verbose_name='Товар'),
+        ),
+        migrations.AddField(
+            model_name='productdailysales',
+            name='store',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_daily_sales', to='stores.store', verbose_name='Магазин'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailysales',
+            unique_together={('date', 'status')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='storedailysales',
+            unique_together={('store', 'date', 'status')},
+        ),
+        migrations.AddIndex(
+            model_name='productdailysales',
+            index=models.Index(fields=['store', 'date'], name='product_sales_store_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productdailysales',
+            index=models.Index(fields=['date'], name='product_sales_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productdailysales',
+            unique_together={('product', 'date', 'status')},
+        ),
+    ]
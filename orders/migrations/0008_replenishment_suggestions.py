@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stock_shards'),
+        ('stores', '0003_store_managers'),
+        ('orders', '0007_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplenishmentSuggestion',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='replenishment', serialize=False, to='products.product', verbose_name='Товар')),
+                ('daily_demand', models.FloatField(help_text='Сглаженный недавний спрос', verbose_name='Спрос в день')),
+                ('demand_std', models.FloatField(verbose_name='Отклонение спроса в день')),
+                ('lead_time_demand', models.FloatField(help_text='С поправкой на день недели', verbose_name='Спрос за срок поставки')),
+                ('safety_stock', models.FloatField(verbose_name='Страховой запас')),
+                ('reorder_point', models.FloatField(verbose_name='Точка заказа')),
+                ('stock_quantity', models.IntegerField(verbose_name='Остаток при расчете')),
+                ('suggested_quantity', models.PositiveIntegerField(default=0, verbose_name='Рекомендуемый заказ')),
+                ('days_of_cover', models.FloatField(blank=True, null=True, verbose_name='Хватит остатка, дней')),
+                ('computed_at', models.DateTimeField(verbose_name='Дата расчета')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_suggestions', to='stores.store', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация по пополнению',
+                'verbose_name_plural': 'Рекомендации по пополнению',
+                'indexes': [models.Index(fields=['store', 'days_of_cover'], name='replenishment_store_cover_idx')],
+            },
+        ),
+    ]
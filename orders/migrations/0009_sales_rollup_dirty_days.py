@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_replenishment_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollupDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='День')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата отметки')),
+            ],
+            options={
+                'verbose_name': 'День для пересчета сводок',
+                'verbose_name_plural': 'Дни для пересчета сводок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['archived_at'], name='archived_order_archived_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from users.models import User
@@ -60,6 +62,16 @@ class Order(models.Model):
         ('delivered', 'Доставлен'),
         ('cancelled', 'Отменен'),
     ]
+    # Допустимые переходы для массовой смены статуса; корзину (pending)
+    # подтверждает только оформление заказа со списанием остатков
+    STATUS_TRANSITIONS = {
+        'pending': (),
+        'confirmed': ('processing', 'shipped', 'cancelled'),
+        'processing': ('shipped', 'cancelled'),
+        'shipped': ('delivered',),
+        'delivered': (),
+        'cancelled': (),
+    }
     
     user = models.ForeignKey(
         User,
@@ -91,6 +103,11 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     confirmed_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата подтверждения')
+    stock_reserved = models.BooleanField(
+        default=False,
+        verbose_name='Остатки списаны',
+        help_text='Остатки товаров списаны при оформлении и еще не возвращены'
+    )
     
     class Meta:
         verbose_name = 'Заказ'
@@ -98,30 +115,131 @@ class Order(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
+            # История заказов пользователя, от новых к старым
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
             models.Index(fields=['status', 'created_at']),
+            # Поиск брошенных корзин (pending) по времени последнего изменения
+            models.Index(fields=['status', 'updated_at', 'id'], name='order_status_updated_idx'),
+            # Заказы за день продаж для сводок (orders/rollups.py)
+            models.Index(fields=['confirmed_at'], name='order_confirmed_idx'),
         ]
     
     def __str__(self):
         return f"Заказ #{self.id} от {self.user.email} ({self.get_status_display()})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if 'status' in loaded:
+            instance._loaded_status = loaded['status']
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Статус копируется в позиции заказа - по нему магазины фильтруют входящие позиции
+        update_fields = kwargs.get('update_fields')
+        loaded_status = getattr(self, '_loaded_status', None)
+        if (loaded_status is not None and loaded_status != self.status
+                and (update_fields is None or 'status' in update_fields)):
+            self.items.update(status=self.status)
+        self._loaded_status = self.status
+    
     def calculate_total(self):
-        """Рассчитывает общую сумму заказа на основе позиций"""
-        total = sum(item.get_total() for item in self.items.all())
+        """Рассчитывает общую сумму заказа одним агрегирующим запросом"""
+        total = self.items.aggregate(
+            total=Sum(F('price') * F('quantity'), output_field=self._meta.get_field('total_amount'))
+        )['total'] or Decimal('0.00')
         self.total_amount = total
         return total
     
-    def save(self, *args, **kwargs):
-        """Пересчитывает общую сумму при сохранении"""
-        if self.pk:
-            self.calculate_total()
-        super().save(*args, **kwargs)
+    @classmethod
+    def increment_total(cls, order_id, delta):
+        """Атомарно изменяет общую сумму заказа на delta одним UPDATE"""
+        if delta:
+            cls.objects.filter(pk=order_id).update(
+                total_amount=F('total_amount') + delta,
+                updated_at=timezone.now()
+            )
+    
+    def get_item_quantities(self):
+        """Возвращает {product_id: количество} по позициям заказа"""
+        quantities = {}
+        for product_id, quantity in self.items.values_list('product_id', 'quantity'):
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+    
+    def release_stock(self):
+        """Возвращает списанные при оформлении остатки (один раз)"""
+        from .stock import release_stock
+        
+        with transaction.atomic():
+            # Флаг снимается условным UPDATE - параллельная отмена не вернет остатки дважды
+            released = Order.objects.filter(pk=self.pk, stock_reserved=True).update(stock_reserved=False)
+            if released:
+                release_stock(self.get_item_quantities())
+        self.stock_reserved = False
+        return bool(released)
+    
+    @classmethod
+    def bulk_transition(cls, order_ids, new_status):
+        """
+        Переводит заказы в new_status set-based UPDATE без сохранения каждого заказа
+        
+        Заказы, из статуса которых переход недопустим, пропускаются. При отмене
+        остатки всех отмененных заказов возвращаются одним пакетом.
+        
+        Returns:
+            tuple: (список переведенных ID, {ID: текущий статус} пропущенных)
+        """
+        from .stock import release_stock
+        
+        allowed_from = [
+            status for status, targets in cls.STATUS_TRANSITIONS.items() if new_status in targets
+        ]
+        with transaction.atomic():
+            # Блокировка строк: параллельная смена статуса не проскочит между проверкой и UPDATE
+            rows = list(
+                cls.objects.select_for_update().filter(id__in=order_ids)
+                .order_by('id').values_list('id', 'status', 'stock_reserved')
+            )
+            updated = [order_id for order_id, status, _ in rows if status in allowed_from]
+            skipped = {order_id: status for order_id, status, _ in rows if status not in allowed_from}
+            if not updated:
+                return updated, skipped
+            
+            cls.objects.filter(id__in=updated).update(status=new_status, updated_at=timezone.now())
+            OrderItem.objects.filter(order_id__in=updated).update(status=new_status)
+            
+            if new_status == 'cancelled':
+                reserved = [
+                    order_id for order_id, status, stock_reserved in rows
+                    if stock_reserved and status in allowed_from
+                ]
+                if reserved:
+                    cls.objects.filter(id__in=reserved).update(stock_reserved=False)
+                    quantities = dict(
+                        OrderItem.objects.filter(order_id__in=reserved).order_by()
+                        .values('product_id').annotate(total=Sum('quantity'))
+                        .values_list('product_id', 'total')
+                    )
+                    release_stock(quantities)
+        return updated, skipped
     
     def can_be_cancelled(self):
-        """Проверяет, можно ли отменить заказ"""
-        return self.status in ['pending', 'confirmed', 'processing']
+        """
+        Проверяет, можно ли отменить заказ (по STATUS_TRANSITIONS)
+        
+        Корзина (pending) не отменяется - ее очищают через API корзины.
+        """
+        return 'cancelled' in self.STATUS_TRANSITIONS[self.status]
     
     def get_items_count(self):
         """Возвращает количество позиций в заказе"""
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'items' in prefetched:
+            # Позиции уже загружены prefetch_related - без отдельного COUNT
+            return len(prefetched['items'])
         return self.items.count()
     
     def get_stores_in_order(self):
@@ -145,6 +263,21 @@ class OrderItem(models.Model):
         related_name='order_items',
         verbose_name='Товар'
     )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='order_items',
+        verbose_name='Магазин',
+        help_text='Магазин товара на момент создания позиции'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус заказа',
+        help_text='Копия статуса заказа для входящих позиций магазина'
+    )
     quantity = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
         verbose_name='Количество'
@@ -163,6 +296,8 @@ class OrderItem(models.Model):
         unique_together = ['order', 'product']
         indexes = [
             models.Index(fields=['order', 'product']),
+            # Входящие позиции магазина по статусу, от старых к новым
+            models.Index(fields=['store', 'status', 'created_at', 'id'], name='orderitem_store_inbox_idx'),
         ]
     
     def __str__(self):
@@ -172,11 +307,297 @@ class OrderItem(models.Model):
         """Рассчитывает общую стоимость позиции"""
         return self.price * self.quantity
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Сумма позиции на момент загрузки - для инкрементального изменения суммы заказа
+        loaded = dict(zip(field_names, values))
+        if 'price' in loaded and 'quantity' in loaded:
+            instance._saved_total = loaded['price'] * loaded['quantity']
+        return instance
+    
     def save(self, *args, **kwargs):
-        """При сохранении позиции сохраняем цену товара на момент заказа"""
+        """
+        При сохранении позиции сохраняем цену товара на момент заказа
+        и изменяем сумму заказа на разницу, не перечитывая остальные позиции
+        """
         if not self.pk:
             self.price = self.product.price
+            self.store_id = self.product.store_id
+            self.status = self.order.status
+            self._saved_total = Decimal('0.00')
         super().save(*args, **kwargs)
-        # Пересчитываем общую сумму заказа
-        self.order.calculate_total()
-        self.order.save()
+        
+        saved_total = getattr(self, '_saved_total', None)
+        if saved_total is None:
+            # Позиция загружена без цены или количества - пересчитываем заказ целиком
+            self.order.calculate_total()
+            self.order.save(update_fields=['total_amount', 'updated_at'])
+        else:
+            self.update_order_total(self.get_total() - saved_total)
+        self._saved_total = self.get_total()
+    
+    def delete(self, *args, **kwargs):
+        saved_total = getattr(self, '_saved_total', None)
+        order_id = self.order_id
+        result = super().delete(*args, **kwargs)
+        if saved_total is None:
+            order = Order.objects.get(pk=order_id)
+            order.calculate_total()
+            order.save(update_fields=['total_amount', 'updated_at'])
+        else:
+            self.update_order_total(-saved_total)
+        return result
+    
+    def update_order_total(self, delta):
+        Order.increment_total(self.order_id, delta)
+        # Загруженный вместе с позицией заказ тоже должен видеть новую сумму
+        if delta and OrderItem.order.is_cached(self):
+            self.order.total_amount += delta
+
+
+class ArchivedOrder(models.Model):
+    """
+    Закрытый (доставленный или отмененный) заказ, перенесенный из orders_order
+
+    Рабочие таблицы заказов и их индексы содержат только актуальные заказы,
+    старые закрытые заказы переносятся сюда пакетами (см. orders/archive.py).
+    ID совпадает с ID исходного заказа. История заказов читает обе таблицы.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID заказа')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_orders',
+        verbose_name='Пользователь'
+    )
+    delivery_address = models.ForeignKey(
+        DeliveryAddress,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_orders',
+        verbose_name='Адрес доставки'
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name='Статус заказа')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Общая сумма заказа')
+    notes = models.TextField(blank=True, null=True, verbose_name='Примечания')
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    updated_at = models.DateTimeField(verbose_name='Дата обновления')
+    confirmed_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата подтверждения')
+    archive_month = models.DateField(verbose_name='Месяц создания', help_text='Первое число месяца создания заказа')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата переноса в архив')
+    
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архивные заказы'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_order_user_idx'),
+            # Выборка и очистка архива по месяцам
+            models.Index(fields=['archive_month'], name='archived_order_month_idx'),
+            models.Index(fields=['confirmed_at'], name='archived_order_confirmed_idx'),
+            # Заказы, перенесенные после водяного знака сводок продаж
+            models.Index(fields=['archived_at'], name='archived_order_archived_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Архивный заказ #{self.id} ({self.get_status_display()})"
+
+
+class ArchivedOrderItem(models.Model):
+    """Позиция архивного заказа; товар может быть уже удален из каталога"""
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID позиции')
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='Заказ'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='archived_order_items',
+        verbose_name='Товар'
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='archived_order_items',
+        verbose_name='Магазин'
+    )
+    product_name = models.CharField(max_length=300, verbose_name='Название товара')
+    sku = models.CharField(max_length=100, blank=True, null=True, verbose_name='Артикул')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена за единицу')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name='Статус заказа')
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    
+    class Meta:
+        verbose_name = 'Позиция архивного заказа'
+        verbose_name_plural = 'Позиции архивных заказов'
+    
+    def __str__(self):
+        return f"{self.product_name} x{self.quantity} в архивном заказе #{self.order_id}"
+    
+    def get_total(self):
+        return self.price * self.quantity
+
+
+class SalesRollup(models.Model):
+    """Общие поля ежедневных сводок продаж (см. orders/rollups.py)"""
+    date = models.DateField(verbose_name='День продаж')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name='Статус заказа')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='Заказов')
+    items_count = models.PositiveIntegerField(default=0, verbose_name='Позиций')
+    units = models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    """Продажи за день по статусу заказа (все магазины)"""
+    
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        unique_together = ['date', 'status']
+    
+    def __str__(self):
+        return f"Продажи {self.date} ({self.get_status_display()})"
+
+
+class StoreDailySales(SalesRollup):
+    """
+    Продажи магазина за день по статусу заказа
+
+    orders_count - заказы с позициями магазина: заказ из нескольких магазинов
+    учитывается в каждом из них.
+    """
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='daily_sales',
+        verbose_name='Магазин'
+    )
+    
+    class Meta:
+        verbose_name = 'Продажи магазина за день'
+        verbose_name_plural = 'Продажи магазинов по дням'
+        unique_together = ['store', 'date', 'status']
+    
+    def __str__(self):
+        return f"Продажи магазина #{self.store_id} {self.date} ({self.get_status_display()})"
+
+
+class ProductDailySales(SalesRollup):
+    """Продажи товара за день по статусу заказа"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='daily_sales',
+        verbose_name='Товар'
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='product_daily_sales',
+        verbose_name='Магазин'
+    )
+    
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        unique_together = ['product', 'date', 'status']
+        indexes = [
+            # Лучшие товары магазина за период
+            models.Index(fields=['store', 'date'], name='product_sales_store_date_idx'),
+            models.Index(fields=['date'], name='product_sales_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Продажи товара #{self.product_id} {self.date} ({self.get_status_display()})"
+
+
+class SalesRollupState(models.Model):
+    """
+    Водяной знак инкрементального пересчета сводок продаж (одна строка)
+
+    Заказы, измененные после watermark, пересчитываются при следующем запуске.
+    """
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name='Обработаны изменения до')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата пересчета')
+    
+    class Meta:
+        verbose_name = 'Состояние сводок продаж'
+        verbose_name_plural = 'Состояние сводок продаж'
+    
+    def __str__(self):
+        return f"Сводки продаж до {self.watermark}"
+
+
+class SalesRollupDirtyDay(models.Model):
+    """
+    День продаж, из которого удалены заказы
+
+    Удаленный заказ не виден по updated_at, поэтому его день отмечается здесь
+    и пересчитывается при следующем запуске refresh_sales_rollups.
+    """
+    date = models.DateField(unique=True, verbose_name='День')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата отметки')
+    
+    class Meta:
+        verbose_name = 'День для пересчета сводок'
+        verbose_name_plural = 'Дни для пересчета сводок'
+    
+    def __str__(self):
+        return f"Пересчитать сводки за {self.date}"
+
+
+class ReplenishmentSuggestion(models.Model):
+    """
+    Прогноз спроса и рекомендация по пополнению остатка товара
+
+    Пересчитывается пакетно для всех товаров с продажами (см. orders/forecasting.py).
+    Количества - в единицах товара, спрос - в единицах в день.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='replenishment',
+        verbose_name='Товар'
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='replenishment_suggestions',
+        verbose_name='Магазин'
+    )
+    daily_demand = models.FloatField(verbose_name='Спрос в день', help_text='Сглаженный недавний спрос')
+    demand_std = models.FloatField(verbose_name='Отклонение спроса в день')
+    lead_time_demand = models.FloatField(
+        verbose_name='Спрос за срок поставки', help_text='С поправкой на день недели'
+    )
+    safety_stock = models.FloatField(verbose_name='Страховой запас')
+    reorder_point = models.FloatField(verbose_name='Точка заказа')
+    stock_quantity = models.IntegerField(verbose_name='Остаток при расчете')
+    suggested_quantity = models.PositiveIntegerField(default=0, verbose_name='Рекомендуемый заказ')
+    days_of_cover = models.FloatField(null=True, blank=True, verbose_name='Хватит остатка, дней')
+    computed_at = models.DateTimeField(verbose_name='Дата расчета')
+    
+    class Meta:
+        verbose_name = 'Рекомендация по пополнению'
+        verbose_name_plural = 'Рекомендации по пополнению'
+        indexes = [
+            # Рекомендации магазина, самые срочные первыми
+            models.Index(fields=['store', 'days_of_cover'], name='replenishment_store_cover_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Пополнение товара #{self.product_id}: {self.suggested_quantity}"
@@ -0,0 +1,163 @@
+"""
+Подбор магазинов для списка закупки (оптимизатор корзины)
+
+Для каждой позиции списка выбираются предложения разных магазинов так,
+чтобы общая стоимость была минимальной с учетом остатков на складе.
+
+Без стоимости подключения магазина задача распадается на независимые
+позиции, и жадное заполнение от дешевых предложений дает оптимум. Если
+задана стоимость магазина (доставка) или лимит магазинов, набор магазинов
+улучшается локальным поиском (убрать/добавить/заменить магазин), пока
+есть улучшения и не исчерпан бюджет времени. Лимит магазинов соблюдается
+всегда: если в max_stores магазинах нельзя набрать все позиции, недостающее
+количество возвращается в shortage.
+"""
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+
+class BasketOptimizer:
+    """Класс для подбора самого дешевого набора предложений"""
+
+    def __init__(self, offers: Iterable[Dict], store_cost: Decimal = Decimal('0'),
+                 max_stores: Optional[int] = None, time_budget: float = 0.5):
+        """
+        Args:
+            offers: Предложения - словари с ключами match_key, id, store_id, price, stock_quantity
+            store_cost: Стоимость подключения каждого магазина (например, доставка)
+            max_stores: Максимальное количество магазинов в решении
+            time_budget: Бюджет времени на локальный поиск в секундах
+        """
+        self.store_cost = self.to_cents(store_cost)
+        self.max_stores = max_stores
+        self.time_budget = time_budget
+        self.offers = defaultdict(list)
+        for offer in offers:
+            self.offers[offer['match_key']].append((
+                self.to_cents(offer['price']), offer['id'], offer['store_id'],
+                offer['stock_quantity'],
+            ))
+        for candidates in self.offers.values():
+            candidates.sort()
+
+    @staticmethod
+    def to_cents(value) -> int:
+        return int(Decimal(value) * 100)
+
+    def solve(self, lines: Dict[str, int]) -> Dict:
+        """
+        Args:
+            lines: Требуемое количество по ключам сопоставления товара
+
+        Returns:
+            Dict: {'allocations': {ключ: [(product_id, store_id, количество, цена в копейках)]},
+                   'shortage': {ключ: недостающее количество}, 'stores': множество магазинов,
+                   'items_cost': стоимость в копейках, 'complete': уложился ли поиск в бюджет}
+        """
+        deadline = time.perf_counter() + self.time_budget
+        # Сколько можно набрать по каждой позиции, если открыты все магазины
+        targets = {}
+        shortage = {}
+        for key, quantity in lines.items():
+            available = sum(offer[3] for offer in self.offers.get(key, ()))
+            targets[key] = min(quantity, available)
+            if quantity > available:
+                shortage[key] = quantity - available
+
+        stores = self.evaluate(targets, None)[1]
+        complete = True
+        if self.store_cost or (self.max_stores and len(stores) > self.max_stores):
+            stores, complete = self.search(targets, stores, deadline)
+
+        items_cost, used, missing, allocations = self.evaluate(targets, stores, allocate=True)
+        # Чего не хватило в магазинах, оставшихся в лимите max_stores
+        for key, quantity in missing.items():
+            shortage[key] = shortage.get(key, 0) + quantity
+        return {
+            'allocations': allocations,
+            'shortage': shortage,
+            'stores': used,
+            'items_cost': items_cost,
+            'complete': complete,
+        }
+
+    def evaluate(self, targets, stores, allocate=False):
+        """
+        Заполняет позиции от дешевых предложений открытых магазинов
+
+        Для фиксированного набора магазинов такое заполнение оптимально.
+        Возвращает (стоимость, использованные магазины, {ключ: недостающее
+        количество}, распределение).
+        """
+        cost = 0
+        used = set()
+        missing = {}
+        allocations = {} if allocate else None
+        for key, target in targets.items():
+            remaining = target
+            taken = []
+            for price, product_id, store_id, stock in self.offers.get(key, ()):
+                if remaining == 0:
+                    break
+                if stores is not None and store_id not in stores:
+                    continue
+                quantity = min(stock, remaining)
+                remaining -= quantity
+                cost += price * quantity
+                used.add(store_id)
+                if allocate:
+                    taken.append((product_id, store_id, quantity, price))
+            if remaining:
+                missing[key] = remaining
+            if allocate:
+                allocations[key] = taken
+        return cost, used, missing, allocations
+
+    def objective(self, targets, stores):
+        """
+        Оценка набора магазинов: (недостающее количество, стоимость с магазинами) -
+        сначала покрытие позиций, затем цена; меньше - лучше
+        """
+        cost, used, missing, _ = self.evaluate(targets, stores)
+        return (sum(missing.values()), cost + self.store_cost * len(used)), used
+
+    def search(self, targets, stores, deadline):
+        """Локальный поиск по наборам магазинов; возвращает (магазины, complete)"""
+        all_stores = {offer[2] for key in targets for offer in self.offers.get(key, ())}
+        best, stores = self.objective(targets, stores)
+
+        # Сначала укладываемся в лимит, не глядя на бюджет (не больше одного шага на
+        # магазин): убираем магазин, без которого меньше всего не хватает и дешевле.
+        # Если лимит не покрывает все позиции, недостающее уходит в shortage
+        while self.max_stores and len(stores) > self.max_stores:
+            best, stores = min(
+                (self.objective(targets, stores - {store}) for store in stores),
+                key=lambda candidate: candidate[0]
+            )
+
+        improved = True
+        while improved:
+            improved = False
+            for move in self.moves(stores, all_stores):
+                if time.perf_counter() > deadline:
+                    return stores, False
+                value, used = self.objective(targets, move)
+                if value < best:
+                    best, stores = value, used
+                    improved = True
+                    break
+        return stores, True
+
+    def moves(self, stores, all_stores):
+        """Соседние наборы: без одного магазина, с новым магазином, с заменой"""
+        closed = all_stores - stores
+        for store in stores:
+            yield stores - {store}
+        if not self.max_stores or len(stores) < self.max_stores:
+            for store in closed:
+                yield stores | {store}
+        for removed in stores:
+            for added in closed:
+                yield (stores - {removed}) | {added}
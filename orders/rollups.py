@@ -0,0 +1,262 @@
+"""
+Ежедневные сводки продаж для аналитики
+
+Выручка, единицы товара, позиции и заказы за день хранятся в трех таблицах:
+DailySales (день, статус), StoreDailySales (магазин, день, статус) и
+ProductDailySales (товар, день, статус). Аналитика (/api/analytics/)
+суммирует строки сводок за период вместо агрегирования позиций заказов.
+
+День продаж - дата подтверждения заказа (без нее - дата создания) в
+TIME_ZONE; корзины (pending) не учитываются. Сводки дня всегда строятся
+целиком по рабочим и архивным заказам (orders/archive.py), поэтому
+повторный пересчет безопасен.
+
+refresh_sales_rollups пересчитывает только дни заказов, измененных после
+водяного знака (SalesRollupState), кроме последних SALES_ROLLUP_SAFETY_LAG
+секунд: строки еще не закоммиченных транзакций иначе оказались бы позади
+водяного знака. Заказы, перенесенные в архив после водяного знака, проверяются
+так же по архивной таблице, а дни удаленных заказов отмечаются в
+SalesRollupDirtyDay (сигнал orders/signals.py). Запускается периодической задачей orders.tasks.refresh_sales_rollups,
+полная перестройка - командой rebuild_sales_rollups.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, DailySales, Order, OrderItem, ProductDailySales,
+    SalesRollupDirtyDay, SalesRollupState, StoreDailySales,
+)
+
+# Статусы, которые попадают в сводки: все, кроме корзины
+SALES_STATUSES = [value for value, _ in Order.STATUS_CHOICES if value != 'pending']
+# Дней в одной транзакции пересчета
+SPAN_DAYS = 31
+BATCH_SIZE = 1000
+
+_archiving = threading.local()
+
+
+def sales_at(prefix=''):
+    """Момент продажи: подтверждение заказа, без него - создание"""
+    return Coalesce(f'{prefix}confirmed_at', f'{prefix}created_at')
+
+
+def day_range(first, last) -> Tuple[datetime, datetime]:
+    """Границы дней first..last включительно в текущем часовом поясе"""
+    start = timezone.make_aware(datetime.combine(first, dt_time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), dt_time.min))
+    return start, end
+
+
+def sold_between(start, end, prefix=''):
+    """Условие "продан в [start, end)", которое читается по индексам дат заказа"""
+    return (
+        Q(**{f'{prefix}confirmed_at__gte': start, f'{prefix}confirmed_at__lt': end})
+        | Q(**{
+            f'{prefix}confirmed_at__isnull': True,
+            f'{prefix}created_at__gte': start, f'{prefix}created_at__lt': end,
+        })
+    )
+
+
+def aggregate_days(first, last) -> Dict[str, Dict]:
+    """
+    Считает сводки дней first..last по рабочим и архивным позициям
+
+    Returns:
+        Dict: {'status': {(день, статус): значения}, 'store': {(магазин, день, статус): ...},
+               'product': {(товар, день, статус): ...}}
+    """
+    start, end = day_range(first, last)
+    result = {'status': {}, 'store': {}, 'product': {}}
+    sources = (
+        # Магазин позиции заполняется при создании; у старых позиций берем магазин товара
+        (OrderItem, Coalesce('store_id', 'product__store_id')),
+        (ArchivedOrderItem, F('store_id')),
+    )
+    for model, store in sources:
+        items = model.objects.filter(
+            sold_between(start, end, 'order__'), order__status__in=SALES_STATUSES
+        ).annotate(
+            day=TruncDate(sales_at('order__')),
+            sale_status=F('order__status'),
+            sale_store=store,
+            amount=ExpressionWrapper(
+                F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+        ).order_by()
+        totals = {
+            'orders_count': Count('order_id', distinct=True),
+            'items_count': Count('id'),
+            'units': Sum('quantity'),
+            'revenue': Sum('amount'),
+        }
+        groups = (
+            ('status', ('day', 'sale_status')),
+            ('store', ('sale_store', 'day', 'sale_status')),
+            ('product', ('product_id', 'sale_store', 'day', 'sale_status')),
+        )
+        for name, keys in groups:
+            for row in items.values(*keys).annotate(**totals):
+                if name == 'store' and row['sale_store'] is None:
+                    continue
+                if name == 'product' and row['product_id'] is None:
+                    # Товар архивной позиции удален из каталога
+                    continue
+                key = tuple(row[field] for field in keys if field != 'sale_store' or name == 'store')
+                merged = result[name].setdefault(key, {
+                    'store_id': row.get('sale_store'),
+                    'orders_count': 0, 'items_count': 0, 'units': 0, 'revenue': Decimal('0.00'),
+                })
+                # Рабочие и архивные заказы не пересекаются - значения складываются
+                for field in ('orders_count', 'items_count', 'units', 'revenue'):
+                    merged[field] += row[field] or 0
+    return result
+
+
+def rebuild_days(first, last) -> int:
+    """
+    Перестраивает сводки дней first..last в одной транзакции
+
+    Returns:
+        int: Количество строк сводок
+    """
+    data = aggregate_days(first, last)
+    rows = [
+        DailySales(date=day, status=sale_status, **counters(values))
+        for (day, sale_status), values in data['status'].items()
+    ]
+    store_rows = [
+        StoreDailySales(store_id=store_id, date=day, status=sale_status, **counters(values))
+        for (store_id, day, sale_status), values in data['store'].items()
+    ]
+    product_rows = [
+        ProductDailySales(
+            product_id=product_id, store_id=values['store_id'], date=day, status=sale_status,
+            **counters(values)
+        )
+        for (product_id, day, sale_status), values in data['product'].items()
+    ]
+    with transaction.atomic():
+        for model, objects in (
+            (DailySales, rows), (StoreDailySales, store_rows), (ProductDailySales, product_rows),
+        ):
+            model.objects.filter(date__gte=first, date__lte=last).delete()
+            model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    return len(rows) + len(store_rows) + len(product_rows)
+
+
+def counters(values):
+    return {
+        field: values[field]
+        for field in ('orders_count', 'items_count', 'units', 'revenue')
+    }
+
+
+def day_spans(days: Iterable) -> List[Tuple]:
+    """Группирует дни в отрезки подряд идущих дней не длиннее SPAN_DAYS"""
+    spans = []
+    for day in sorted(set(days)):
+        if spans and day - spans[-1][1] == timedelta(days=1) and (day - spans[-1][0]).days < SPAN_DAYS:
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return [tuple(span) for span in spans]
+
+
+@contextmanager
+def moving_to_archive():
+    """Удаления заказов внутри блока - перенос в архив, их дни не отмечаются"""
+    _archiving.active = True
+    try:
+        yield
+    finally:
+        _archiving.active = False
+
+
+def mark_deleted_order(order):
+    """Отмечает день удаленного заказа для пересчета сводок"""
+    if order.status not in SALES_STATUSES or getattr(_archiving, 'active', False):
+        # Корзины в сводки не входят, а архивные заказы сводки продолжают учитывать
+        return
+    day = timezone.localdate(order.confirmed_at or order.created_at)
+    SalesRollupDirtyDay.objects.bulk_create([SalesRollupDirtyDay(date=day)], ignore_conflicts=True)
+
+
+def changed_days(queryset):
+    return set(
+        queryset.filter(status__in=SALES_STATUSES)
+        .annotate(day=TruncDate(sales_at()))
+        .order_by().values_list('day', flat=True).distinct()
+    )
+
+
+def refresh_sales_rollups() -> Dict:
+    """
+    Пересчитывает дни заказов, измененных после водяного знака, и сдвигает его
+
+    Returns:
+        Dict: {'days': пересчитано дней, 'rows': строк сводок, 'watermark': новый водяной знак}
+    """
+    state, _ = SalesRollupState.objects.get_or_create(pk=1)
+    until = timezone.now() - timedelta(seconds=settings.SALES_ROLLUP_SAFETY_LAG)
+    changed = Order.objects.filter(updated_at__lt=until)
+    if state.watermark is not None:
+        changed = changed.filter(updated_at__gte=state.watermark)
+        # Заказ мог измениться и уйти в архив между запусками
+        archived = ArchivedOrder.objects.filter(
+            archived_at__gte=state.watermark, updated_at__gte=state.watermark
+        )
+    else:
+        # Первый запуск: в сводки попадают и заказы, уже перенесенные в архив
+        archived = ArchivedOrder.objects.all()
+    days = changed_days(changed) | changed_days(archived)
+    dirty = list(SalesRollupDirtyDay.objects.values_list('id', 'date'))
+    days.update(day for _, day in dirty)
+
+    rows = sum(rebuild_days(first, last) for first, last in day_spans(days))
+    # Отметки, появившиеся во время пересчета, остаются до следующего запуска
+    SalesRollupDirtyDay.objects.filter(id__in=[pk for pk, _ in dirty]).delete()
+    SalesRollupState.objects.filter(pk=1).update(watermark=until, updated_at=timezone.now())
+    return {'days': len(days), 'rows': rows, 'watermark': until}
+
+
+def rebuild_sales_rollups(first=None, last=None) -> Dict:
+    """
+    Полностью перестраивает сводки за first..last (по умолчанию - за всю историю)
+
+    Returns:
+        Dict: {'days': дней в периоде, 'rows': строк сводок}
+    """
+    until = timezone.now() - timedelta(seconds=settings.SALES_ROLLUP_SAFETY_LAG)
+    full = first is None and last is None
+    if first is None or last is None:
+        bounds = [
+            model.objects.filter(status__in=SALES_STATUSES).aggregate(
+                first=Min(sales_at()), last=Max(sales_at())
+            )
+            for model in (Order, ArchivedOrder)
+        ]
+        moments = [value for bound in bounds for value in bound.values() if value is not None]
+        if not moments:
+            return {'days': 0, 'rows': 0}
+        first = first or timezone.localdate(min(moments))
+        last = last or timezone.localdate(max(moments))
+
+    rows = 0
+    day = first
+    while day <= last:
+        span_last = min(day + timedelta(days=SPAN_DAYS - 1), last)
+        rows += rebuild_days(day, span_last)
+        day = span_last + timedelta(days=1)
+    if full:
+        # Вся история пересчитана - инкрементальный пересчет продолжит с этого момента
+        SalesRollupState.objects.update_or_create(pk=1, defaults={'watermark': until})
+    return {'days': (last - first).days + 1, 'rows': rows}
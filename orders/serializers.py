@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from datetime import timedelta
 from decimal import Decimal
-from .models import Order, OrderItem, DeliveryAddress
+from django.utils import timezone
+from .models import Order, OrderItem, DeliveryAddress, ReplenishmentSuggestion
 from products.serializers import ProductSerializer
+from procurement.fieldsets import SparseFieldsetSerializerMixin
 
 
 class DeliveryAddressSerializer(serializers.ModelSerializer):
@@ -23,12 +26,14 @@ class DeliveryAddressSerializer(serializers.ModelSerializer):
         return representation
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для позиции заказа"""
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
+    sparse_dependencies = {'total': ('price', 'quantity')}
+    
     class Meta:
         model = OrderItem
         fields = ('id', 'product', 'product_id', 'quantity', 'price', 'total', 'created_at')
@@ -37,11 +42,12 @@ class OrderItemSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Добавляем вычисляемое поле total"""
         representation = super().to_representation(instance)
-        representation['total'] = instance.get_total()
+        if 'total' in self.fields:
+            representation['total'] = instance.get_total()
         return representation
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для заказа"""
     items = OrderItemSerializer(many=True, read_only=True)
     delivery_address = DeliveryAddressSerializer(read_only=True)
@@ -49,6 +55,8 @@ class OrderSerializer(serializers.ModelSerializer):
     items_count = serializers.IntegerField(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     
+    sparse_dependencies = {'status_display': ('status',)}
+    
     class Meta:
         model = Order
         fields = (
@@ -64,27 +72,71 @@ class OrderSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Добавляем вычисляемые поля"""
         representation = super().to_representation(instance)
-        representation['items_count'] = instance.get_items_count()
+        if 'items_count' in self.fields:
+            representation['items_count'] = instance.get_items_count()
         return representation
 
 
+class StoreOrderItemSerializer(serializers.ModelSerializer):
+    """Сериализатор входящей позиции заказа для магазина"""
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    total = serializers.DecimalField(source='get_total', max_digits=12, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = OrderItem
+        fields = (
+            'id', 'order', 'product', 'product_name', 'sku', 'quantity',
+            'price', 'total', 'status', 'status_display', 'created_at'
+        )
+        read_only_fields = fields
+
+
+class ReplenishmentSuggestionSerializer(serializers.ModelSerializer):
+    """Сериализатор рекомендации по пополнению товара для магазина"""
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    current_stock = serializers.IntegerField(source='product.stock_quantity', read_only=True)
+    
+    class Meta:
+        model = ReplenishmentSuggestion
+        fields = (
+            'product', 'product_name', 'sku', 'current_stock', 'stock_quantity',
+            'daily_demand', 'demand_std', 'lead_time_demand', 'safety_stock',
+            'reorder_point', 'suggested_quantity', 'days_of_cover', 'computed_at'
+        )
+        read_only_fields = fields
+
+
+class OrderLineSerializer(serializers.Serializer):
+    """Позиция заказа, переданная напрямую: товар, количество и ожидаемая цена"""
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        required=False,
+        help_text="Цена, которую ожидает клиент; если она изменилась, заказ не создается"
+    )
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания заказа"""
-    items = serializers.ListField(
-        child=serializers.DictField(),
-        write_only=True,
-        help_text="Список товаров: [{'product_id': 1, 'quantity': 2}, ...]"
+    MAX_ITEMS = 5000
+    
+    delivery_address_id = serializers.IntegerField(required=False, allow_null=True)
+    items = OrderLineSerializer(
+        many=True,
+        required=False,
+        allow_empty=False,
+        max_length=MAX_ITEMS,
+        help_text="Список товаров: [{'product_id': 1, 'quantity': 2}, ...]; без него заказ создается из корзины"
     )
     
     class Meta:
         model = Order
         fields = ('delivery_address_id', 'items', 'notes')
-    
-    def validate_items(self, value):
-        """Валидация списка товаров"""
-        if not value or len(value) == 0:
-            raise serializers.ValidationError("Список товаров не может быть пустым")
-        return value
 
 
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
@@ -92,4 +144,101 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ('status',)
+        extra_kwargs = {'status': {'required': True}}
+
 
+class OrderBulkStatusSerializer(serializers.Serializer):
+    """Сериализатор для массовой смены статуса заказов"""
+    MAX_ORDERS = 1000
+    
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=MAX_ORDERS
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+
+class BasketLineSerializer(serializers.Serializer):
+    """Позиция списка закупки: товар (по ID, артикулу или названию) и количество"""
+    product_id = serializers.IntegerField(required=False)
+    sku = serializers.CharField(max_length=100, required=False)
+    name = serializers.CharField(max_length=300, required=False)
+    quantity = serializers.IntegerField(min_value=1)
+    
+    def validate(self, attrs):
+        if not any(attrs.get(field) for field in ('product_id', 'sku', 'name')):
+            raise serializers.ValidationError("Укажите product_id, sku или name")
+        return attrs
+
+
+class BasketOptimizeSerializer(serializers.Serializer):
+    """Сериализатор для подбора магазинов по списку закупки"""
+    MAX_ITEMS = 1000
+    
+    items = BasketLineSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+    store_cost = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('0'),
+        default=Decimal('0'),
+        help_text="Стоимость подключения магазина (доставка), учитывается при подборе"
+    )
+    max_stores = serializers.IntegerField(min_value=1, required=False)
+    fill_cart = serializers.BooleanField(
+        default=False,
+        help_text="Добавить подобранные товары в корзину"
+    )
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """Операция над корзиной: add - добавить, set - установить количество, remove - удалить"""
+    OPERATIONS = ('add', 'set', 'remove')
+    
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate(self, attrs):
+        if attrs['op'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError("Не указано количество")
+        return attrs
+
+
+class CartBulkSerializer(serializers.Serializer):
+    """Сериализатор для пакетного изменения корзины"""
+    MAX_OPERATIONS = 500
+    
+    # Каждая операция проверяется отдельно, чтобы ошибка в одной не отменяла остальные
+    operations = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_OPERATIONS,
+        help_text="[{'op': 'add', 'product_id': 1, 'quantity': 2}, {'op': 'remove', 'product_id': 3}]"
+    )
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """Параметры отчетов о продажах (/api/analytics/)"""
+    DEFAULT_DAYS = 30
+    
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    store = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(
+        choices=[choice for choice in Order.STATUS_CHOICES if choice[0] != 'pending'],
+        required=False,
+        help_text="Без статуса учитываются все заказы, кроме отмененных"
+    )
+    group_by = serializers.ChoiceField(choices=['day', 'month', 'store', 'status'], default='day')
+    order_by = serializers.ChoiceField(choices=['revenue', 'units', 'orders_count'], default='revenue')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    
+    def validate(self, attrs):
+        date_to = attrs.get('date_to') or timezone.localdate()
+        date_from = attrs.get('date_from') or date_to - timedelta(days=self.DEFAULT_DAYS - 1)
+        if date_from > date_to:
+            raise serializers.ValidationError("date_from не может быть позже date_to")
+        attrs['date_from'] = date_from
+        attrs['date_to'] = date_to
+        return attrs
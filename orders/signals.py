@@ -0,0 +1,13 @@
+"""
+Сигналы приложения заказов
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Order
+from .rollups import mark_deleted_order
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    """День удаленного заказа пересчитывается в сводках продаж"""
+    mark_deleted_order(instance)
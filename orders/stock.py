@@ -0,0 +1,94 @@
+"""
+Резервирование остатков товаров при оформлении заказа
+
+Остаток списывается условным UPDATE ... SET stock_quantity = stock_quantity - n
+WHERE id = ... AND stock_quantity >= n: проверка и списание выполняются
+атомарно в БД, число обновленных строк показывает, хватило ли товара.
+Каждый товар обновляется своим UPDATE в порядке возрастания ID: многострочный
+UPDATE блокирует строки в порядке обхода плана, а не в порядке ID, и
+параллельные оформления с общими товарами могли бы заблокировать друг друга
+крест-накрест (deadlock). Возврат остатков идет в том же порядке.
+Если хотя бы одну позицию списать не удалось, все списания откатываются.
+"""
+from typing import Dict
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from products.models import Product
+from products.shards import release_to_shards, reserve_from_shards, schedule_stock_sync
+from products.snapshots import schedule_stock_refresh
+
+
+class InsufficientStock(Exception):
+    """Товара недостаточно на складе или он недоступен"""
+
+    def __init__(self, product_id, quantity):
+        self.product_id = product_id
+        self.quantity = quantity
+        super().__init__(f'Недостаточно товара #{product_id} для списания {quantity} шт.')
+
+
+def reserve_stock(quantities: Dict[int, int]):
+    """
+    Списывает остатки для всех позиций или ни для одной
+
+    Args:
+        quantities: {product_id: количество}
+
+    Raises:
+        InsufficientStock: если какой-либо товар недоступен в нужном количестве
+    """
+    now = timezone.now()
+    sharded = get_sharded_products(quantities)
+    product_ids = sorted(product_id for product_id in quantities if product_id not in sharded)
+    with transaction.atomic():
+        # Сначала строки товаров, затем шарды: у всех оформлений один порядок блокировок.
+        # Исключение откатывает точку сохранения вместе с уже сделанными списаниями
+        for product_id in product_ids:
+            quantity = quantities[product_id]
+            updated = Product.objects.filter(
+                id=product_id, is_available=True, stock_quantity__gte=quantity
+            ).update(stock_quantity=F('stock_quantity') - quantity, updated_at=now)
+            if not updated:
+                raise InsufficientStock(product_id, quantity)
+        for product_id in sorted(sharded):
+            is_available, shards = sharded[product_id]
+            if not (is_available and reserve_from_shards(product_id, shards, quantities[product_id])):
+                raise InsufficientStock(product_id, quantities[product_id])
+        stock_changed(quantities, sharded)
+
+
+def release_stock(quantities: Dict[int, int]):
+    """Возвращает списанные остатки (отмена заказа)"""
+    now = timezone.now()
+    sharded = get_sharded_products(quantities)
+    product_ids = sorted(product_id for product_id in quantities if product_id not in sharded)
+    with transaction.atomic():
+        for product_id in product_ids:
+            Product.objects.filter(id=product_id).update(
+                stock_quantity=F('stock_quantity') + quantities[product_id], updated_at=now
+            )
+        for product_id in sorted(sharded):
+            release_to_shards(product_id, sharded[product_id][1], quantities[product_id])
+        stock_changed(quantities, sharded)
+
+
+def get_sharded_products(quantities):
+    """Возвращает {product_id: (is_available, количество шардов)} для шардированных товаров"""
+    return {
+        product_id: (is_available, shards)
+        for product_id, is_available, shards in Product.objects.filter(
+            id__in=list(quantities), stock_shard_count__gt=0
+        ).values_list('id', 'is_available', 'stock_shard_count')
+    }
+
+
+def stock_changed(quantities, sharded):
+    """QuerySet.update не отправляет сигналы - обновляем производные данные каталога"""
+    if sharded:
+        # Строку шардированного товара не трогаем - сумму шардов запишет задача синхронизации
+        schedule_stock_sync(sharded)
+    product_ids = [product_id for product_id in quantities if product_id not in sharded]
+    if product_ids:
+        # Магазины и версию каталога пересчитает отложенная задача (products/snapshots.py)
+        schedule_stock_refresh(product_ids)
@@ -1,11 +1,13 @@
 """
-Celery задачи для отправки email
+Celery задачи: отправка email и периодическое обслуживание заказов
 """
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from .archive import archive_closed_orders
+from . import carts, forecasting, rollups
 from .models import Order
 
 
@@ -130,3 +132,74 @@ def send_order_confirmation_email(order_id):
         return f"Email подтверждения заказа отправлен на {user.email}"
     except Exception as e:
         return f"Ошибка при отправке email: {str(e)}"
+
+
+@shared_task
+def send_order_status_emails(order_ids, status):
+    """
+    Уведомления о смене статуса для пакета заказов
+
+    Одна задача на всю массовую операцию: заказы и покупатели читаются одним
+    запросом, письма отправляются через одно SMTP-соединение.
+    """
+    orders = Order.objects.filter(id__in=order_ids, status=status).select_related('user').order_by('id')
+    messages = []
+    for order in orders:
+        user = order.user
+        html_message = f"""
+    <html>
+    <body>
+        <h2>Статус заказа #{order.id} изменен</h2>
+        <p>Здравствуйте, {user.get_full_name() or user.username}!</p>
+        <p>Новый статус вашего заказа #{order.id}: <strong>{order.get_status_display()}</strong>.</p>
+        <p><strong>Общая сумма:</strong> {order.total_amount} руб.</p>
+        <br>
+        <p>С уважением,<br>Команда системы закупок</p>
+    </body>
+    </html>
+    """
+        message = EmailMultiAlternatives(
+            subject=f'Заказ #{order.id}: {order.get_status_display()}',
+            body=strip_tags(html_message),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+        )
+        message.attach_alternative(html_message, 'text/html')
+        messages.append(message)
+
+    if not messages:
+        return "Нет заказов для уведомления"
+    try:
+        sent = get_connection(fail_silently=False).send_messages(messages)
+        return f"Отправлено уведомлений о статусе: {sent}"
+    except Exception as e:
+        return f"Ошибка при отправке email: {str(e)}"
+
+
+@shared_task
+def archive_orders():
+    """Периодический перенос старых закрытых заказов в архив (не больше ORDER_ARCHIVE_MAX_BATCHES пакетов)"""
+    archived = archive_closed_orders(max_batches=settings.ORDER_ARCHIVE_MAX_BATCHES)
+    return f"Перенесено в архив заказов: {archived}"
+
+
+@shared_task
+def purge_abandoned_carts():
+    """Периодическое удаление корзин в БД, не менявшихся дольше CART_TTL (не больше CART_GC_MAX_BATCHES пакетов)"""
+    result = carts.purge_abandoned_carts(max_batches=settings.CART_GC_MAX_BATCHES)
+    return f"Удалено брошенных корзин: {result['carts']}, позиций: {result['items']}"
+
+
+@shared_task
+def refresh_sales_rollups():
+    """Периодический пересчет сводок продаж за дни заказов, измененных после водяного знака"""
+    result = rollups.refresh_sales_rollups()
+    return f"Пересчитано дней продаж: {result['days']}, строк сводок: {result['rows']}"
+
+
+@shared_task
+def refresh_replenishment():
+    """Ежедневный пересчет прогноза спроса и рекомендаций по пополнению по свежим сводкам продаж"""
+    rollups.refresh_sales_rollups()
+    result = forecasting.refresh_replenishment()
+    return f"Рекомендаций по пополнению: {result['products']}, требуют заказа: {result['to_order']}"
@@ -1,3 +1,539 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+import numpy as np
+from django.contrib.admin.sites import AdminSite
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from products.catalogue import get_catalogue_version
+from products.models import Product, ProductSnapshot
+from stores.models import Store
+from users.models import User
+from .admin import OrderAdmin
+from .archive import archive_closed_orders
+from .carts import DatabaseCartStore, get_cart_store
+from .forecasting import forecast_demand, suggest_orders
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, SalesRollupDirtyDay
+from .optimizer import BasketOptimizer
+from .rollups import refresh_sales_rollups
+from .stock import InsufficientStock, release_stock, reserve_stock
 
-# Create your tests here.
+
+class StockTestMixin:
+    """Магазин с двумя товарами и оформленный заказ со списанными остатками"""
+
+    def setUp(self):
+        self.store = Store.objects.create(name='Магазин')
+        self.first = Product.objects.create(
+            store=self.store, name='Товар 1', sku='SKU-1', price=Decimal('100.00'), stock_quantity=10
+        )
+        self.second = Product.objects.create(
+            store=self.store, name='Товар 2', sku='SKU-2', price=Decimal('50.00'), stock_quantity=5
+        )
+        self.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='secret')
+        self.staff = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret', is_staff=True
+        )
+
+    def create_order(self, quantities, user=None):
+        reserve_stock({product.id: quantity for product, quantity in quantities.items()})
+        order = Order.objects.create(user=user or self.user, status='confirmed', stock_reserved=True)
+        for product, quantity in quantities.items():
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def assertStock(self, first, second):
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.stock_quantity, self.second.stock_quantity), (first, second))
+
+
+class StockTests(StockTestMixin, TestCase):
+
+    def test_reserve_and_release(self):
+        reserve_stock({self.first.id: 3, self.second.id: 5})
+        self.assertStock(7, 0)
+        release_stock({self.first.id: 3, self.second.id: 5})
+        self.assertStock(10, 5)
+
+    def test_reserve_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock) as error:
+            reserve_stock({self.first.id: 3, self.second.id: 6})
+        self.assertEqual(error.exception.product_id, self.second.id)
+        self.assertStock(10, 5)
+
+    def test_first_failing_product_is_reported(self):
+        with self.assertRaises(InsufficientStock) as error:
+            reserve_stock({self.first.id: 11, self.second.id: 1, 999999: 1})
+        self.assertEqual((error.exception.product_id, error.exception.quantity), (self.first.id, 11))
+        with self.assertRaises(InsufficientStock) as error:
+            reserve_stock({self.first.id: 1, 999999: 1})
+        self.assertEqual(error.exception.product_id, 999999)
+        self.assertStock(10, 5)
+
+    def test_unavailable_product_is_not_reserved(self):
+        Product.objects.filter(id=self.first.id).update(is_available=False)
+        with self.assertRaises(InsufficientStock):
+            reserve_stock({self.first.id: 1})
+        self.assertStock(10, 5)
+
+    def test_item_price_is_fixed_at_creation(self):
+        order = self.create_order({self.first: 2})
+        Product.objects.filter(id=self.first.id).update(price=Decimal('999.00'))
+        item = order.items.get()
+        item.quantity = 3
+        item.save()
+        order.refresh_from_db()
+        self.assertEqual(item.price, Decimal('100.00'))
+        self.assertEqual(order.total_amount, Decimal('300.00'))
+
+
+class StockRefreshTests(StockTestMixin, TestCase):
+
+    def test_stock_change_refreshes_products_and_defers_stores(self):
+        cache.clear()
+        version = get_catalogue_version()
+        with mock.patch('products.tasks.refresh_stores.apply_async') as apply_async:
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    reserve_stock({self.first.id: 1})
+        snapshot = ProductSnapshot.objects.get(product=self.first)
+        self.assertIn('"stock_quantity":8', snapshot.data)
+        # Магазин пересчитывается одной отложенной задачей, версия каталога не меняется
+        apply_async.assert_called_once_with(([self.store.id],), countdown=mock.ANY)
+        self.assertEqual(get_catalogue_version(), version)
+
+
+@override_settings(CART_BACKEND='database')
+class DatabaseCartTotalTests(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_cart_store.cache_clear()
+        self.addCleanup(get_cart_store.cache_clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertTotal(self, expected):
+        cart = Order.objects.get(user=self.user, status='pending')
+        self.assertEqual(cart.total_amount, Decimal(expected))
+        cart.calculate_total()
+        self.assertEqual(cart.total_amount, Decimal(expected))
+
+    def test_add_update_and_remove_keep_total(self):
+        self.client.post('/api/cart/add/', {'product_id': self.first.id, 'quantity': 1}, format='json')
+        self.client.post('/api/cart/add/', {'product_id': self.first.id, 'quantity': 2}, format='json')
+        response = self.client.post('/api/cart/add/', {'product_id': self.second.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTotal('350.00')
+
+        response = self.client.post('/api/cart/bulk/', {'operations': [
+            {'op': 'set', 'product_id': self.first.id, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.data['total_amount'], Decimal('150.00'))
+        self.assertTotal('150.00')
+
+        item = OrderItem.objects.get(order__user=self.user, product=self.second)
+        response = self.client.delete('/api/cart/remove/', {'item_id': item.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTotal('100.00')
+
+    def test_concurrent_add_does_not_lose_quantity(self):
+        store = DatabaseCartStore()
+        store.add(self.user, self.first, 1)
+        # Позиция прочитана до параллельного добавления и сохраняется после него
+        stale = OrderItem.objects.get(order__user=self.user, product=self.first)
+        store.add(self.user, self.first, 2)
+        with mock.patch.object(OrderItem.objects, 'get_or_create', return_value=(stale, False)):
+            item = store.add(self.user, self.first, 4)
+        self.assertEqual(item.quantity, 7)
+        self.assertTotal('700.00')
+
+
+class OrderTransitionTests(StockTestMixin, TestCase):
+
+    def test_release_stock_runs_once(self):
+        order = self.create_order({self.first: 2, self.second: 1})
+        self.assertStock(8, 4)
+        self.assertTrue(order.release_stock())
+        self.assertFalse(Order.objects.get(pk=order.pk).release_stock())
+        self.assertStock(10, 5)
+
+    def test_bulk_transition_cancel_releases_stock_once(self):
+        order = self.create_order({self.first: 2})
+        updated, skipped = Order.bulk_transition([order.id], 'cancelled')
+        self.assertEqual((updated, skipped), ([order.id], {}))
+        updated, skipped = Order.bulk_transition([order.id], 'cancelled')
+        self.assertEqual((updated, skipped), ([], {order.id: 'cancelled'}))
+        self.assertStock(10, 5)
+        self.assertEqual(set(order.items.values_list('status', flat=True)), {'cancelled'})
+
+    def test_bulk_transition_follows_status_transitions(self):
+        order = self.create_order({self.first: 1})
+        self.assertEqual(Order.bulk_transition([order.id], 'delivered'), ([], {order.id: 'confirmed'}))
+        self.assertEqual(Order.bulk_transition([order.id], 'shipped'), ([order.id], {}))
+        self.assertEqual(Order.bulk_transition([order.id], 'delivered'), ([order.id], {}))
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'delivered')
+
+
+class UpdateStatusViewTests(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def update_status(self, user, order, new_status):
+        self.client.force_authenticate(user)
+        return self.client.patch(
+            f'/api/orders/{order.id}/update_status/', {'status': new_status}, format='json'
+        )
+
+    def test_cancel_releases_stock_exactly_once(self):
+        order = self.create_order({self.first: 2, self.second: 1})
+        response = self.update_status(self.user, order, 'cancelled')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertStock(10, 5)
+
+        response = self.update_status(self.user, order, 'cancelled')
+        self.assertEqual(response.status_code, 400)
+        self.assertStock(10, 5)
+
+    def test_cancelled_order_cannot_be_reconfirmed(self):
+        order = self.create_order({self.first: 2}, user=self.staff)
+        self.update_status(self.staff, order, 'cancelled')
+        for new_status in ('confirmed', 'processing', 'shipped'):
+            response = self.update_status(self.staff, order, new_status)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.data)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertFalse(order.stock_reserved)
+        self.assertStock(10, 5)
+
+    def test_owner_can_only_cancel(self):
+        order = self.create_order({self.first: 1})
+        response = self.update_status(self.user, order, 'shipped')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'confirmed')
+
+    def test_pending_cart_cannot_be_cancelled(self):
+        cart = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=cart, product=self.first, quantity=1)
+        self.assertFalse(cart.can_be_cancelled())
+        response = self.update_status(self.user, cart, 'cancelled')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=cart.pk).status, 'pending')
+        self.assertStock(10, 5)
+
+    def test_can_be_cancelled_matches_transitions(self):
+        cancellable = {
+            value for value, _ in Order.STATUS_CHOICES
+            if Order(user=self.user, status=value).can_be_cancelled()
+        }
+        self.assertEqual(cancellable, {'confirmed', 'processing'})
+
+    def test_staff_follows_status_transitions(self):
+        order = self.create_order({self.first: 1}, user=self.staff)
+        self.assertEqual(self.update_status(self.staff, order, 'delivered').status_code, 400)
+        self.assertEqual(self.update_status(self.staff, order, 'shipped').status_code, 200)
+        self.assertEqual(self.update_status(self.staff, order, 'cancelled').status_code, 400)
+        self.assertEqual(self.update_status(self.staff, order, 'delivered').status_code, 200)
+        self.assertEqual(set(order.items.values_list('status', flat=True)), {'delivered'})
+
+
+class OrderAdminTests(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model_admin = OrderAdmin(Order, AdminSite())
+        self.model_admin.message_user = lambda *args, **kwargs: None
+        self.request = RequestFactory().post('/')
+        self.request.user = User.objects.create_superuser(
+            email='root@example.com', username='root', password='secret'
+        )
+
+    def get_form(self, order, new_status):
+        form_class = self.model_admin.get_form(self.request, order, change=True)
+        return form_class(
+            data={'user': order.user_id, 'status': new_status, 'delivery_address': '', 'notes': ''},
+            instance=order
+        )
+
+    def test_form_rejects_transition_out_of_cancelled(self):
+        order = self.create_order({self.first: 1})
+        Order.bulk_transition([order.id], 'cancelled')
+        order.refresh_from_db()
+        form = self.get_form(order, 'confirmed')
+        self.assertFalse(form.is_valid())
+        self.assertIn('status', form.errors)
+
+    def test_save_model_cancel_releases_stock(self):
+        order = self.create_order({self.first: 2})
+        form = self.get_form(order, 'cancelled')
+        self.assertTrue(form.is_valid(), form.errors)
+        obj = form.save(commit=False)
+        self.model_admin.save_model(self.request, obj, form, change=True)
+        self.assertEqual(obj.status, 'cancelled')
+        self.assertFalse(obj.stock_reserved)
+        self.assertStock(10, 5)
+
+
+class ArchiveTests(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        old = timezone.now() - timedelta(days=400)
+        self.delivered = self.close_order({self.first: 2, self.second: 1}, 'delivered', old)
+        self.cancelled = self.close_order({self.first: 1}, 'cancelled', old + timedelta(days=1))
+        # Свежий закрытый и старый незакрытый заказы остаются в рабочих таблицах
+        self.recent = self.close_order({self.second: 1}, 'delivered', timezone.now())
+        self.open = self.create_order({self.first: 1})
+        Order.objects.filter(id=self.open.id).update(created_at=old)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def close_order(self, quantities, status, created_at):
+        order = self.create_order(quantities)
+        Order.objects.filter(id=order.id).update(status=status, created_at=created_at)
+        order.refresh_from_db()
+        return order
+
+    def test_batch_moves_orders_and_items(self):
+        self.assertEqual(archive_closed_orders(older_than_days=30), 2)
+        archived = ArchivedOrder.objects.get(id=self.delivered.id)
+        self.assertEqual(
+            (archived.user_id, archived.status, archived.total_amount, archived.created_at),
+            (self.user.id, 'delivered', Decimal('250.00'), self.delivered.created_at)
+        )
+        self.assertEqual(
+            sorted(ArchivedOrderItem.objects.filter(order=archived).values_list(
+                'product_id', 'store_id', 'product_name', 'sku', 'quantity', 'price'
+            )),
+            [
+                (self.first.id, self.store.id, 'Товар 1', 'SKU-1', 2, Decimal('100.00')),
+                (self.second.id, self.store.id, 'Товар 2', 'SKU-2', 1, Decimal('50.00')),
+            ]
+        )
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)), {self.recent.id, self.open.id}
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[self.delivered.id, self.cancelled.id]).exists())
+
+    def test_second_run_moves_nothing(self):
+        self.assertEqual(archive_closed_orders(older_than_days=30, batch_size=1, max_batches=1), 1)
+        self.assertEqual(list(ArchivedOrder.objects.values_list('id', flat=True)), [self.delivered.id])
+        self.assertEqual(archive_closed_orders(older_than_days=30, batch_size=1), 1)
+        self.assertEqual(archive_closed_orders(older_than_days=30), 0)
+        self.assertEqual((ArchivedOrder.objects.count(), ArchivedOrderItem.objects.count()), (2, 3))
+        self.assertEqual(Order.objects.count(), 2)
+
+    @override_settings(TIME_ZONE='Europe/Moscow')
+    def test_archive_month_uses_local_date(self):
+        # 31 января 22:30 UTC - уже 1 февраля по Москве
+        created_at = datetime(2024, 1, 31, 22, 30, tzinfo=dt_timezone.utc)
+        Order.objects.filter(id=self.delivered.id).update(created_at=created_at)
+        archive_closed_orders(older_than_days=30)
+        self.assertEqual(ArchivedOrder.objects.get(id=self.delivered.id).archive_month, date(2024, 2, 1))
+
+    def test_history_reads_hot_and_archived_orders(self):
+        archive_closed_orders(older_than_days=30)
+        response = self.client.get('/api/orders/my_orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id'], row['archived']) for row in response.data['results']],
+            [
+                (self.recent.id, False), (self.cancelled.id, True),
+                (self.open.id, False), (self.delivered.id, True),
+            ]
+        )
+        archived = next(row for row in response.data['results'] if row['id'] == self.delivered.id)
+        self.assertEqual(archived['items_count'], 2)
+        response = self.client.get('/api/orders/my_orders/', {'status': 'delivered'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent.id, self.delivered.id])
+
+    def test_retrieve_falls_back_to_archive(self):
+        archive_closed_orders(older_than_days=30)
+        response = self.client.get(f'/api/orders/{self.delivered.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(self.client.get(f'/api/orders/{self.open.id}/').status_code, 200)
+        self.assertEqual(self.client.get('/api/orders/999999/').status_code, 404)
+
+        other = User.objects.create_user(email='other@example.com', username='other', password='secret')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/orders/{self.delivered.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/orders/my_orders/').data['results'], [])
+
+
+@override_settings(SALES_ROLLUP_SAFETY_LAG=0)
+class SalesRollupTests(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        # 2 x 100 + 1 x 50
+        self.order = self.create_order({self.first: 2, self.second: 1})
+
+    def report(self, action='sales', **params):
+        response = self.client.get(f'/api/analytics/{action}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assertSales(self, revenue, orders_count, **params):
+        totals = self.report(**params)['totals']
+        self.assertEqual((totals['revenue'], totals['orders_count']), (revenue, orders_count))
+
+    def test_order_is_followed_through_cancel_and_archive(self):
+        refresh_sales_rollups()
+        self.assertSales('250.00', 1)
+        products = self.report('products')['results']
+        self.assertEqual(
+            [(row['product_id'], row['revenue'], row['units']) for row in products],
+            [(self.first.id, '200.00', 2), (self.second.id, '50.00', 1)]
+        )
+
+        Order.bulk_transition([self.order.id], 'cancelled')
+        refresh_sales_rollups()
+        self.assertSales('0.00', 0)
+        self.assertSales('250.00', 1, status='cancelled')
+        self.assertEqual(self.report('products')['results'], [])
+
+        self.assertEqual(archive_closed_orders(older_than_days=0), 1)
+        self.assertFalse(Order.objects.exists())
+        refresh_sales_rollups()
+        self.assertSales('0.00', 0)
+        self.assertSales('250.00', 1, status='cancelled')
+        self.assertEqual(len(self.report('products', status='cancelled')['results']), 2)
+
+    def test_order_cancelled_and_archived_between_runs(self):
+        refresh_sales_rollups()
+        Order.bulk_transition([self.order.id], 'cancelled')
+        archive_closed_orders(older_than_days=0)
+        refresh_sales_rollups()
+        self.assertSales('0.00', 0)
+        self.assertSales('250.00', 1, status='cancelled')
+
+    def test_deleted_order_day_is_recomputed(self):
+        refresh_sales_rollups()
+        self.order.delete()
+        self.assertEqual(SalesRollupDirtyDay.objects.count(), 1)
+        refresh_sales_rollups()
+        self.assertSales('0.00', 0)
+        self.assertFalse(SalesRollupDirtyDay.objects.exists())
+
+    def test_archiving_does_not_mark_days(self):
+        Order.objects.filter(id=self.order.id).update(status='delivered')
+        refresh_sales_rollups()
+        archive_closed_orders(older_than_days=0)
+        self.assertFalse(SalesRollupDirtyDay.objects.exists())
+        refresh_sales_rollups()
+        self.assertSales('250.00', 1)
+
+    def test_reports_are_scoped_to_managed_stores(self):
+        other_store = Store.objects.create(name='Другой магазин')
+        other = Product.objects.create(
+            store=other_store, name='Товар 3', price=Decimal('30.00'), stock_quantity=5
+        )
+        self.create_order({other: 1})
+        manager = User.objects.create_user(email='manager@example.com', username='manager', password='secret')
+        self.store.managers.add(manager)
+        refresh_sales_rollups()
+
+        self.assertSales('280.00', 2)
+        stores = self.report(group_by='store')['results']
+        self.assertEqual([row['store_id'] for row in stores], [self.store.id, other_store.id])
+
+        self.client.force_authenticate(manager)
+        self.assertSales('250.00', 1)
+        products = self.report('products')['results']
+        self.assertEqual({row['store_id'] for row in products}, {self.store.id})
+        response = self.client.get('/api/analytics/sales/', {'store': other_store.id})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/analytics/sales/').status_code, 403)
+        self.assertEqual(self.client.get('/api/analytics/products/').status_code, 403)
+
+
+class BasketOptimizerTests(SimpleTestCase):
+
+    @staticmethod
+    def offer(product_id, key, store_id, price, stock=10):
+        return {'id': product_id, 'match_key': key, 'store_id': store_id,
+                'price': Decimal(price), 'stock_quantity': stock}
+
+    def test_cheapest_offers_without_store_cost(self):
+        optimizer = BasketOptimizer([
+            self.offer(1, 'a', 1, '10'), self.offer(2, 'a', 2, '9', stock=2), self.offer(3, 'b', 1, '5'),
+        ])
+        result = optimizer.solve({'a': 3, 'b': 1})
+        self.assertEqual(result['allocations']['a'], [(2, 2, 2, 900), (1, 1, 1, 1000)])
+        self.assertEqual(result['items_cost'], 900 * 2 + 1000 + 500)
+        self.assertEqual(result['shortage'], {})
+
+    def test_store_limit_is_respected(self):
+        # Каждый магазин дешевле всех по одной позиции, но все позиции есть в магазине 1
+        optimizer = BasketOptimizer([
+            self.offer(1, 'a', 1, '10'), self.offer(2, 'b', 1, '10'), self.offer(3, 'c', 1, '10'),
+            self.offer(4, 'a', 2, '1'), self.offer(5, 'b', 3, '1'), self.offer(6, 'c', 4, '1'),
+        ], max_stores=2)
+        result = optimizer.solve({'a': 1, 'b': 1, 'c': 1})
+        self.assertLessEqual(len(result['stores']), 2)
+        self.assertEqual(result['shortage'], {})
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['items_cost'], 100 + 1000 + 1000)
+
+    def test_limit_is_kept_when_budget_runs_out(self):
+        offers = [self.offer(store_id, f'k{store_id}', store_id, '1') for store_id in range(1, 30)]
+        optimizer = BasketOptimizer(offers, store_cost=Decimal('1'), max_stores=3, time_budget=0)
+        result = optimizer.solve({f'k{store_id}': 1 for store_id in range(1, 30)})
+        self.assertFalse(result['complete'])
+        self.assertLessEqual(len(result['stores']), 3)
+        self.assertEqual(sum(result['shortage'].values()), 29 - len(result['stores']))
+
+    def test_shortage_when_limit_cannot_cover_lines(self):
+        optimizer = BasketOptimizer([
+            self.offer(1, 'a', 1, '10', stock=5), self.offer(2, 'b', 2, '10', stock=2),
+        ], max_stores=1)
+        result = optimizer.solve({'a': 3, 'b': 4, 'c': 1})
+        self.assertEqual(result['stores'], {1})
+        self.assertEqual(result['shortage'], {'b': 4, 'c': 1})
+        self.assertEqual(result['allocations']['a'], [(1, 1, 3, 1000)])
+
+
+
+class ForecastTests(SimpleTestCase):
+
+    def forecast(self, rates, history_days=28):
+        """Продажи каждого товара - rates[товар] единиц каждый день истории"""
+        product_ids = np.repeat(np.arange(1, len(rates) + 1), history_days)
+        day_index = np.tile(np.arange(history_days), len(rates)).astype(np.int32)
+        units = np.repeat(np.array(rates, dtype=np.float64), history_days)
+        return forecast_demand(
+            product_ids, day_index, units, history_days, first_weekday=2, forecast_weekday=2,
+            lead_time_days=7, review_days=5, half_life_days=7
+        )
+
+    def test_constant_demand(self):
+        forecast = self.forecast([4, 1.5])
+        np.testing.assert_allclose(forecast['daily_demand'], [4, 1.5])
+        np.testing.assert_allclose(forecast['demand_std'], [0, 0], atol=1e-9)
+        np.testing.assert_allclose(forecast['lead_time_demand'], [28, 10.5])
+        np.testing.assert_allclose(forecast['horizon_demand'], [48, 18])
+
+    def test_suggested_quantity_covers_lead_time_and_review(self):
+        result = suggest_orders(self.forecast([4, 4]), np.array([10.0, 29.0]), 7, 0.95)
+        # Постоянный спрос - страховой запас нулевой; 4 * (7 + 5) - 10 = 38,
+        # остаток 29 выше точки заказа 4 * 7 = 28
+        self.assertEqual(result['suggested_quantity'].tolist(), [38, 0])
+        np.testing.assert_allclose(result['days_of_cover'], [2.5, 7.25])
+
+    def test_history_shorter_than_week_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.forecast([4], history_days=6)
+        self.assertEqual(self.forecast([4], history_days=7)['daily_demand'].tolist(), [4])
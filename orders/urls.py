@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, CartViewSet, DeliveryAddressViewSet
+from .views import OrderViewSet, CartViewSet, DeliveryAddressViewSet, SalesAnalyticsViewSet
 
 app_name = 'orders'
 
@@ -8,6 +8,7 @@ router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'cart', CartViewSet, basename='cart')
 router.register(r'delivery-addresses', DeliveryAddressViewSet, basename='delivery-address')
+router.register(r'analytics', SalesAnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,15 +1,29 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from decimal import Decimal
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
-from .models import Order, OrderItem, DeliveryAddress
+from django.db.models import BooleanField, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.http import Http404
+from .models import (
+    ArchivedOrder, DailySales, Order, OrderItem, DeliveryAddress, ProductDailySales, StoreDailySales,
+)
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderStatusUpdateSerializer,
-    OrderItemSerializer, DeliveryAddressSerializer
+    OrderItemSerializer, DeliveryAddressSerializer, BasketOptimizeSerializer,
+    CartBulkSerializer, CartOperationSerializer, OrderBulkStatusSerializer,
+    SalesReportQuerySerializer
 )
 from products.models import Product
-from .tasks import send_order_confirmation_email
+from .tasks import send_order_confirmation_email, send_order_status_emails
+from .fast_serializers import FastArchivedOrderSerializer, FastOrderSerializer, OrderSummarySerializer
+from .optimizer import BasketOptimizer
+from .carts import get_cart_store
+from .stock import InsufficientStock, reserve_stock
+from procurement.mixins import ConditionalGetMixin, FastReadMixin, SparseFieldsetMixin
 
 
 class DeliveryAddressViewSet(viewsets.ModelViewSet):
@@ -28,24 +42,18 @@ class CartViewSet(viewsets.ViewSet):
     """ViewSet для работы с корзиной (неподтвержденными заказами)"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_cart_order(self):
-        """Получает или создает корзину (заказ со статусом pending)"""
-        order, created = Order.objects.get_or_create(
-            user=self.request.user,
-            status='pending',
-            defaults={'total_amount': 0}
-        )
-        return order
+    def get_cart_store(self):
+        """Хранилище корзин по настройке CART_BACKEND (см. orders/carts.py)"""
+        return get_cart_store()
     
     @action(detail=False, methods=['get'])
     def items(self, request):
         """Получение списка товаров в корзине"""
-        order = self.get_cart_order()
-        items = order.items.all()
-        serializer = OrderItemSerializer(items, many=True)
+        cart = self.get_cart_store().get_cart(request.user)
+        serializer = OrderItemSerializer(cart.items, many=True)
         return Response({
-            'order_id': order.id,
-            'total_amount': order.total_amount,
+            'order_id': cart.order_id,
+            'total_amount': cart.total_amount,
             'items': serializer.data
         })
     
@@ -75,23 +83,7 @@ class CartViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order = self.get_cart_order()
-        
-        # Проверяем, есть ли уже этот товар в корзине
-        order_item, created = OrderItem.objects.get_or_create(
-            order=order,
-            product=product,
-            defaults={'quantity': quantity, 'price': product.price}
-        )
-        
-        if not created:
-            # Обновляем количество
-            order_item.quantity += quantity
-            order_item.save()
-        
-        # Пересчитываем общую сумму
-        order.calculate_total()
-        order.save()
+        order_item = self.get_cart_store().add(request.user, product, quantity)
         
         serializer = OrderItemSerializer(order_item)
         return Response({
@@ -110,30 +102,241 @@ class CartViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            order = self.get_cart_order()
-            order_item = OrderItem.objects.get(id=item_id, order=order)
-            order_item.delete()
-            
-            # Пересчитываем общую сумму
-            order.calculate_total()
-            order.save()
-            
-            return Response({'message': 'Товар удален из корзины'})
-        except OrderItem.DoesNotExist:
+        if not self.get_cart_store().remove(request.user, item_id):
             return Response(
                 {'error': 'Товар не найден в корзине'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response({'message': 'Товар удален из корзины'})
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Пакетное изменение корзины: добавление, установка количества и удаление
+        
+        Товары и остатки проверяются одним запросом, изменения применяются
+        одним пакетом, сумма пересчитывается один раз. Операции с ошибками
+        пропускаются и возвращаются в results, остальные применяются.
+        """
+        serializer = CartBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = []
+        operations = []
+        for index, data in enumerate(serializer.validated_data['operations']):
+            operation = CartOperationSerializer(data=data)
+            if operation.is_valid():
+                operations.append((index, operation.validated_data))
+                results.append({'index': index, 'status': 'ok'})
+            else:
+                results.append({'index': index, 'status': 'error', 'errors': operation.errors})
+        
+        store = self.get_cart_store()
+        products = {
+            product['id']: product
+            for product in Product.objects.filter(
+                id__in={operation['product_id'] for _, operation in operations}
+            ).values('id', 'price', 'stock_quantity', 'is_available')
+        }
+        current = store.get_quantities(request.user)
+        quantities = dict(current)
+        
+        for index, operation in operations:
+            product_id = operation['product_id']
+            product = products.get(product_id)
+            error = None
+            if operation['op'] == 'remove':
+                if not quantities.get(product_id):
+                    error = 'Товар не найден в корзине'
+                else:
+                    quantities[product_id] = 0
+            elif product is None or not product['is_available']:
+                error = 'Товар не найден или недоступен'
+            else:
+                quantity = operation['quantity']
+                if operation['op'] == 'add':
+                    quantity += quantities.get(product_id, 0)
+                if quantity > product['stock_quantity']:
+                    error = f'Недостаточно товара на складе. Доступно: {product["stock_quantity"]}'
+                else:
+                    quantities[product_id] = quantity
+            if error:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'non_field_errors': [error]}}
+        
+        changes = {
+            product_id: quantity for product_id, quantity in quantities.items()
+            if current.get(product_id, 0) != quantity
+        }
+        if changes:
+            cart = store.set_quantities(
+                request.user,
+                changes,
+                {product_id: products[product_id]['price'] for product_id in changes if changes[product_id]},
+            )
+        else:
+            cart = store.get_cart(request.user)
+        
+        failed = sum(result['status'] == 'error' for result in results)
+        return Response({
+            'order_id': cart.order_id,
+            'total_amount': cart.total_amount,
+            'applied': len(results) - failed,
+            'failed': failed,
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def optimize(self, request):
+        """
+        Подбор самого дешевого набора магазинов для списка закупки
+        
+        Все предложения по позициям списка читаются одним запросом. С
+        fill_cart=true подобранные товары добавляются в корзину.
+        """
+        serializer = BasketOptimizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        ids = [line['product_id'] for line in data['items'] if line.get('product_id')]
+        keys = {
+            Product.build_match_key(line.get('sku'), line.get('name'))
+            for line in data['items'] if not line.get('product_id')
+        }
+        # Предложения по ключам из списка и по ключам указанных товаров - одним запросом
+        rows = list(
+            Product.objects.filter(
+                Q(id__in=ids)
+                | Q(match_key__in=keys)
+                | Q(match_key__in=Product.objects.filter(id__in=ids).values('match_key'))
+            ).values(
+                'id', 'name', 'store_id', 'store__name', 'store__is_active',
+                'match_key', 'price', 'stock_quantity', 'is_available'
+            )
+        )
+        by_id = {row['id']: row for row in rows}
+        
+        lines = {}
+        not_found = []
+        for index, line in enumerate(data['items']):
+            if line.get('product_id'):
+                row = by_id.get(line['product_id'])
+                if row is None:
+                    not_found.append(index)
+                    continue
+                key = row['match_key']
+            else:
+                key = Product.build_match_key(line.get('sku'), line.get('name'))
+            lines[key] = lines.get(key, 0) + line['quantity']
+        
+        optimizer = BasketOptimizer(
+            [
+                row for row in rows
+                if row['is_available'] and row['store__is_active'] and row['stock_quantity'] > 0
+            ],
+            store_cost=data['store_cost'],
+            max_stores=data.get('max_stores'),
+            time_budget=settings.BASKET_OPTIMIZER_TIME_BUDGET,
+        )
+        result = optimizer.solve(lines)
+        
+        response = self.build_optimize_response(result, lines, by_id, data['store_cost'])
+        response['not_found'] = not_found
+        if data['fill_cart']:
+            response['cart'] = self.fill_cart(result['allocations'], by_id)
+        return Response(response)
+    
+    @staticmethod
+    def build_optimize_response(result, lines, by_id, store_cost):
+        cents = Decimal('0.01')
+        stores = {}
+        response_lines = []
+        for key, quantity in lines.items():
+            allocations = []
+            for product_id, store_id, allocated, price in result['allocations'].get(key, ()):
+                row = by_id[product_id]
+                subtotal = Decimal(price * allocated) * cents
+                store = stores.setdefault(store_id, {
+                    'store_id': store_id,
+                    'store_name': row['store__name'],
+                    'subtotal': Decimal('0.00'),
+                    'items_count': 0,
+                })
+                store['subtotal'] += subtotal
+                store['items_count'] += 1
+                allocations.append({
+                    'product_id': product_id,
+                    'name': row['name'],
+                    'store_id': store_id,
+                    'quantity': allocated,
+                    'price': row['price'],
+                    'total': subtotal,
+                })
+            response_lines.append({
+                'key': key,
+                'quantity': quantity,
+                'allocations': allocations,
+                'shortage': result['shortage'].get(key, 0),
+            })
+        
+        items_total = Decimal(result['items_cost']) * cents
+        stores_total = store_cost * len(stores)
+        return {
+            'lines': response_lines,
+            'stores': sorted(stores.values(), key=lambda store: store['store_id']),
+            'items_total': items_total,
+            'stores_cost_total': stores_total,
+            'total': items_total + stores_total,
+            'complete': result['complete'],
+        }
+    
+    def fill_cart(self, allocations, by_id):
+        """Добавляет подобранные товары в корзину пакетными запросами"""
+        quantities = {}
+        for taken in allocations.values():
+            for product_id, _, quantity, _ in taken:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        cart = self.get_cart_store().add_many(
+            self.request.user,
+            quantities,
+            {product_id: by_id[product_id]['price'] for product_id in quantities},
+        )
+        return {
+            'order_id': cart.order_id,
+            'total_amount': cart.total_amount,
+            'items_added': len(quantities),
+        }
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastReadMixin,
+                   viewsets.ModelViewSet):
     """ViewSet для работы с заказами"""
     serializer_class = OrderSerializer
+    fast_list_serializer_class = FastOrderSerializer
+    fast_retrieve = True
     permission_classes = [permissions.IsAuthenticated]
+    sparse_actions = ('list', 'retrieve')
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('items__product')
+        queryset = Order.objects.filter(user=self.request.user).prefetch_related('items__product')
+        return self.get_sparse_queryset(queryset)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Детальный просмотр заказа; заказ, перенесенный в архив, читается из архивных таблиц"""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            serializer = FastArchivedOrderSerializer(context=self.get_serializer_context())
+            try:
+                rows = serializer.render(serializer.prepare_queryset(
+                    ArchivedOrder.objects.filter(user=request.user, pk=kwargs[lookup_url_kwarg])
+                ))
+            except (TypeError, ValueError):
+                raise Http404
+            if not rows:
+                raise Http404
+            return Response(rows[0])
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -142,26 +345,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderStatusUpdateSerializer
         return OrderSerializer
     
-    @transaction.atomic
-    def create(self, request):
-        """Создание заказа из корзины"""
-        serializer = OrderCreateSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        # Получаем корзину (pending заказ)
-        cart_order = Order.objects.filter(
-            user=request.user,
-            status='pending'
-        ).prefetch_related('items__product').first()
-        
-        if not cart_order or cart_order.items.count() == 0:
-            return Response(
-                {'error': 'Корзина пуста'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Проверяем адрес доставки
-        delivery_address_id = serializer.validated_data.get('delivery_address_id')
+    def get_delivery_address(self, request, delivery_address_id):
+        """Возвращает (адрес, None) или (None, ответ с ошибкой)"""
         if delivery_address_id:
             try:
                 delivery_address = DeliveryAddress.objects.get(
@@ -169,7 +354,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                     user=request.user
                 )
             except DeliveryAddress.DoesNotExist:
-                return Response(
+                return None, Response(
                     {'error': 'Адрес доставки не найден'},
                     status=status.HTTP_404_NOT_FOUND
                 )
@@ -181,22 +366,59 @@ class OrderViewSet(viewsets.ModelViewSet):
             ).first()
             
             if not delivery_address:
-                return Response(
+                return None, Response(
                     {'error': 'Не указан адрес доставки'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+        return delivery_address, None
+    
+    @transaction.atomic
+    def create(self, request):
+        """Создание заказа из корзины или из переданного списка позиций"""
+        serializer = OrderCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        # Проверяем наличие всех товаров
-        for item in cart_order.items.all():
-            if not item.product.can_be_ordered(item.quantity):
-                return Response(
-                    {
-                        'error': f'Товар "{item.product.name}" недоступен в количестве {item.quantity}'
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if serializer.validated_data.get('items'):
+            return self.create_from_lines(request, serializer.validated_data)
+        
+        # Получаем корзину из хранилища корзин (pending заказ или Redis)
+        cart_store = get_cart_store()
+        cart = cart_store.get_cart(request.user)
+        
+        if not cart.items:
+            return Response(
+                {'error': 'Корзина пуста'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Проверяем адрес доставки
+        delivery_address, error = self.get_delivery_address(
+            request, serializer.validated_data.get('delivery_address_id')
+        )
+        if error:
+            return error
+        
+        # Списываем остатки всех позиций условными UPDATE; при нехватке любого
+        # товара списания откатываются целиком (см. orders/stock.py)
+        quantities = {}
+        for item in cart.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        try:
+            reserve_stock(quantities)
+        except InsufficientStock as e:
+            product = next(item.product for item in cart.items if item.product_id == e.product_id)
+            return Response(
+                {
+                    'error': f'Товар "{product.name}" недоступен в количестве {e.quantity}'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Корзина из Redis записывается в БД только здесь, одним пакетом
+        cart_order = cart_store.persist(request.user, cart)
         
         # Обновляем заказ
+        cart_order.stock_reserved = True
         cart_order.delivery_address = delivery_address
         cart_order.status = 'confirmed'
         cart_order.confirmed_at = timezone.now()
@@ -212,9 +434,102 @@ class OrderViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
+    def create_from_lines(self, request, data):
+        """
+        Создание заказа из списка позиций без корзины (интеграции B2B)
+        
+        Товары, цены и остатки проверяются одним запросом, остатки списываются
+        пакетными UPDATE, позиции записываются одним bulk_create, сумма
+        считается один раз. Если хотя бы одна позиция не проходит проверку,
+        заказ не создается и возвращаются ошибки всех позиций.
+        """
+        delivery_address, error = self.get_delivery_address(request, data.get('delivery_address_id'))
+        if error:
+            return error
+        
+        quantities = {}
+        expected_prices = {}
+        for line in data['items']:
+            product_id = line['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + line['quantity']
+            if 'price' in line:
+                expected_prices.setdefault(product_id, line['price'])
+        
+        products = {
+            product['id']: product
+            for product in Product.objects.filter(id__in=list(quantities)).values(
+                'id', 'name', 'store_id', 'price', 'stock_quantity', 'is_available'
+            )
+        }
+        errors = []
+        for index, line in enumerate(data['items']):
+            product_id = line['product_id']
+            product = products.get(product_id)
+            if product is None or not product['is_available']:
+                error = 'Товар не найден или недоступен'
+            elif product_id in expected_prices and expected_prices[product_id] != product['price']:
+                error = f'Цена товара изменилась. Текущая цена: {product["price"]}'
+            elif quantities[product_id] > product['stock_quantity']:
+                error = f'Недостаточно товара на складе. Доступно: {product["stock_quantity"]}'
+            else:
+                continue
+            errors.append({'index': index, 'product_id': product_id, 'error': error})
+        if errors:
+            return Response(
+                {'error': 'Заказ не может быть оформлен', 'items': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            reserve_stock(quantities)
+        except InsufficientStock as e:
+            return Response(
+                {
+                    'error': f'Товар "{products[e.product_id]["name"]}" недоступен в количестве {e.quantity}'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        total_amount = sum(
+            (products[product_id]['price'] * quantity for product_id, quantity in quantities.items()),
+            Decimal('0.00')
+        )
+        order = Order.objects.create(
+            user=request.user,
+            delivery_address=delivery_address,
+            status='confirmed',
+            confirmed_at=timezone.now(),
+            notes=data.get('notes', ''),
+            total_amount=total_amount,
+            stock_reserved=True,
+        )
+        # bulk_create не вызывает OrderItem.save - сумма заказа уже посчитана
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order, product_id=product_id, store_id=products[product_id]['store_id'],
+                    status=order.status, quantity=quantity, price=products[product_id]['price'],
+                )
+                for product_id, quantity in quantities.items()
+            ],
+            batch_size=1000
+        )
+        
+        send_order_confirmation_email.delay(order.id)
+        
+        # Большой заказ отдаем облегченным сериализатором фиксированным числом запросов
+        serializer = FastOrderSerializer()
+        data = serializer.render(serializer.prepare_queryset(Order.objects.filter(id=order.id)))[0]
+        return Response(data, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
-        """Обновление статуса заказа (для администраторов)"""
+        """
+        Обновление статуса заказа
+        
+        Администратор переводит заказ по Order.STATUS_TRANSITIONS, владелец
+        заказа может только отменить его. Из отмененного заказа переходов нет.
+        """
         order = self.get_object()
         
         # Проверяем права доступа (только администратор или владелец заказа)
@@ -224,15 +539,237 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
+        serializer = OrderStatusUpdateSerializer(order, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
+        if not request.user.is_staff and new_status != 'cancelled':
+            return Response(
+                {'error': 'Покупатель может только отменить заказ'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Переход проверяется по Order.STATUS_TRANSITIONS под блокировкой строки;
+        # при отмене остатки возвращаются один раз
+        updated, skipped = Order.bulk_transition([order.id], new_status)
+        if not updated:
+            current = skipped.get(order.id, order.status)
+            return Response(
+                {'error': f'Переход из статуса "{current}" в "{new_status}" недопустим'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        order.refresh_from_db(fields=['status', 'stock_reserved', 'updated_at'])
+        return Response(OrderStatusUpdateSerializer(order).data)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """
+        Массовая смена статуса заказов (для администраторов)
+        
+        Переходы проверяются по Order.STATUS_TRANSITIONS, допустимые применяются
+        несколькими UPDATE на весь пакет, уведомления уходят одной задачей.
+        """
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Недостаточно прав'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = OrderBulkStatusSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        order_ids = list(dict.fromkeys(serializer.validated_data['order_ids']))
+        new_status = serializer.validated_data['status']
+        
+        updated, skipped = Order.bulk_transition(order_ids, new_status)
+        if updated:
+            send_order_status_emails.delay(updated, new_status)
         
-        return Response(serializer.data)
+        rejected = [
+            {
+                'id': order_id,
+                'status': skipped[order_id],
+                'error': f'Переход из статуса "{skipped[order_id]}" в "{new_status}" недопустим'
+            }
+            for order_id in order_ids if order_id in skipped
+        ]
+        found = set(updated) | set(skipped)
+        rejected.extend(
+            {'id': order_id, 'status': None, 'error': 'Заказ не найден'}
+            for order_id in order_ids if order_id not in found
+        )
+        return Response({'status': new_status, 'updated': updated, 'rejected': rejected})
     
     @action(detail=False, methods=['get'])
     def my_orders(self, request):
-        """Получение списка заказов текущего пользователя"""
-        orders = self.get_queryset()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        """
+        История заказов текущего пользователя: краткие сводки по страницам
+        
+        Позиции заказа отдаются только в детальном просмотре /api/orders/{id}/.
+        Старые закрытые заказы читаются из архива (orders/archive.py) одним
+        UNION ALL с рабочей таблицей - у них archived=true.
+        Фильтр: ?status=confirmed
+        """
+        serializer = OrderSummarySerializer()
+        status_filter = request.query_params.get('status')
+        querysets = []
+        for model, archived in ((Order, False), (ArchivedOrder, True)):
+            queryset = model.objects.filter(user=request.user)
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            querysets.append(
+                serializer.prepare_queryset(queryset.order_by())
+                .annotate(archived=Value(archived, output_field=BooleanField()))
+            )
+        queryset = querysets[0].union(querysets[1], all=True).order_by('-created_at', '-id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serializer.render(page))
+
+
+class SalesAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Отчеты о продажах за произвольный период по ежедневным сводкам
+    (orders/rollups.py) - без агрегирования позиций заказов
+
+    Сотрудник (is_staff) видит все магазины, менеджер магазина - только свои.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_report_params(self, request):
+        """Возвращает (параметры, ID магазинов или None - все магазины, ответ с ошибкой)"""
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return None, None, Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        store_ids = None
+        if not request.user.is_staff:
+            store_ids = set(request.user.managed_stores.values_list('id', flat=True))
+            if not store_ids:
+                return None, None, Response(
+                    {'error': 'Недостаточно прав'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        if 'store' in params:
+            if store_ids is not None and params['store'] not in store_ids:
+                return None, None, Response(
+                    {'error': 'Недостаточно прав'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            store_ids = {params['store']}
+        return params, store_ids, None
+    
+    @staticmethod
+    def filter_rollups(queryset, params, store_ids):
+        queryset = queryset.filter(date__gte=params['date_from'], date__lte=params['date_to'])
+        if store_ids is not None:
+            queryset = queryset.filter(store_id__in=store_ids)
+        if 'status' in params:
+            return queryset.filter(status=params['status'])
+        # По умолчанию отмененные заказы в продажи не входят
+        return queryset.exclude(status='cancelled')
+    
+    @staticmethod
+    def totals():
+        return {
+            'revenue': Sum('revenue'),
+            'units': Sum('units'),
+            'orders_count': Sum('orders_count'),
+            'items_count': Sum('items_count'),
+        }
+    
+    @staticmethod
+    def render_totals(row):
+        return {
+            'revenue': str((row['revenue'] or Decimal('0')).quantize(Decimal('0.01'))),
+            'units': row['units'] or 0,
+            'orders_count': row['orders_count'] or 0,
+            'items_count': row['items_count'] or 0,
+        }
+    
+    @action(detail=False, methods=['get'])
+    def sales(self, request):
+        """
+        Выручка, единицы товара и заказы за период
+        
+        Параметры: date_from, date_to (по умолчанию последние 30 дней), store,
+        status, group_by=day|month|store|status
+        """
+        params, store_ids, error_response = self.get_report_params(request)
+        if error_response:
+            return error_response
+        
+        group_by = params['group_by']
+        # Без фильтра по магазинам заказы считаются точно по общей сводке
+        model = DailySales if store_ids is None and group_by != 'store' else StoreDailySales
+        queryset = self.filter_rollups(model.objects.all(), params, store_ids)
+        
+        if group_by == 'day':
+            rows = queryset.values('date').annotate(**self.totals()).order_by('date')
+            results = [{'date': row['date'], **self.render_totals(row)} for row in rows]
+        elif group_by == 'month':
+            rows = (
+                queryset.annotate(month=TruncMonth('date')).values('month')
+                .annotate(**self.totals()).order_by('month')
+            )
+            results = [{'month': row['month'], **self.render_totals(row)} for row in rows]
+        elif group_by == 'store':
+            rows = (
+                queryset.values('store_id', 'store__name')
+                .annotate(**self.totals()).order_by('-revenue', 'store_id')
+            )
+            results = [
+                {'store_id': row['store_id'], 'store_name': row['store__name'], **self.render_totals(row)}
+                for row in rows
+            ]
+        else:
+            status_display = dict(Order.STATUS_CHOICES)
+            rows = queryset.values('status').annotate(**self.totals()).order_by('status')
+            results = [
+                {
+                    'status': row['status'],
+                    'status_display': status_display.get(row['status'], row['status']),
+                    **self.render_totals(row)
+                }
+                for row in rows
+            ]
+        
+        return Response({
+            'date_from': params['date_from'],
+            'date_to': params['date_to'],
+            'group_by': group_by,
+            'totals': self.render_totals(queryset.aggregate(**self.totals())),
+            'results': results,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def products(self, request):
+        """
+        Самые продаваемые товары за период
+        
+        Параметры: date_from, date_to, store, status, order_by=revenue|units|orders_count, limit
+        """
+        params, store_ids, error_response = self.get_report_params(request)
+        if error_response:
+            return error_response
+        
+        queryset = self.filter_rollups(ProductDailySales.objects.all(), params, store_ids)
+        rows = (
+            queryset.values('product_id', 'product__name', 'product__sku', 'store_id')
+            .annotate(**self.totals())
+            .order_by(f'-{params["order_by"]}', 'product_id')[:params['limit']]
+        )
+        return Response({
+            'date_from': params['date_from'],
+            'date_to': params['date_to'],
+            'order_by': params['order_by'],
+            'results': [
+                {
+                    'product_id': row['product_id'],
+                    'product_name': row['product__name'],
+                    'sku': row['product__sku'],
+                    'store_id': row['store_id'],
+                    **self.render_totals(row)
+                }
+                for row in rows
+            ],
+        })
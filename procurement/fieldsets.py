@@ -0,0 +1,186 @@
+"""
+Частичные представления (sparse fieldsets) для сериализаторов
+
+Клиент передает ?fields= и ?expand=:
+    ?fields=id,name,price                - только перечисленные поля
+    ?fields=id,name,store.name           - вложенные поля через точку
+    ?fields=id,store&expand=store        - связь целиком вместо ее id
+Если ?fields= не передан, представление остается полным.
+Связанные объекты, указанные в fields без expand, отдаются как первичный ключ.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class Fieldset:
+    """Дерево запрошенных полей одного уровня вложенности"""
+
+    def __init__(self):
+        # None - все поля, иначе множество имен
+        self.fields = None
+        self.expand = set()
+        self.nested = {}
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """Разбирает ?fields= и ?expand=; возвращает None, если их нет"""
+        fields = query_params.get('fields', '')
+        expand = query_params.get('expand', '')
+        if not fields.strip() and not expand.strip():
+            return None
+
+        fieldset = cls()
+        for path in cls._split(fields):
+            fieldset.add_field(path.split('.'))
+        for path in cls._split(expand):
+            fieldset.add_expand(path.split('.'))
+        return fieldset
+
+    @staticmethod
+    def _split(value):
+        return [part.strip() for part in value.split(',') if part.strip()]
+
+    def add_field(self, parts):
+        name, rest = parts[0], parts[1:]
+        if self.fields is None:
+            self.fields = set()
+        self.fields.add(name)
+        if rest:
+            # Вложенный путь подразумевает раскрытие связи
+            self.expand.add(name)
+            self.child(name).add_field(rest)
+
+    def add_expand(self, parts):
+        name, rest = parts[0], parts[1:]
+        self.expand.add(name)
+        if rest:
+            self.child(name).add_expand(rest)
+
+    def child(self, name):
+        return self.nested.setdefault(name, Fieldset())
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.fields is None or name in self.expand
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Миксин для ModelSerializer: оставляет только запрошенные поля
+
+    Корневой сериализатор берет Fieldset из context['fieldset'], вложенные
+    получают свою часть дерева от родителя.
+    """
+    # Поля модели, нужные вычисляемым полям сериализатора
+    sparse_dependencies = {}
+
+    def get_fieldset(self):
+        if hasattr(self, '_fieldset'):
+            return self._fieldset
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is None:
+            return self.context.get('fieldset')
+        # Вложен в сериализатор без поддержки fieldset - отдаем все поля
+        return None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return fields
+
+        for name, field in list(fields.items()):
+            if field.write_only:
+                continue
+            if not fieldset.includes(name):
+                del fields[name]
+                continue
+            if not isinstance(field, serializers.BaseSerializer):
+                continue
+            if fieldset.expands(name):
+                nested = field.child if isinstance(field, serializers.ListSerializer) else field
+                nested._fieldset = fieldset.nested.get(name)
+            else:
+                fields[name] = self.build_compact_field(name, field)
+        return fields
+
+    def build_compact_field(self, name, field):
+        """Поле с первичным ключом (или списком ключей) вместо вложенного объекта"""
+        kwargs = {'many': isinstance(field, serializers.ListSerializer), 'read_only': True}
+        if field.source and field.source != name:
+            kwargs['source'] = field.source
+        return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+def optimize_queryset(queryset, serializer, extra_fields=()):
+    """
+    Подгоняет queryset под поля сериализатора: only() по нужным колонкам,
+    select_related только для раскрытых связей, Prefetch для обратных связей
+    """
+    only, select_related, prefetch_related = _collect_lookups(serializer, '')
+    only.extend(extra_fields)
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset.only(*dict.fromkeys(only))
+
+
+def _collect_lookups(serializer, prefix):
+    model = serializer.Meta.model
+    only = [prefix + model._meta.pk.name]
+    select_related = []
+    prefetch_related = []
+    dependencies = getattr(serializer, 'sparse_dependencies', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        only.extend(prefix + dependency for dependency in dependencies.get(name, ()))
+        source = field.source
+        if source == '*' or '.' in source:
+            continue
+
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            # Обратная связь (например, позиции заказа) - отдельный Prefetch
+            try:
+                relation = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            related_model = relation.related_model
+            if isinstance(field, serializers.ListSerializer):
+                child_queryset = optimize_queryset(
+                    related_model.objects.all(), field.child,
+                    extra_fields=(relation.field.name,)
+                )
+            else:
+                child_queryset = related_model.objects.only(
+                    related_model._meta.pk.name, relation.field.name
+                )
+            prefetch_related.append(Prefetch(prefix + source, queryset=child_queryset))
+        elif isinstance(field, serializers.BaseSerializer):
+            # Раскрытая прямая связь - JOIN и колонки связанной модели
+            only.append(prefix + source)
+            select_related.append(prefix + source)
+            nested_only, nested_select, nested_prefetch = _collect_lookups(
+                field, f'{prefix}{source}__'
+            )
+            only.extend(nested_only)
+            select_related.extend(nested_select)
+            prefetch_related.extend(nested_prefetch)
+        else:
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete:
+                only.append(prefix + model_field.name)
+
+    return only, select_related, prefetch_related
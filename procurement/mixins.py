@@ -0,0 +1,183 @@
+"""
+Общие миксины для ViewSet'ов проекта
+"""
+import hashlib
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .fieldsets import Fieldset, SparseFieldsetSerializerMixin, optimize_queryset
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы (ETag / Last-Modified) для list и retrieve.
+
+    Валидаторы вычисляются одним агрегирующим запросом (MAX по полям-меткам
+    времени и COUNT) по тому же набору строк, который вернул бы ответ.
+    Если клиент прислал актуальные If-None-Match / If-Modified-Since,
+    возвращается 304 без загрузки и сериализации объектов.
+    """
+    # Поля с отметками времени, по которым строится водяной знак коллекции
+    conditional_timestamp_fields = ('updated_at',)
+
+    def get_conditional_validators(self, queryset):
+        """
+        Возвращает пару (etag, last_modified) для набора строк
+
+        last_modified - время последнего изменения (datetime) или None
+        """
+        aggregates = {
+            f'max_{index}': Max(field)
+            for index, field in enumerate(self.conditional_timestamp_fields)
+        }
+        aggregates['count'] = Count('pk')
+        values = queryset.order_by().aggregate(**aggregates)
+
+        timestamps = [
+            values[f'max_{index}']
+            for index in range(len(self.conditional_timestamp_fields))
+            if values[f'max_{index}'] is not None
+        ]
+        last_modified = max(timestamps) if timestamps else None
+
+        # В ETag входят путь с параметрами (фильтры, страница, сортировка),
+        # формат ответа и пользователь: одинаковые данные в разных
+        # представлениях не должны совпадать по валидатору
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        parts = [
+            self.request.get_full_path(),
+            getattr(renderer, 'format', ''),
+            str(self.request.user.pk or ''),
+        ]
+        parts.extend(str(values[key]) for key in sorted(values))
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, request, queryset, handler, *args, **kwargs):
+        """Отвечает 304 по валидаторам queryset или вызывает handler"""
+        etag, last_modified = self.get_conditional_validators(queryset)
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified_ts
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified_ts is not None:
+                response['Last-Modified'] = http_date(last_modified_ts)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.get_queryset().filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Некорректный идентификатор - пусть get_object вернет 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, queryset, super().retrieve, *args, **kwargs
+        )
+
+
+class FastReadMixin:
+    """
+    Быстрый путь для list (и retrieve при fast_retrieve = True): строки
+    читаются через .values() и рендерятся облегченным сериализатором
+    (fast_list_serializer_class) без построения полей ModelSerializer
+    на каждую строку.
+
+    Облегченный сериализатор должен реализовать prepare_queryset(queryset)
+    и render(rows) и отдавать тот же JSON, что и serializer_class.
+    """
+    fast_list_serializer_class = None
+    fast_retrieve = False
+
+    def use_fast_list(self):
+        return self.fast_list_serializer_class is not None
+
+    def use_fast_retrieve(self):
+        return self.fast_retrieve and self.use_fast_list()
+
+    def get_fast_list_serializer(self):
+        return self.fast_list_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.prepare_queryset(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.render(page))
+        return Response(serializer.render(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_fast_retrieve():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.prepare_queryset(self.filter_queryset(self.get_queryset()))
+        try:
+            rows = serializer.render(
+                queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})[:1]
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if not rows:
+            raise Http404
+        return Response(rows[0])
+
+
+class SparseFieldsetMixin:
+    """
+    Поддержка ?fields= / ?expand= (см. procurement.fieldsets)
+
+    Разобранный Fieldset передается сериализатору через контекст, а queryset
+    для действий из sparse_actions подгоняется под запрошенные поля:
+    only() по нужным колонкам и JOIN только для раскрытых связей.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = Fieldset.from_query_params(self.request.query_params)
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def get_sparse_queryset(self, queryset):
+        """Оптимизирует queryset под запрошенные поля, если они заданы"""
+        if self.action not in self.sparse_actions or self.get_fieldset() is None:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            return queryset
+        serializer = serializer_class(context=self.get_serializer_context())
+        return optimize_queryset(queryset, serializer)
+
+    def use_fast_list(self):
+        # Облегченные сериализаторы отдают только полное представление
+        return self.get_fieldset() is None and super().use_fast_list()
+
+    def use_fast_retrieve(self):
+        return self.get_fieldset() is None and super().use_fast_retrieve()
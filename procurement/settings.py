@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from celery.schedules import crontab
 
 # Load environment variables
 load_dotenv()
@@ -184,6 +185,82 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Периодические задачи (celery -A procurement beat)
+CELERY_BEAT_SCHEDULE = {
+    'archive-closed-orders': {
+        'task': 'orders.tasks.archive_orders',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'purge-abandoned-carts': {
+        'task': 'orders.tasks.purge_abandoned_carts',
+        'schedule': crontab(minute=15),
+    },
+    'refresh-sales-rollups': {
+        'task': 'orders.tasks.refresh_sales_rollups',
+        'schedule': crontab(minute='*/10'),
+    },
+    'refresh-replenishment': {
+        'task': 'orders.tasks.refresh_replenishment',
+        'schedule': crontab(minute=30, hour=4),
+    },
+}
+
+# Cache Configuration
+# Без CACHE_REDIS_URL используется локальный кэш процесса
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время жизни кэша производных данных каталога (фасеты и т.п.), секунды
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', '300'))
+# Лента изменений не отдает изменения моложе этого числа секунд
+CHANGE_FEED_SAFETY_LAG = int(os.getenv('CHANGE_FEED_SAFETY_LAG', '5'))
+# Бюджет времени (в секундах) на подбор магазинов для списка закупки
+BASKET_OPTIMIZER_TIME_BUDGET = float(os.getenv('BASKET_OPTIMIZER_TIME_BUDGET', '0.5'))
+
+# Хранилище корзин: database (заказ pending), redis или local (память процесса)
+CART_BACKEND = os.getenv('CART_BACKEND', 'database')
+CART_REDIS_URL = os.getenv('CART_REDIS_URL', 'redis://localhost:6379/2')
+# Корзина (в Redis или заказ pending в БД) удаляется после этого числа секунд без изменений
+CART_TTL = int(os.getenv('CART_TTL', str(7 * 24 * 3600)))
+# Очистка брошенных корзин в БД: корзин в одной транзакции и пауза между пакетами (секунды)
+CART_GC_BATCH_SIZE = int(os.getenv('CART_GC_BATCH_SIZE', '500'))
+CART_GC_PAUSE = float(os.getenv('CART_GC_PAUSE', '0.1'))
+CART_GC_MAX_BATCHES = int(os.getenv('CART_GC_MAX_BATCHES', '200'))
+# Сумма шардов остатка записывается в товар не чаще этого числа секунд (products/shards.py)
+STOCK_SHARD_SYNC_INTERVAL = int(os.getenv('STOCK_SHARD_SYNC_INTERVAL', '2'))
+# Снапшоты и сводки магазинов после изменения остатков пересчитываются не чаще этого числа секунд (products/snapshots.py)
+STORE_REFRESH_INTERVAL = int(os.getenv('STORE_REFRESH_INTERVAL', '30'))
+# Доставленные и отмененные заказы старше этого числа дней переносятся в архив (orders/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '180'))
+# Заказов в одной транзакции переноса и пакетов за один запуск периодической задачи
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+ORDER_ARCHIVE_MAX_BATCHES = int(os.getenv('ORDER_ARCHIVE_MAX_BATCHES', '100'))
+# Сводки продаж не учитывают изменения заказов моложе этого числа секунд (orders/rollups.py)
+SALES_ROLLUP_SAFETY_LAG = int(os.getenv('SALES_ROLLUP_SAFETY_LAG', '60'))
+# Прогноз спроса и пополнение остатков (orders/forecasting.py): история продаж в днях,
+# полураспад веса старых продаж, срок поставки, период до следующей проверки и уровень сервиса
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', '182'))
+FORECAST_HALF_LIFE_DAYS = float(os.getenv('FORECAST_HALF_LIFE_DAYS', '28'))
+REPLENISHMENT_LEAD_TIME_DAYS = int(os.getenv('REPLENISHMENT_LEAD_TIME_DAYS', '7'))
+REPLENISHMENT_REVIEW_DAYS = int(os.getenv('REPLENISHMENT_REVIEW_DAYS', '7'))
+REPLENISHMENT_SERVICE_LEVEL = float(os.getenv('REPLENISHMENT_SERVICE_LEVEL', '0.95'))
+
+# Изображения товаров: относительные пути из файлов импорта ищутся в этом каталоге
+PRODUCT_IMAGE_IMPORT_DIR = os.getenv('PRODUCT_IMAGE_IMPORT_DIR', str(BASE_DIR / 'import_files' / 'images'))
+PRODUCT_IMAGE_MAX_BYTES = int(os.getenv('PRODUCT_IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+PRODUCT_IMAGE_FETCH_TIMEOUT = int(os.getenv('PRODUCT_IMAGE_FETCH_TIMEOUT', '10'))
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -23,6 +23,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/', include('products.urls')),
+    path('api/', include('stores.urls')),
     path('api/', include('orders.urls')),
 ]
 
@@ -7,13 +7,13 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'store', 'price', 'stock_quantity', 'is_available', 'created_at')
     list_filter = ('is_available', 'store', 'created_at')
     search_fields = ('name', 'description', 'sku')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('stock_shard_count', 'created_at', 'updated_at')
     fieldsets = (
         ('Основная информация', {
             'fields': ('store', 'name', 'description', 'sku')
         }),
         ('Цена и наличие', {
-            'fields': ('price', 'stock_quantity', 'is_available')
+            'fields': ('price', 'stock_quantity', 'stock_shard_count', 'is_available')
         }),
         ('Изображение', {
             'fields': ('image',)
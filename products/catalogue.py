@@ -0,0 +1,35 @@
+"""
+Версия каталога товаров
+
+Версия - счетчик в кэше, который увеличивается при любом изменении товаров
+или магазинов. Ее используют как часть ключа кэша для производных данных
+каталога (фасеты и т.п.): после изменения старые ключи просто перестают
+запрашиваться и истекают сами.
+
+Сохранения через модели увеличивают версию сигналами (products/signals.py).
+Массовые операции (QuerySet.update, bulk_create) должны вызывать
+bump_catalogue_version() сами.
+"""
+from django.core.cache import cache
+
+CATALOGUE_VERSION_KEY = 'products:catalogue_version'
+
+
+def get_catalogue_version() -> int:
+    """Возвращает текущую версию каталога"""
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # add не перезапишет значение, если его успел записать другой процесс
+        cache.add(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalogue_version() -> int:
+    """Увеличивает версию каталога после изменения товаров или магазинов"""
+    try:
+        return cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # Ключа еще нет (или он вытеснен из кэша)
+        cache.add(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        return cache.incr(CATALOGUE_VERSION_KEY)
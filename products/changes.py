@@ -0,0 +1,115 @@
+"""
+Лента изменений каталога для инкрементальной синхронизации
+
+Клиент хранит непрозрачный курсор и запрашивает товары, созданные или
+измененные после него (в том числе ставшие недоступными), и ID удаленных
+товаров. Позиция в ленте - пара (updated_at, id) для товаров и
+(deleted_at, id) для записей об удалении; обе читаются по индексам.
+
+Последние CHANGE_FEED_SAFETY_LAG секунд не отдаются: строки, записанные
+еще не закоммиченными транзакциями, иначе могли бы оказаться позади курсора.
+Гарантия действует, только пока транзакции, меняющие товары, короче этого
+интервала: updated_at ставится при сохранении, а не при коммите. Поэтому
+импорт (products/importers.py) коммитится короткими пакетами строк; новые
+массовые изменения товаров тоже должны коммититься пакетами.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Product, ProductTombstone
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или создан не этим сервером"""
+    pass
+
+
+class ChangeFeed:
+    """Чтение ленты изменений каталога по курсору"""
+
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 1000
+
+    def __init__(self, queryset=None):
+        self.queryset = queryset if queryset is not None else Product.objects.all()
+
+    @staticmethod
+    def encode_cursor(products_position, deleted_position) -> str:
+        data = {
+            'p': [products_position[0].isoformat(), products_position[1]] if products_position else None,
+            'd': [deleted_position[0].isoformat(), deleted_position[1]] if deleted_position else None,
+        }
+        raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """Возвращает пару позиций (товары, удаления); None - с начала ленты"""
+        if not cursor:
+            return None, None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(raw)
+            positions = []
+            for key in ('p', 'd'):
+                value = data.get(key)
+                if value is None:
+                    positions.append(None)
+                else:
+                    positions.append((datetime.fromisoformat(value[0]), int(value[1])))
+            return tuple(positions)
+        except (binascii.Error, ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+            raise InvalidCursor(str(e))
+
+    @staticmethod
+    def after(queryset, field, position):
+        if position is None:
+            return queryset
+        timestamp, pk = position
+        return queryset.filter(
+            Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk})
+        )
+
+    def fetch(self, cursor: str = '', limit: int = DEFAULT_LIMIT, fields=('id', 'updated_at')):
+        """
+        Args:
+            cursor: Курсор из предыдущего ответа; пустой - лента с начала
+            limit: Максимум товаров и максимум удалений в ответе
+            fields: Поля товаров для values()
+
+        Returns:
+            Dict: {'products': строки товаров, 'deleted': ID удаленных,
+                   'next_cursor': курсор, 'has_more': есть ли еще изменения}
+        """
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        products_position, deleted_position = self.decode_cursor(cursor)
+        until = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SAFETY_LAG)
+
+        products = list(
+            self.after(self.queryset, 'updated_at', products_position)
+            .filter(updated_at__lt=until)
+            .order_by('updated_at', 'id')
+            .values(*dict.fromkeys(('id', 'updated_at') + tuple(fields)))[:limit]
+        )
+        tombstones = list(
+            self.after(ProductTombstone.objects.all(), 'deleted_at', deleted_position)
+            .filter(deleted_at__lt=until)
+            .order_by('deleted_at', 'id')
+            .values('id', 'product_id', 'deleted_at')[:limit]
+        )
+
+        if products:
+            products_position = (products[-1]['updated_at'], products[-1]['id'])
+        if tombstones:
+            deleted_position = (tombstones[-1]['deleted_at'], tombstones[-1]['id'])
+
+        return {
+            'products': products,
+            'deleted': [tombstone['product_id'] for tombstone in tombstones],
+            'next_cursor': self.encode_cursor(products_position, deleted_position),
+            'has_more': len(products) == limit or len(tombstones) == limit,
+        }
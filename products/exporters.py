@@ -0,0 +1,100 @@
+"""
+Модуль для потоковой выгрузки каталога товаров (CSV, NDJSON)
+
+Формат колонок совпадает с форматом импорта (см. import_files/README.md),
+поэтому выгруженный файл можно снова загрузить командой import_products.
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+
+
+class ProductExporter:
+    """Класс для потоковой выгрузки товаров"""
+
+    # Колонки в порядке, ожидаемом ProductImporter
+    EXPORT_FIELDS = [
+        'store_name', 'name', 'description', 'sku',
+        'price', 'stock_quantity', 'is_available', 'image',
+    ]
+    # Соответствующие поля модели Product для values_list
+    QUERYSET_FIELDS = [
+        'store__name', 'name', 'description', 'sku',
+        'price', 'stock_quantity', 'is_available', 'image_source',
+    ]
+    FORMATS = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def __init__(self, queryset, chunk_size: int = 2000):
+        """
+        Args:
+            queryset: QuerySet товаров для выгрузки
+            chunk_size: Размер пачки строк, читаемой из курсора БД
+        """
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Читает товары серверным курсором, не держа всю таблицу в памяти"""
+        return self.queryset.values_list(*self.QUERYSET_FIELDS).iterator(
+            chunk_size=self.chunk_size
+        )
+
+    def iter_chunks(self, export_format: str) -> Iterator[str]:
+        """Возвращает генератор текстовых фрагментов в указанном формате"""
+        if export_format == 'csv':
+            return self.iter_csv()
+        if export_format == 'ndjson':
+            return self.iter_ndjson()
+        raise ValueError(f"Неподдерживаемый формат выгрузки: {export_format}")
+
+    def iter_csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.EXPORT_FIELDS)
+
+        for index, row in enumerate(self.iter_rows(), start=1):
+            store_name, name, description, sku, price, stock_quantity, is_available, image = row
+            writer.writerow([
+                store_name, name, description or '', sku or '',
+                price, stock_quantity, 'true' if is_available else 'false', image,
+            ])
+            if index % self.chunk_size == 0:
+                yield self._flush(buffer)
+        yield self._flush(buffer)
+
+    def iter_ndjson(self) -> Iterator[str]:
+        lines = []
+        for row in self.iter_rows():
+            store_name, name, description, sku, price, stock_quantity, is_available, image = row
+            lines.append(json.dumps({
+                'store_name': store_name,
+                'name': name,
+                'description': description,
+                'sku': sku,
+                'price': str(price),
+                'stock_quantity': stock_quantity,
+                'is_available': is_available,
+                'image': image,
+            }, ensure_ascii=False))
+            if len(lines) >= self.chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _flush(buffer: io.StringIO) -> str:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    @staticmethod
+    def encode(chunks: Iterable[str]) -> Iterator[bytes]:
+        for chunk in chunks:
+            if chunk:
+                yield chunk.encode('utf-8')
@@ -0,0 +1,173 @@
+"""
+Облегченная сериализация товаров для списковых эндпоинтов
+
+ModelSerializer на каждой строке заново строит поля и вложенные
+сериализаторы. Здесь строки читаются через .values() только с нужными
+колонками, а значения преобразуются заранее подготовленными функциями.
+Результат совпадает с выводом ProductSerializer / StoreSerializer байт в байт.
+"""
+import decimal
+from django.db.models import Count
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from stores.models import Store
+from .images import variant_urls
+from .models import Product
+
+
+def make_decimal_converter(model, field_name):
+    """Конвертер Decimal -> str, как у DecimalField"""
+    model_field = model._meta.get_field(field_name)
+    drf_field = serializers.DecimalField(
+        max_digits=model_field.max_digits,
+        decimal_places=model_field.decimal_places,
+    )
+    if not api_settings.COERCE_DECIMAL_TO_STRING or drf_field.localize:
+        return drf_field.to_representation
+
+    exponent = decimal.Decimal('.1') ** model_field.decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = model_field.max_digits
+
+    def convert(value):
+        if value is None:
+            return ''
+        return '{:f}'.format(value.quantize(exponent, context=context))
+    return convert
+
+
+def make_datetime_converter():
+    """Конвертер datetime -> str, как у DateTimeField (ISO 8601)"""
+    drf_field = serializers.DateTimeField()
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None or output_format.lower() != ISO_8601:
+        return drf_field.to_representation
+
+    field_timezone = drf_field.default_timezone()
+
+    def convert(value):
+        if not value:
+            return None
+        if field_timezone is not None:
+            value = drf_field.enforce_timezone(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def make_file_url_converter(model, field_name, request=None):
+    """Конвертер имени файла -> URL, как у FileField/ImageField"""
+    storage = model._meta.get_field(field_name).storage
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return convert
+
+
+class FastStoreSerializer:
+    """Облегченный аналог StoreSerializer для чтения"""
+
+    fields = (
+        'id', 'name', 'description', 'address', 'phone',
+        'email', 'is_active', 'created_at', 'updated_at',
+    )
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.to_datetime = make_datetime_converter()
+
+    def load(self, store_ids):
+        """Загружает магазины с количеством активных товаров двумя запросами"""
+        store_ids = set(store_ids)
+        if not store_ids:
+            return {}
+        counts = dict(
+            Product.objects.filter(store_id__in=store_ids, is_available=True)
+            .order_by()
+            .values('store_id')
+            .annotate(count=Count('id'))
+            .values_list('store_id', 'count')
+        )
+        stores = {}
+        for row in Store.objects.filter(id__in=store_ids).values(*self.fields):
+            stores[row['id']] = self.render_row(row, counts.get(row['id'], 0))
+        return stores
+
+    def render_row(self, row, active_products_count):
+        to_datetime = self.to_datetime
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'address': row['address'],
+            'phone': row['phone'],
+            'email': row['email'],
+            'is_active': row['is_active'],
+            'created_at': to_datetime(row['created_at']),
+            'updated_at': to_datetime(row['updated_at']),
+            # Вычисляемые поля ModelSerializer добавляет в конец
+            'active_products_count': active_products_count,
+        }
+
+
+class FastProductSerializer:
+    """
+    Облегченный аналог ProductSerializer для чтения
+
+    Использование:
+        serializer = FastProductSerializer(context={'request': request})
+        rows = serializer.prepare_queryset(queryset)[:20]
+        data = serializer.render(rows)
+    """
+
+    fields = (
+        'id', 'store_id', 'name', 'description', 'sku', 'price', 'image',
+        'image_variants', 'is_available', 'stock_quantity', 'created_at', 'updated_at',
+    )
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.store_serializer = FastStoreSerializer(context=self.context)
+        self.to_decimal = make_decimal_converter(Product, 'price')
+        self.to_datetime = make_datetime_converter()
+        self.request = self.context.get('request')
+        self.to_image_url = make_file_url_converter(Product, 'image', self.request)
+
+    def prepare_queryset(self, queryset):
+        """Переводит queryset на чтение только нужных колонок"""
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def load(self, product_ids):
+        """Возвращает словарь {id: представление} для указанных товаров"""
+        rows = list(Product.objects.filter(id__in=set(product_ids)).values(*self.fields))
+        return {item['id']: item for item in self.render(rows)}
+
+    def render(self, rows):
+        rows = list(rows)
+        stores = self.store_serializer.load(row['store_id'] for row in rows)
+        return [self.render_row(row, stores[row['store_id']]) for row in rows]
+
+    def render_row(self, row, store):
+        to_datetime = self.to_datetime
+        return {
+            'id': row['id'],
+            'store': store,
+            'name': row['name'],
+            'description': row['description'],
+            'sku': row['sku'],
+            'price': self.to_decimal(row['price']),
+            'image': self.to_image_url(row['image']),
+            'image_variants': variant_urls(row['image_variants'], self.request),
+            'is_available': row['is_available'],
+            'stock_quantity': row['stock_quantity'],
+            'is_in_stock': row['stock_quantity'] > 0 and row['is_available'],
+            'created_at': to_datetime(row['created_at']),
+            'updated_at': to_datetime(row['updated_at']),
+        }
@@ -0,0 +1,27 @@
+"""
+Фильтры каталога товаров
+"""
+from django.db.models import Q
+from django_filters import rest_framework as filters
+from .models import Product
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Фильтр по списку чисел через запятую: ?stores=1,2,3"""
+    pass
+
+
+class ProductFilter(filters.FilterSet):
+    """Фильтр товаров: цена, наличие, несколько магазинов"""
+    min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    max_price = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    in_stock = filters.BooleanFilter(method='filter_in_stock')
+    stores = NumberInFilter(field_name='store', lookup_expr='in')
+
+    class Meta:
+        model = Product
+        fields = ['store', 'is_available']
+
+    def filter_in_stock(self, queryset, name, value):
+        in_stock = Q(is_available=True, stock_quantity__gt=0)
+        return queryset.filter(in_stock) if value else queryset.exclude(in_stock)
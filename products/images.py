@@ -0,0 +1,184 @@
+"""
+Обработка изображений товаров
+
+Изображение сохраняется один раз на уникальное содержимое (SHA-256),
+для него создаются уменьшенные варианты в WebP и JPEG. Товары ссылаются
+на ProductImage и хранят копию путей вариантов (Product.image_variants),
+поэтому списки не делают JOIN. Источники изображений - загрузка через
+админку/API или путь/URL в файле импорта.
+
+Сами преобразования выполняются в задачах Celery (products/tasks.py) и
+распределяются по процессам воркеров.
+"""
+import hashlib
+import io
+import os
+import urllib.parse
+import urllib.request
+from typing import Dict, Iterable
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .catalogue import bump_catalogue_version
+from .models import Product, ProductImage
+
+# Имя варианта -> максимальный размер стороны в пикселях
+VARIANT_SIZES = {
+    'thumb': 200,
+    'medium': 800,
+}
+# Формат -> (расширение, параметры сохранения Pillow)
+VARIANT_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'BMP': 'bmp'}
+# Каталог дедуплицированных оригиналов (см. product_image_original_path)
+ORIGINALS_PREFIX = 'products/originals/'
+
+
+class ImageSourceError(ValueError):
+    """Изображение не удалось получить или прочитать"""
+    pass
+
+
+def read_image_source(source: str) -> bytes:
+    """
+    Читает изображение по URL (http/https) или по пути внутри
+    PRODUCT_IMAGE_IMPORT_DIR с ограничением размера
+    """
+    max_bytes = settings.PRODUCT_IMAGE_MAX_BYTES
+    scheme = urllib.parse.urlparse(source).scheme.lower()
+    if scheme in ('http', 'https'):
+        try:
+            with urllib.request.urlopen(source, timeout=settings.PRODUCT_IMAGE_FETCH_TIMEOUT) as response:
+                content = response.read(max_bytes + 1)
+        except (OSError, ValueError) as e:
+            raise ImageSourceError(f"Не удалось загрузить {source}: {e}")
+    elif scheme:
+        raise ImageSourceError(f"Неподдерживаемый источник изображения: {source}")
+    else:
+        base_dir = os.path.realpath(settings.PRODUCT_IMAGE_IMPORT_DIR)
+        path = os.path.realpath(os.path.join(base_dir, source))
+        # Пути вне каталога импорта не читаем
+        if os.path.commonpath([base_dir, path]) != base_dir:
+            raise ImageSourceError(f"Путь вне каталога изображений импорта: {source}")
+        try:
+            with open(path, 'rb') as file:
+                content = file.read(max_bytes + 1)
+        except OSError as e:
+            raise ImageSourceError(f"Не удалось прочитать {source}: {e}")
+
+    if len(content) > max_bytes:
+        raise ImageSourceError(f"Изображение больше {max_bytes} байт: {source}")
+    return content
+
+
+def open_image(content: bytes) -> Image.Image:
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageSourceError(f"Файл не является изображением: {e}")
+    return image
+
+
+def store_image(content: bytes) -> ProductImage:
+    """Возвращает ProductImage для содержимого, сохраняя оригинал только один раз"""
+    content_hash = hashlib.sha256(content).hexdigest()
+    existing = ProductImage.objects.filter(hash=content_hash).first()
+    if existing is not None:
+        return existing
+
+    image = open_image(content)
+    extension = EXTENSIONS.get(image.format, 'img')
+    asset = ProductImage(hash=content_hash)
+    asset.original.save(f'{content_hash}.{extension}', ContentFile(content), save=False)
+    try:
+        with transaction.atomic():
+            asset.save()
+    except IntegrityError:
+        # То же изображение параллельно сохранила другая задача
+        asset.original.delete(save=False)
+        return ProductImage.objects.get(hash=content_hash)
+    return asset
+
+
+def generate_variants(asset: ProductImage, content: bytes = None) -> Dict:
+    """Создает уменьшенные варианты изображения во всех форматах"""
+    if content is None:
+        with asset.original.open('rb') as file:
+            content = file.read()
+    image = ImageOps.exif_transpose(open_image(content))
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {}
+    directory = f'products/variants/{asset.hash[:2]}/{asset.hash}'
+    for size_name, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[size_name] = {}
+        for format_name, (extension, options) in VARIANT_FORMATS.items():
+            output = resized
+            if options['format'] == 'JPEG' and output.mode == 'RGBA':
+                # JPEG без прозрачности - накладываем на белый фон
+                background = Image.new('RGB', output.size, (255, 255, 255))
+                background.paste(output, mask=output.getchannel('A'))
+                output = background
+            buffer = io.BytesIO()
+            output.save(buffer, **options)
+            name = f'{directory}/{size_name}.{extension}'
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[size_name][format_name] = default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    asset.variants = variants
+    asset.save(update_fields=['variants', 'updated_at'])
+    return variants
+
+
+def ensure_variants(asset: ProductImage, content: bytes = None) -> ProductImage:
+    if not asset.variants:
+        generate_variants(asset, content)
+    return asset
+
+
+def link_products(asset: ProductImage, product_ids: Iterable[int], source: str = None) -> int:
+    """
+    Привязывает изображение к товарам одним UPDATE и обновляет их снапшоты
+
+    Returns:
+        int: Количество обновленных товаров
+    """
+    # snapshots импортирует этот модуль через fast_serializers
+    from .snapshots import refresh_snapshots
+
+    product_ids = list(product_ids)
+    values = {
+        'image_asset': asset,
+        'image': asset.original.name,
+        'image_variants': asset.variants,
+        'updated_at': timezone.now(),
+    }
+    if source is not None:
+        values['image_source'] = source
+    updated = Product.objects.filter(id__in=product_ids).update(**values)
+    # QuerySet.update не отправляет сигналы - производные данные обновляем сами
+    refresh_snapshots(product_ids)
+    bump_catalogue_version()
+    return updated
+
+
+def variant_urls(variants: Dict, request=None) -> Dict:
+    """Пути вариантов -> URL (абсолютные, если есть request)"""
+    urls = {}
+    for size_name, formats in (variants or {}).items():
+        urls[size_name] = {}
+        for format_name, name in formats.items():
+            url = default_storage.url(name)
+            urls[size_name][format_name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
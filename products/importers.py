@@ -1,17 +1,31 @@
 """
 Модуль для импорта товаров в базу данных
+
+Импорт коммитится пакетами по ProductImporter.CHUNK_SIZE строк, каждый пакет -
+отдельная короткая транзакция. Лента изменений каталога (products/changes.py)
+не отдает последние CHANGE_FEED_SAFETY_LAG секунд, и товар, сохраненный в
+транзакции дольше этого интервала, мог бы оказаться позади курсора клиента.
+Если пакет коммитился дольше половины интервала, следующий пакет уменьшается
+вдвое. Ошибка в середине импорта оставляет уже закоммиченные пакеты.
 """
+import time
 from decimal import Decimal, InvalidOperation
+from functools import partial
 from typing import List, Dict, Tuple
+from django.conf import settings
 from django.db import transaction
 from stores.models import Store
 from products.models import Product
+from products.snapshots import deferred_snapshot_refresh
+from products.tasks import schedule_image_attachments
 
 
 class ProductImporter:
     """Класс для импорта товаров в базу данных"""
     
     REQUIRED_FIELDS = ['store_name', 'name', 'price']
+    # Строк в одной транзакции импорта
+    CHUNK_SIZE = 500
     
     def __init__(self, dry_run: bool = False, verbose: bool = True):
         """
@@ -25,9 +39,12 @@ class ProductImporter:
             'processed': 0,
             'created': 0,
             'updated': 0,
+            'unchanged': 0,
             'skipped': 0,
             'errors': []
         }
+        # Источник изображения -> ID товаров; одна задача загрузки на источник
+        self.pending_images = {}
     
     def validate_row(self, row_data: Dict, row_number: int) -> Tuple[bool, List[str]]:
         """
@@ -85,6 +102,10 @@ class ProductImporter:
         # Артикул
         normalized['sku'] = str(row_data.get('sku', '')).strip() or None
         
+        # Изображение: путь относительно PRODUCT_IMAGE_IMPORT_DIR или URL
+        image = row_data.get('image')
+        normalized['image'] = str(image).strip() if image is not None else ''
+        
         # Цена
         price_str = str(row_data.get('price', '0')).replace(',', '.').strip()
         try:
@@ -163,16 +184,30 @@ class ProductImporter:
             
             if product:
                 # Обновляем существующий товар
-                product.name = normalized['name']
-                product.description = normalized['description']
-                product.price = normalized['price']
-                product.stock_quantity = normalized['stock_quantity']
-                product.is_available = normalized['is_available']
+                values = {
+                    'name': normalized['name'],
+                    'description': normalized['description'],
+                    'price': normalized['price'],
+                    'stock_quantity': normalized['stock_quantity'],
+                    'is_available': normalized['is_available'],
+                }
                 if normalized['sku']:
-                    product.sku = normalized['sku']
-                product.save()
-                self.stats['updated'] += 1
-                action = "обновлен"
+                    values['sku'] = normalized['sku']
+                changed = [
+                    field for field, value in values.items()
+                    if getattr(product, field) != value
+                ]
+                if changed:
+                    for field in changed:
+                        setattr(product, field, values[field])
+                    # Сохраняются только измененные поля; неизмененные товары
+                    # не трогаются и не попадают в ленту изменений каталога
+                    product.save(update_fields=changed + ['updated_at'])
+                    self.stats['updated'] += 1
+                    action = "обновлен"
+                else:
+                    self.stats['unchanged'] += 1
+                    action = "не изменился"
             else:
                 # Создаем новый товар
                 product = Product.objects.create(
@@ -187,6 +222,9 @@ class ProductImporter:
                 self.stats['created'] += 1
                 action = "создан"
             
+            if normalized['image'] and normalized['image'] != product.image_source:
+                self.pending_images.setdefault(normalized['image'], []).append(product.id)
+            
             self.stats['processed'] += 1
             return True, f"Строка {row_number}: товар '{normalized['name']}' {action}"
             
@@ -210,10 +248,11 @@ class ProductImporter:
             print(f"\nНачало импорта товаров (dry_run={self.dry_run})...")
             print(f"Найдено строк для обработки: {len(parsed_data)}\n")
         
-        # Используем транзакцию только если не dry_run
+        # Используем транзакции только если не dry_run
+        # Снапшоты товаров перестраиваются одним пакетом после последнего пакета строк
         if not self.dry_run:
-            with transaction.atomic():
-                self._process_items(parsed_data)
+            with deferred_snapshot_refresh():
+                self._process_chunks(parsed_data)
         else:
             self._process_items(parsed_data)
         
@@ -223,12 +262,30 @@ class ProductImporter:
             print(f"  Обработано: {self.stats['processed']}")
             print(f"  Создано: {self.stats['created']}")
             print(f"  Обновлено: {self.stats['updated']}")
+            print(f"  Без изменений: {self.stats['unchanged']}")
             print(f"  Пропущено: {self.stats['skipped']}")
             print(f"  Ошибок: {len(self.stats['errors'])}")
             print(f"{'='*50}\n")
         
         return self.stats
     
+    def _process_chunks(self, parsed_data: List[Dict]):
+        """Сохраняет строки пакетами, каждый пакет - в своей транзакции"""
+        chunk_size = self.CHUNK_SIZE
+        start = 0
+        while start < len(parsed_data):
+            chunk = parsed_data[start:start + chunk_size]
+            started = time.monotonic()
+            with transaction.atomic():
+                self._process_items(chunk)
+                # Изображения загружаются и обрабатываются задачами Celery после коммита пакета
+                images, self.pending_images = self.pending_images, {}
+                if images:
+                    transaction.on_commit(partial(schedule_image_attachments, images), robust=True)
+            start += len(chunk)
+            if time.monotonic() - started > settings.CHANGE_FEED_SAFETY_LAG / 2:
+                chunk_size = max(1, chunk_size // 2)
+    
     def _process_items(self, parsed_data: List[Dict]):
         """Внутренний метод для обработки элементов"""
         for item in parsed_data:
@@ -9,13 +9,13 @@ from products.importers import ProductImporter
 
 
 class Command(BaseCommand):
-    help = 'Импортирует товары из CSV или Excel файла'
+    help = 'Импортирует товары из CSV, Excel или NDJSON файла'
 
     def add_arguments(self, parser):
         parser.add_argument(
             'file_path',
             type=str,
-            help='Путь к файлу с товарами (CSV или Excel)'
+            help='Путь к файлу с товарами (CSV, Excel или NDJSON)'
         )
         parser.add_argument(
             '--dry-run',
@@ -68,6 +68,8 @@ class Command(BaseCommand):
             
             if file_format == '.csv':
                 parsed_data = FileParser.parse_csv(file_path)
+            elif file_format == '.ndjson':
+                parsed_data = FileParser.parse_ndjson(file_path)
             else:
                 parsed_data = FileParser.parse_excel(file_path, sheet_name=sheet_name)
             
@@ -94,6 +96,7 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.WARNING(f"  Обновлено: {stats['updated']}")
                 )
+                self.stdout.write(f"  Без изменений: {stats['unchanged']}")
                 self.stdout.write(
                     self.style.ERROR(f"  Пропущено: {stats['skipped']}")
                 )
@@ -118,6 +121,7 @@ class Command(BaseCommand):
                     f"Обработано: {stats['processed']}, "
                     f"Создано: {stats['created']}, "
                     f"Обновлено: {stats['updated']}, "
+                    f"Без изменений: {stats['unchanged']}, "
                     f"Ошибок: {len(stats['errors'])}"
                 )
             
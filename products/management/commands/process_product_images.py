@@ -0,0 +1,41 @@
+"""
+Management команда для обработки ранее загруженных изображений товаров
+Использование: python manage.py process_product_images [--sync]
+
+Ставит в очередь Celery задачу на каждый товар, изображение которого еще
+не переведено в общее хранилище с вариантами. Задачи выполняются
+параллельно воркерами Celery.
+"""
+from celery import group
+from django.core.management.base import BaseCommand
+from products.images import ORIGINALS_PREFIX
+from products.models import Product
+from products.tasks import process_uploaded_product_image
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные варианты для ранее загруженных изображений товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Обработать изображения в текущем процессе, без очереди Celery',
+        )
+
+    def handle(self, *args, **options):
+        product_ids = list(
+            Product.objects.exclude(image__isnull=True).exclude(image='')
+            .exclude(image__startswith=ORIGINALS_PREFIX)
+            .values_list('id', flat=True)
+        )
+        self.stdout.write(f'Товаров с необработанными изображениями: {len(product_ids)}')
+        if not product_ids:
+            return
+
+        if options['sync']:
+            processed = sum(process_uploaded_product_image(product_id) for product_id in product_ids)
+            self.stdout.write(self.style.SUCCESS(f'Обработано: {processed}'))
+        else:
+            group(process_uploaded_product_image.s(product_id) for product_id in product_ids).apply_async()
+            self.stdout.write(self.style.SUCCESS('Задачи поставлены в очередь'))
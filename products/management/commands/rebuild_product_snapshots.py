@@ -0,0 +1,94 @@
+"""
+Management команда для перестроения снапшотов товаров и магазинов
+Использование: python manage.py rebuild_product_snapshots [--batch-size 1000] [--workers 4]
+
+Каталог делится на диапазоны ID по batch-size товаров, диапазоны
+обрабатываются параллельно в нескольких процессах. В конце перестраиваются
+сводки магазинов и группы предложений для сравнения цен между магазинами.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from products.models import Product
+from products.matching import refresh_all_product_groups
+from products.snapshots import refresh_product_snapshots, refresh_store_snapshots
+from stores.models import Store
+from stores.stats import refresh_store_stats
+
+
+def _init_worker():
+    # Соединения с БД, унаследованные от родительского процесса, использовать нельзя
+    connections.close_all()
+
+
+def _rebuild_range(id_range):
+    return refresh_product_snapshots(id_range=id_range)['products']
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает снапшоты JSON-представлений товаров и магазинов и группы предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество товаров в одном пакете (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество параллельных процессов (по умолчанию 4, 1 - без параллелизма)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if batch_size <= 0 or workers <= 0:
+            raise CommandError('--batch-size и --workers должны быть больше нуля')
+
+        started = time.perf_counter()
+        ranges = list(self.iter_id_ranges(batch_size))
+        self.stdout.write(f'Пакетов товаров: {len(ranges)}')
+
+        total = 0
+        if workers == 1:
+            for id_range in ranges:
+                total += _rebuild_range(id_range)
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                futures = [executor.submit(_rebuild_range, id_range) for id_range in ranges]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    total += future.result()
+                    if done % 10 == 0 or done == len(futures):
+                        self.stdout.write(f'  Обработано пакетов: {done}/{len(futures)}')
+
+        store_ids = list(Store.objects.values_list('id', flat=True))
+        stores = refresh_store_snapshots(store_ids)
+        refresh_store_stats(store_ids)
+        groups = refresh_all_product_groups()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: товаров {total}, магазинов {stores}, групп предложений {groups} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+
+    @staticmethod
+    def iter_id_ranges(batch_size):
+        """Делит ID товаров на диапазоны по batch_size, читая только индекс"""
+        first = last = None
+        count = 0
+        ids = Product.objects.order_by('id').values_list('id', flat=True)
+        for product_id in ids.iterator(chunk_size=10000):
+            if first is None:
+                first = product_id
+            last = product_id
+            count += 1
+            if count == batch_size:
+                yield first, last
+                first, count = None, 0
+        if first is not None:
+            yield first, last
@@ -0,0 +1,49 @@
+"""
+Management команда для включения шардированных остатков товаров
+Использование: python manage.py shard_stock 15 16 [--shards 16]
+               python manage.py shard_stock 15 --disable
+
+Для товаров распродаж: остаток делится на --shards счетчиков, и параллельные
+оформления списывают из разных строк (см. products/shards.py). --disable
+собирает шарды обратно в остаток товара.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from products.models import Product
+from products.shards import disable_stock_shards, enable_stock_shards
+
+
+class Command(BaseCommand):
+    help = 'Включает или выключает шардированный остаток для товаров с высоким спросом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='+', type=int, help='ID товаров')
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=16,
+            help='Количество шардов остатка (по умолчанию 16)',
+        )
+        parser.add_argument(
+            '--disable',
+            action='store_true',
+            help='Собрать шарды обратно в остаток товара',
+        )
+
+    def handle(self, *args, **options):
+        shards = options['shards']
+        if shards <= 0:
+            raise CommandError('--shards должно быть больше нуля')
+
+        existing = set(Product.objects.filter(id__in=options['product_ids']).values_list('id', flat=True))
+        missing = sorted(set(options['product_ids']) - existing)
+        if missing:
+            raise CommandError(f'Товары не найдены: {missing}')
+
+        for product_id in sorted(existing):
+            if options['disable']:
+                total = disable_stock_shards(product_id)
+                self.stdout.write(f'Товар #{product_id}: шарды собраны, остаток {total}')
+            else:
+                total = enable_stock_shards(product_id, shards)
+                self.stdout.write(f'Товар #{product_id}: остаток {total} разделен на {shards} шардов')
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,76 @@
+"""
+Сопоставление предложений одного товара в разных магазинах
+
+Товары группируются по Product.match_key (нормализованный артикул или
+название). Для каждой группы хранится ProductGroup с лучшей ценой и
+количеством предложений, пересчитываемая пакетно вместе со снапшотами.
+"""
+from typing import Iterable
+from django.db.models import Count, Min, Q
+from .models import Product, ProductGroup
+
+BATCH_SIZE = 1000
+
+
+def refresh_product_groups(keys: Iterable[str]) -> int:
+    """
+    Пересчитывает группы по ключам одним GROUP BY запросом на пакет
+
+    Группы, в которых не осталось доступных предложений, удаляются.
+
+    Returns:
+        int: Количество обновленных групп
+    """
+    keys = sorted({key for key in keys if key})
+    refreshed = 0
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        in_stock = Q(stock_quantity__gt=0)
+        rows = (
+            Product.objects.filter(match_key__in=batch, is_available=True)
+            .order_by()
+            .values('match_key')
+            .annotate(
+                name=Min('name'),
+                best_price=Min('price', filter=in_stock),
+                offers_count=Count('id'),
+                in_stock_count=Count('id', filter=in_stock),
+            )
+        )
+        groups = [
+            ProductGroup(
+                key=row['match_key'],
+                name=row['name'],
+                best_price=row['best_price'],
+                offers_count=row['offers_count'],
+                in_stock_count=row['in_stock_count'],
+            )
+            for row in rows
+        ]
+        ProductGroup.objects.bulk_create(
+            groups,
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['name', 'best_price', 'offers_count', 'in_stock_count', 'updated_at'],
+        )
+        ProductGroup.objects.filter(key__in=batch).exclude(
+            key__in=[group.key for group in groups]
+        ).delete()
+        refreshed += len(groups)
+    return refreshed
+
+
+def refresh_all_product_groups() -> int:
+    """Заполняет пустые ключи сопоставления и перестраивает все группы"""
+    missing = Product.objects.filter(match_key='').only('id', 'sku', 'name')
+    for start in range(0, missing.count(), BATCH_SIZE):
+        products = list(missing[:BATCH_SIZE])
+        for product in products:
+            product.match_key = Product.build_match_key(product.sku, product.name)
+        Product.objects.bulk_update(products, ['match_key'])
+
+    keys = Product.objects.filter(is_available=True).order_by().values_list(
+        'match_key', flat=True
+    ).distinct()
+    ProductGroup.objects.exclude(key__in=keys).delete()
+    return refresh_product_groups(keys.iterator())
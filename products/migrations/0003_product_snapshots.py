@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0001_initial'),
+        ('products', '0002_product_product_store_price_avail_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreSnapshot',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='stores.store', verbose_name='Магазин')),
+                ('data', models.TextField(verbose_name='JSON-представление')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Снапшот магазина',
+                'verbose_name_plural': 'Снапшоты магазинов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSnapshot',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='products.product', verbose_name='Товар')),
+                ('data', models.TextField(verbose_name='JSON-представление')),
+                ('product_updated_at', models.DateTimeField(verbose_name='Версия товара')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stores.store', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Снапшот товара',
+                'verbose_name_plural': 'Снапшоты товаров',
+            },
+        ),
+    ]
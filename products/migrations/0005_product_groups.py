@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductGroup',
+            fields=[
+                ('key', models.CharField(max_length=310, primary_key=True, serialize=False, verbose_name='Ключ сопоставления')),
+                ('name', models.CharField(max_length=300, verbose_name='Название')),
+                ('best_price', models.DecimalField(blank=True, decimal_places=2, help_text='Минимальная цена среди предложений в наличии', max_digits=10, null=True, verbose_name='Лучшая цена')),
+                ('offers_count', models.PositiveIntegerField(default=0, verbose_name='Количество предложений')),
+                ('in_stock_count', models.PositiveIntegerField(default=0, verbose_name='Предложений в наличии')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Группа предложений',
+                'verbose_name_plural': 'Группы предложений',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='match_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Нормализованный артикул или название для сравнения предложений магазинов', max_length=310, verbose_name='Ключ сопоставления'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['match_key', 'price'], name='product_match_key_price_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, unique=True, verbose_name='SHA-256 содержимого')),
+                ('original', models.ImageField(height_field='height', upload_to=products.models.product_image_original_path, verbose_name='Оригинал', width_field='width')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='Высота')),
+                ('variants', models.JSONField(blank=True, default=dict, help_text='{"thumb": {"webp": "путь", "jpeg": "путь"}, ...}', verbose_name='Варианты')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Изображение товара',
+                'verbose_name_plural': 'Изображения товаров',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_source',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Путь или URL изображения из файла импорта', max_length=500, verbose_name='Источник изображения'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_asset',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='products.productimage', verbose_name='Обработанное изображение'),
+        ),
+    ]
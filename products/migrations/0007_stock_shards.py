@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_shard_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Для товаров с высоким спросом остаток делится на счетчики StockShard; 0 - остаток хранится только в товаре', verbose_name='Шардов остатка'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Номер шарда')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Остаток')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Шард остатка',
+                'verbose_name_plural': 'Шарды остатков',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockshard',
+            constraint=models.UniqueConstraint(fields=('product', 'index'), name='stock_shard_product_index_uniq'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+import re
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from stores.models import Store
@@ -33,11 +35,50 @@ class Product(models.Model):
         null=True,
         verbose_name='Изображение'
     )
+    image_asset = models.ForeignKey(
+        'ProductImage',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='products',
+        editable=False,
+        verbose_name='Обработанное изображение'
+    )
+    # Копия ProductImage.variants, чтобы списки товаров читались без JOIN
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
+    image_source = models.CharField(
+        max_length=500,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Источник изображения',
+        help_text='Путь или URL изображения из файла импорта'
+    )
     is_available = models.BooleanField(default=True, verbose_name='Доступен для заказа')
     stock_quantity = models.PositiveIntegerField(
         default=0,
         verbose_name='Количество на складе'
     )
+    stock_shard_count = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Шардов остатка',
+        help_text='Для товаров с высоким спросом остаток делится на счетчики StockShard; '
+                  '0 - остаток хранится только в товаре'
+    )
+    match_key = models.CharField(
+        max_length=310,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Ключ сопоставления',
+        help_text='Нормализованный артикул или название для сравнения предложений магазинов'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
@@ -48,11 +89,59 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['store', 'is_available']),
             models.Index(fields=['sku']),
+            # Фильтры каталога по цене: витрина всегда показывает только доступные товары
+            models.Index(
+                fields=['store', 'price'],
+                name='product_store_price_avail_idx',
+                condition=Q(is_available=True),
+            ),
+            models.Index(
+                fields=['price'],
+                name='product_price_in_stock_idx',
+                condition=Q(is_available=True, stock_quantity__gt=0),
+            ),
+            # Лента изменений каталога читает товары по курсору (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+            # Предложения одного товара в разных магазинах, от дешевых к дорогим
+            models.Index(
+                fields=['match_key', 'price'],
+                name='product_match_key_price_idx',
+                condition=Q(is_available=True),
+            ),
         ]
     
     def __str__(self):
         return f"{self.name} ({self.store.name})"
     
+    @staticmethod
+    def build_match_key(sku=None, name=''):
+        """
+        Ключ для сопоставления одного товара в разных магазинах:
+        артикул без регистра и разделителей, а без артикула - название
+        """
+        if sku and sku.strip():
+            return 'sku:' + re.sub(r'[\W_]+', '', sku.lower())
+        return 'name:' + ' '.join(re.sub(r'[\W_]+', ' ', (name or '').lower()).split())
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Остаток на момент загрузки - ручное изменение остатка шардированного
+        # товара переносится в шарды разницей (см. products/shards.py)
+        loaded = dict(zip(field_names, values))
+        if 'stock_quantity' in loaded:
+            instance._loaded_stock_quantity = loaded['stock_quantity']
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Прежний ключ нужен, чтобы пересчитать группу, из которой товар ушел
+        self._previous_match_key = self.match_key
+        self.match_key = self.build_match_key(self.sku, self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'match_key' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['match_key']
+        super().save(*args, **kwargs)
+    
     def is_in_stock(self):
         """Проверяет наличие товара на складе"""
         return self.stock_quantity > 0 and self.is_available
@@ -60,3 +149,171 @@ class Product(models.Model):
     def can_be_ordered(self, quantity=1):
         """Проверяет, можно ли заказать указанное количество товара"""
         return self.is_available and self.stock_quantity >= quantity
+
+
+class StockShard(models.Model):
+    """
+    Часть остатка товара с высоким спросом
+
+    Списание при оформлении обновляет случайный шард, а не строку товара,
+    поэтому параллельные оформления одного товара не ждут одну блокировку.
+    Product.stock_quantity шардированного товара - сумма шардов на момент
+    последней синхронизации (см. products/shards.py).
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_shards',
+        verbose_name='Товар'
+    )
+    index = models.PositiveSmallIntegerField(verbose_name='Номер шарда')
+    quantity = models.PositiveIntegerField(default=0, verbose_name='Остаток')
+    
+    class Meta:
+        verbose_name = 'Шард остатка'
+        verbose_name_plural = 'Шарды остатков'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='stock_shard_product_index_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}#{self.index}: {self.quantity}"
+
+
+def product_image_original_path(instance, filename):
+    """Оригиналы раскладываются по хэшу содержимого: один файл на одинаковые изображения"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'img'
+    return f'products/originals/{instance.hash[:2]}/{instance.hash}.{extension}'
+
+
+class ProductImage(models.Model):
+    """
+    Изображение товара, дедуплицированное по SHA-256 содержимого
+
+    Одно изображение поставщика может использоваться тысячами товаров.
+    Уменьшенные варианты (WebP/JPEG) создаются задачами Celery
+    (см. products/images.py и products/tasks.py).
+    """
+    hash = models.CharField(max_length=64, unique=True, verbose_name='SHA-256 содержимого')
+    original = models.ImageField(
+        upload_to=product_image_original_path,
+        width_field='width',
+        height_field='height',
+        verbose_name='Оригинал'
+    )
+    width = models.PositiveIntegerField(default=0, verbose_name='Ширина')
+    height = models.PositiveIntegerField(default=0, verbose_name='Высота')
+    variants = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Варианты',
+        help_text='{"thumb": {"webp": "путь", "jpeg": "путь"}, ...}'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Изображение товара'
+        verbose_name_plural = 'Изображения товаров'
+    
+    def __str__(self):
+        return f"Изображение {self.hash[:12]} ({self.width}x{self.height})"
+
+
+class ProductGroup(models.Model):
+    """
+    Группа предложений одного товара в разных магазинах
+
+    Сводные значения пересчитываются после изменений товаров
+    (см. products/matching.py), чтобы сравнение не сканировало каталог.
+    """
+    key = models.CharField(max_length=310, primary_key=True, verbose_name='Ключ сопоставления')
+    name = models.CharField(max_length=300, verbose_name='Название')
+    best_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name='Лучшая цена',
+        help_text='Минимальная цена среди предложений в наличии'
+    )
+    offers_count = models.PositiveIntegerField(default=0, verbose_name='Количество предложений')
+    in_stock_count = models.PositiveIntegerField(default=0, verbose_name='Предложений в наличии')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Группа предложений'
+        verbose_name_plural = 'Группы предложений'
+    
+    def __str__(self):
+        return f"{self.name} ({self.offers_count} предл.)"
+
+
+class ProductTombstone(models.Model):
+    """Запись об удаленном товаре для ленты изменений каталога"""
+    product_id = models.BigIntegerField(verbose_name='ID товара')
+    store_id = models.BigIntegerField(verbose_name='ID магазина')
+    sku = models.CharField(max_length=100, blank=True, null=True, verbose_name='Артикул')
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')
+    
+    class Meta:
+        verbose_name = 'Удаленный товар'
+        verbose_name_plural = 'Удаленные товары'
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_at_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Товар #{self.product_id} удален {self.deleted_at}"
+
+
+class ProductSnapshot(models.Model):
+    """
+    Готовое JSON-представление товара (без вложенного магазина)
+
+    Обновляется пакетно после изменений товаров (см. products/snapshots.py),
+    чтобы списки и детали товара собирались без работы сериализатора.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+        verbose_name='Товар'
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Магазин'
+    )
+    data = models.TextField(verbose_name='JSON-представление')
+    product_updated_at = models.DateTimeField(verbose_name='Версия товара')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Снапшот товара'
+        verbose_name_plural = 'Снапшоты товаров'
+    
+    def __str__(self):
+        return f"Снапшот товара #{self.product_id}"
+
+
+class StoreSnapshot(models.Model):
+    """Готовое JSON-представление магазина для вложения в товары"""
+    store = models.OneToOneField(
+        Store,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+        verbose_name='Магазин'
+    )
+    data = models.TextField(verbose_name='JSON-представление')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    class Meta:
+        verbose_name = 'Снапшот магазина'
+        verbose_name_plural = 'Снапшоты магазинов'
+    
+    def __str__(self):
+        return f"Снапшот магазина #{self.store_id}"
@@ -2,6 +2,7 @@
 Модуль для парсинга файлов с товарами (CSV, Excel)
 """
 import csv
+import json
 import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Optional
@@ -11,7 +12,7 @@ from decimal import Decimal, InvalidOperation
 class FileParser:
     """Базовый класс для парсинга файлов"""
     
-    SUPPORTED_FORMATS = ['.csv', '.xlsx', '.xls']
+    SUPPORTED_FORMATS = ['.csv', '.xlsx', '.xls', '.ndjson']
     
     @staticmethod
     def detect_format(file_path: str) -> Optional[str]:
@@ -43,7 +44,11 @@ class FileParser:
                 sample = f.read(1024)
                 f.seek(0)
                 sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
+                try:
+                    delimiter = sniffer.sniff(sample, delimiters=',;\t').delimiter
+                except csv.Error:
+                    # Не удалось определить (например, кавычки в описаниях) - стандартная запятая
+                    delimiter = ','
                 
                 reader = csv.DictReader(f, delimiter=delimiter)
                 
@@ -99,6 +104,36 @@ class FileParser:
         
         return products
     
+    @staticmethod
+    def parse_ndjson(file_path: str, encoding: str = 'utf-8') -> List[Dict]:
+        """
+        Парсит NDJSON файл (один JSON объект на строку), например выгрузку
+        /api/products/export/?export_format=ndjson
+        
+        Ожидаемые ключи те же, что и колонки CSV
+        """
+        products = []
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                for row_num, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    # Приводим значения к строкам, как при чтении CSV
+                    normalized_row = {
+                        str(k).strip().lower(): '' if v is None else str(v).strip()
+                        for k, v in row.items()
+                    }
+                    products.append({
+                        'row_number': row_num,
+                        'data': normalized_row
+                    })
+        except Exception as e:
+            raise ValueError(f"Ошибка при чтении NDJSON файла {file_path}: {str(e)}")
+        
+        return products
+    
     @staticmethod
     def parse_file(file_path: str, **kwargs) -> List[Dict]:
         """
@@ -113,6 +148,8 @@ class FileParser:
             return FileParser.parse_csv(file_path, **kwargs)
         elif file_format in ['.xlsx', '.xls']:
             return FileParser.parse_excel(file_path, **kwargs)
+        elif file_format == '.ndjson':
+            return FileParser.parse_ndjson(file_path, **kwargs)
         else:
             raise ValueError(f"Неподдерживаемый формат файла: {file_format}")
 
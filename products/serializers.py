@@ -1,27 +1,40 @@
 from rest_framework import serializers
-from .models import Product
+from .models import Product, ProductGroup
+from .images import variant_urls
 from stores.serializers import StoreSerializer
+from procurement.fieldsets import SparseFieldsetSerializerMixin
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для товара"""
     store = StoreSerializer(read_only=True)
     store_id = serializers.IntegerField(write_only=True, required=False)
     is_in_stock = serializers.BooleanField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
+    
+    sparse_dependencies = {
+        'is_in_stock': ('stock_quantity', 'is_available'),
+        'image_variants': ('image_variants',),
+    }
     
     class Meta:
         model = Product
         fields = (
             'id', 'store', 'store_id', 'name', 'description', 'sku', 
-            'price', 'image', 'is_available', 'stock_quantity', 
+            'price', 'image', 'image_variants', 'is_available', 'stock_quantity', 
             'is_in_stock', 'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
     
+    def get_image_variants(self, obj):
+        """URL уменьшенных вариантов изображения: {'thumb': {'webp': ..., 'jpeg': ...}, ...}"""
+        return variant_urls(obj.image_variants, self.context.get('request'))
+    
     def to_representation(self, instance):
         """Добавляем вычисляемое поле is_in_stock"""
         representation = super().to_representation(instance)
-        representation['is_in_stock'] = instance.is_in_stock()
+        if 'is_in_stock' in self.fields:
+            representation['is_in_stock'] = instance.is_in_stock()
         return representation
 
 
@@ -29,3 +42,46 @@ class ProductDetailSerializer(ProductSerializer):
     """Расширенный сериализатор для детального просмотра товара"""
     pass
 
+
+class ProductKeySerializer(serializers.Serializer):
+    """Ключ товара: магазин и артикул"""
+    store = serializers.IntegerField()
+    sku = serializers.CharField(max_length=100)
+
+
+class ProductBulkLookupSerializer(serializers.Serializer):
+    """Сериализатор для пакетного запроса спецификаций товаров"""
+    MAX_ITEMS = 500
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=MAX_ITEMS,
+        help_text="Список ID товаров: [1, 2, 3]"
+    )
+    items = ProductKeySerializer(
+        many=True,
+        required=False,
+        max_length=MAX_ITEMS,
+        help_text="Список пар магазин/артикул: [{'store': 1, 'sku': 'SKU-001'}, ...]"
+    )
+    
+    def validate(self, attrs):
+        ids = attrs.get('ids', [])
+        items = attrs.get('items', [])
+        if not ids and not items:
+            raise serializers.ValidationError("Укажите ids или items")
+        if len(ids) + len(items) > self.MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Можно запросить не более {self.MAX_ITEMS} товаров за раз"
+            )
+        return attrs
+
+
+class ProductGroupSerializer(serializers.ModelSerializer):
+    """Сериализатор для группы предложений одного товара в разных магазинах"""
+    
+    class Meta:
+        model = ProductGroup
+        fields = ('key', 'name', 'best_price', 'offers_count', 'in_stock_count', 'updated_at')
+        read_only_fields = fields
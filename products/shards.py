@@ -0,0 +1,196 @@
+"""
+Шардированные остатки товаров с высоким спросом (распродажи)
+
+Обычный товар хранит остаток в Product.stock_quantity, и каждое оформление
+обновляет эту строку - при тысячах оформлений одного товара она становится
+единственной горячей блокировкой. Для шардированного товара остаток разделен
+на N счетчиков StockShard: оформление списывает из случайного шарда, поэтому
+параллельные оформления блокируют разные строки.
+
+Product.stock_quantity шардированного товара - сумма шардов, которую
+периодически записывает sync_stock_shards (задача products.tasks.sync_stock_shards
+после оформлений, не чаще STOCK_SHARD_SYNC_INTERVAL секунд). Она же
+выравнивает шарды, чтобы остаток не застревал в немногих из них.
+
+Использование:
+    python manage.py shard_stock 15 16 --shards 16   # включить
+    python manage.py shard_stock 15 --disable        # выключить
+"""
+import random
+from typing import Dict, Iterable
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Product, StockShard
+from .snapshots import schedule_stock_refresh
+
+
+def split_quantity(total: int, shards: int):
+    """Делит остаток на shards почти равных частей"""
+    base, remainder = divmod(max(total, 0), shards)
+    return [base + (1 if index < remainder else 0) for index in range(shards)]
+
+
+def enable_stock_shards(product_id: int, shards: int) -> int:
+    """
+    Делит текущий остаток товара на shards счетчиков
+
+    Returns:
+        int: Распределенный остаток
+    """
+    if shards <= 0:
+        raise ValueError('Количество шардов должно быть больше нуля')
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(id=product_id)
+        total = collect_shards(product) if product.stock_shard_count else product.stock_quantity
+        StockShard.objects.bulk_create([
+            StockShard(product_id=product_id, index=index, quantity=quantity)
+            for index, quantity in enumerate(split_quantity(total, shards))
+        ])
+        Product.objects.filter(id=product_id).update(
+            stock_shard_count=shards, stock_quantity=total, updated_at=timezone.now()
+        )
+        stock_synced([product_id])
+    return total
+
+
+def disable_stock_shards(product_id: int) -> int:
+    """Собирает шарды обратно в Product.stock_quantity"""
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(id=product_id)
+        if not product.stock_shard_count:
+            return product.stock_quantity
+        total = collect_shards(product)
+        Product.objects.filter(id=product_id).update(
+            stock_shard_count=0, stock_quantity=total, updated_at=timezone.now()
+        )
+        stock_synced([product_id])
+    return total
+
+
+def collect_shards(product) -> int:
+    """Удаляет шарды товара и возвращает их сумму (внутри транзакции)"""
+    shards = list(StockShard.objects.select_for_update().filter(product=product).order_by('index'))
+    StockShard.objects.filter(product=product).delete()
+    return sum(shard.quantity for shard in shards)
+
+
+def reserve_from_shards(product_id: int, shards: int, quantity: int) -> bool:
+    """
+    Списывает quantity из шардов товара (внутри транзакции)
+
+    Сначала пробует целиком списать из одного шарда, начиная со случайного;
+    если ни в одном шарде нет нужного количества (остаток на исходе или
+    раздроблен), блокирует все шарды по порядку и списывает из нескольких.
+    """
+    start = random.randrange(shards)
+    for offset in range(shards):
+        updated = StockShard.objects.filter(
+            product_id=product_id, index=(start + offset) % shards, quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity)
+        if updated:
+            return True
+
+    locked = list(
+        StockShard.objects.select_for_update().filter(product_id=product_id).order_by('index')
+    )
+    if sum(shard.quantity for shard in locked) < quantity:
+        return False
+    remaining = quantity
+    for shard in locked:
+        taken = min(shard.quantity, remaining)
+        if taken:
+            StockShard.objects.filter(id=shard.id).update(quantity=F('quantity') - taken)
+            remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def release_to_shards(product_id: int, shards: int, quantity: int):
+    """Возвращает остаток в случайный шард"""
+    StockShard.objects.filter(product_id=product_id, index=random.randrange(shards)).update(
+        quantity=F('quantity') + quantity
+    )
+
+
+def adjust_sharded_stock(product_id: int, delta: int) -> int:
+    """
+    Переносит ручное изменение остатка (админка, импорт) в шарды:
+    сумма шардов меняется на delta и выравнивается
+
+    Returns:
+        int: Новый остаток
+    """
+    with transaction.atomic():
+        shards = list(
+            StockShard.objects.select_for_update().filter(product_id=product_id).order_by('index')
+        )
+        if not shards:
+            return 0
+        total = max(sum(shard.quantity for shard in shards) + delta, 0)
+        rebalance(shards, total)
+        Product.objects.filter(id=product_id).update(stock_quantity=total, updated_at=timezone.now())
+        stock_synced([product_id])
+    return total
+
+
+def rebalance(shards, total):
+    """Записывает в заблокированные шарды равные части total"""
+    for shard, quantity in zip(shards, split_quantity(total, len(shards))):
+        if shard.quantity != quantity:
+            shard.quantity = quantity
+            StockShard.objects.filter(id=shard.id).update(quantity=quantity)
+
+
+def sync_stock_shards(product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Записывает сумму шардов в Product.stock_quantity и выравнивает шарды
+
+    Returns:
+        Dict: {product_id: остаток} для шардированных товаров
+    """
+    totals = {}
+    for product_id in sorted(set(product_ids)):
+        with transaction.atomic():
+            # Шарды блокируются на время одного товара - оформления ждут миллисекунды
+            shards = list(
+                StockShard.objects.select_for_update().filter(product_id=product_id).order_by('index')
+            )
+            if not shards:
+                continue
+            total = sum(shard.quantity for shard in shards)
+            rebalance(shards, total)
+            updated = Product.objects.filter(id=product_id).exclude(stock_quantity=total).update(
+                stock_quantity=total, updated_at=timezone.now()
+            )
+            if updated:
+                stock_synced([product_id])
+            totals[product_id] = total
+    return totals
+
+
+def schedule_stock_sync(product_ids: Iterable[int]):
+    """
+    Планирует синхронизацию шардов после коммита: не чаще одного раза
+    за STOCK_SHARD_SYNC_INTERVAL секунд на товар
+    """
+    from .tasks import sync_stock_shards as sync_task
+
+    interval = settings.STOCK_SHARD_SYNC_INTERVAL
+    due = [
+        product_id for product_id in product_ids
+        if cache.add(f'products:stock_sync:{product_id}', 1, timeout=interval)
+    ]
+    if due:
+        transaction.on_commit(
+            lambda: sync_task.apply_async((due,), countdown=interval), robust=True
+        )
+
+
+def stock_synced(product_ids):
+    """Остаток товаров изменился через QuerySet.update - обновляем производные данные"""
+    schedule_stock_refresh(product_ids)
+
@@ -0,0 +1,69 @@
+"""
+Сигналы приложения товаров
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from stores.models import Store
+from .catalogue import bump_catalogue_version
+from .models import Product, ProductTombstone
+from .images import ORIGINALS_PREFIX
+from .shards import adjust_sharded_stock
+from .snapshots import schedule_snapshot_refresh
+from .tasks import process_uploaded_product_image
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def catalogue_changed(sender, **kwargs):
+    """Любое изменение товара или магазина меняет версию каталога"""
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    """Снапшот товара, счетчик его магазина и группа предложений обновляются после коммита"""
+    schedule_snapshot_refresh(
+        product_ids=[instance.pk],
+        store_ids=[instance.store_id],
+        match_keys={instance.match_key, getattr(instance, '_previous_match_key', '')},
+    )
+
+
+@receiver(post_save, sender=Product)
+def sharded_stock_edited(sender, instance, created, update_fields=None, **kwargs):
+    """Ручное изменение остатка шардированного товара переносится в шарды разницей"""
+    loaded = getattr(instance, '_loaded_stock_quantity', None)
+    if created or not instance.stock_shard_count or loaded is None:
+        return
+    if update_fields is not None and 'stock_quantity' not in update_fields:
+        return
+    if instance.stock_quantity != loaded:
+        instance.stock_quantity = adjust_sharded_stock(instance.pk, instance.stock_quantity - loaded)
+        instance._loaded_stock_quantity = instance.stock_quantity
+
+
+@receiver(post_save, sender=Product)
+def product_image_uploaded(sender, instance, **kwargs):
+    """Загруженное напрямую изображение уходит в обработку после коммита"""
+    if instance.image and not instance.image.name.startswith(ORIGINALS_PREFIX):
+        transaction.on_commit(
+            lambda: process_uploaded_product_image.delay(instance.pk), robust=True
+        )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Снапшот товара удаляется каскадно, пересчитываем только магазин
+    schedule_snapshot_refresh(store_ids=[instance.store_id], match_keys=[instance.match_key])
+    # Запись об удалении для ленты изменений каталога
+    ProductTombstone.objects.create(
+        product_id=instance.pk, store_id=instance.store_id, sku=instance.sku
+    )
+
+
+@receiver(post_save, sender=Store)
+def store_saved(sender, instance, **kwargs):
+    schedule_snapshot_refresh(store_ids=[instance.pk])
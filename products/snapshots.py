@@ -0,0 +1,279 @@
+"""
+Готовые JSON-представления товаров и магазинов (снапшоты)
+
+Товар хранится без вложенного магазина, магазин - отдельно: количество
+активных товаров магазина меняется чаще, чем сами товары, и не должно
+инвалидировать снапшоты всех его товаров. При чтении фрагменты
+склеиваются: товар + магазин + абсолютный URL изображения.
+
+Снапшоты обновляются после коммита транзакции, в которой менялись товары или
+магазины. Внутри deferred_snapshot_refresh() изменения копятся и обновляются
+одним пакетом в конце (импорт, массовые операции). Тем же пакетом
+пересчитываются группы предложений (products/matching.py) и сводки
+магазинов (stores/stats.py).
+
+Изменение только остатков (оформление и отмена заказов) обновляет снапшоты
+товаров и группы предложений, а снапшоты и сводки магазинов пересчитывает
+задача products.tasks.refresh_stores не чаще STORE_REFRESH_INTERVAL секунд
+на магазин: каждое оформление иначе пересчитывало бы весь каталог магазина.
+"""
+import json
+import threading
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from stores.stats import refresh_store_stats
+from .fast_serializers import FastProductSerializer, FastStoreSerializer
+from .matching import refresh_product_groups
+from .models import Product, ProductSnapshot, StoreSnapshot
+
+BATCH_SIZE = 1000
+
+_state = threading.local()
+
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def refresh_product_snapshots(product_ids: Iterable[int] = None, id_range=None) -> Dict:
+    """
+    Перестраивает снапшоты товаров пакетами по BATCH_SIZE
+
+    Args:
+        product_ids: ID товаров для обновления
+        id_range: Кортеж (первый ID, последний ID) - альтернатива списку
+
+    Returns:
+        Dict: {'products': количество, 'store_ids': затронутые магазины}
+    """
+    queryset = Product.objects.order_by('id')
+    if id_range is not None:
+        queryset = queryset.filter(id__gte=id_range[0], id__lte=id_range[1])
+        batches = [queryset]
+    else:
+        product_ids = sorted(set(product_ids or ()))
+        batches = [
+            queryset.filter(id__in=product_ids[start:start + BATCH_SIZE])
+            for start in range(0, len(product_ids), BATCH_SIZE)
+        ]
+
+    # Без request в контексте изображение сохраняется относительным URL
+    serializer = FastProductSerializer()
+    refreshed = 0
+    store_ids = set()
+    for batch in batches:
+        rows = list(batch.values(*serializer.fields))
+        if not rows:
+            continue
+        ids = [row['id'] for row in rows]
+        # Магазин мог смениться - старый магазин тоже пересчитываем
+        store_ids.update(
+            ProductSnapshot.objects.filter(product_id__in=ids).values_list('store_id', flat=True)
+        )
+        snapshots = []
+        for row in rows:
+            store_ids.add(row['store_id'])
+            snapshots.append(ProductSnapshot(
+                product_id=row['id'],
+                store_id=row['store_id'],
+                data=dumps(serializer.render_row(row, None)),
+                product_updated_at=row['updated_at'],
+            ))
+        ProductSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['store', 'data', 'product_updated_at', 'updated_at'],
+        )
+        refreshed += len(snapshots)
+
+    return {'products': refreshed, 'store_ids': store_ids}
+
+
+def refresh_store_snapshots(store_ids: Iterable[int]) -> int:
+    """Перестраивает снапшоты магазинов (с количеством активных товаров)"""
+    store_ids = sorted(set(store_ids))
+    serializer = FastStoreSerializer()
+    refreshed = 0
+    for start in range(0, len(store_ids), BATCH_SIZE):
+        stores = serializer.load(store_ids[start:start + BATCH_SIZE])
+        StoreSnapshot.objects.bulk_create(
+            [StoreSnapshot(store_id=store_id, data=dumps(data)) for store_id, data in stores.items()],
+            update_conflicts=True,
+            unique_fields=['store'],
+            update_fields=['data', 'updated_at'],
+        )
+        refreshed += len(stores)
+    return refreshed
+
+
+def refresh_stores(store_ids: Iterable[int]) -> int:
+    """Обновляет снапшоты и сводки магазинов"""
+    refresh_store_snapshots(store_ids)
+    return refresh_store_stats(store_ids)
+
+
+def refresh_snapshots(product_ids: Iterable[int] = (), store_ids: Iterable[int] = (),
+                      match_keys: Iterable[str] = ()):
+    """Обновляет снапшоты товаров, всех затронутых ими магазинов и группы предложений"""
+    result = refresh_product_snapshots(product_ids)
+    refresh_stores(set(store_ids) | result['store_ids'])
+    refresh_product_groups(match_keys)
+
+
+def refresh_stock_snapshots(product_ids: Iterable[int]):
+    """Остаток товаров изменился: снапшоты товаров и группы сразу, магазины - задачей"""
+    product_ids = set(product_ids)
+    result = refresh_product_snapshots(product_ids)
+    refresh_product_groups(
+        Product.objects.filter(id__in=product_ids).values_list('match_key', flat=True)
+    )
+    schedule_store_refresh(result['store_ids'])
+
+
+def schedule_snapshot_refresh(product_ids: Iterable[int] = (), store_ids: Iterable[int] = (),
+                              match_keys: Iterable[str] = ()):
+    """Планирует обновление снапшотов после коммита текущей транзакции"""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending['products'].update(product_ids)
+        pending['stores'].update(store_ids)
+        pending['match_keys'].update(match_keys)
+        return
+    transaction.on_commit(
+        partial(refresh_snapshots, set(product_ids), set(store_ids), set(match_keys)),
+        robust=True
+    )
+
+
+def schedule_stock_refresh(product_ids: Iterable[int]):
+    """
+    Планирует обновление после коммита транзакции, изменившей только остатки
+
+    Версия каталога здесь не увеличивается: ее увеличит пересчет сводок магазинов.
+    """
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending['products'].update(product_ids)
+        pending['match_keys'].update(
+            Product.objects.filter(id__in=list(product_ids)).values_list('match_key', flat=True)
+        )
+        return
+    transaction.on_commit(partial(refresh_stock_snapshots, set(product_ids)), robust=True)
+
+
+def schedule_store_refresh(store_ids: Iterable[int]):
+    """
+    Планирует пересчет снапшотов и сводок магазинов задачей: не чаще одного
+    раза за STORE_REFRESH_INTERVAL секунд на магазин
+    """
+    from .tasks import refresh_stores as refresh_task
+
+    interval = settings.STORE_REFRESH_INTERVAL
+    due = [
+        store_id for store_id in sorted(set(store_ids))
+        if cache.add(f'stores:refresh:{store_id}', 1, timeout=interval)
+    ]
+    if due:
+        transaction.on_commit(
+            lambda: refresh_task.apply_async((due,), countdown=interval), robust=True
+        )
+
+
+@contextmanager
+def deferred_snapshot_refresh():
+    """
+    Копит изменения внутри блока и обновляет снапшоты одним пакетом в конце
+
+    Использование:
+        with deferred_snapshot_refresh(), transaction.atomic():
+            ...  # много сохранений товаров
+    """
+    if getattr(_state, 'pending', None) is not None:
+        # Вложенный вызов - пакет соберет внешний блок
+        yield
+        return
+
+    pending = {'products': set(), 'stores': set(), 'match_keys': set()}
+    _state.pending = pending
+    try:
+        yield
+    finally:
+        _state.pending = None
+    transaction.on_commit(
+        partial(
+            refresh_snapshots, pending['products'], pending['stores'], pending['match_keys']
+        ),
+        robust=True
+    )
+
+
+class SnapshotProductSerializer:
+    """
+    Сериализатор списков товаров на основе снапшотов
+
+    Интерфейс совпадает с FastProductSerializer. Товары без актуального
+    снапшота (еще не построен или устарел) рендерятся FastProductSerializer.
+    """
+
+    fields = ('id', 'store_id', 'image', 'updated_at')
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.fallback = FastProductSerializer(context=self.context)
+        self.request = self.context.get('request')
+
+    def prepare_queryset(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def render(self, rows) -> List[Dict]:
+        rows = list(rows)
+        if not rows:
+            return []
+
+        snapshots = {
+            product_id: (data, product_updated_at)
+            for product_id, data, product_updated_at in ProductSnapshot.objects.filter(
+                product_id__in=[row['id'] for row in rows]
+            ).values_list('product_id', 'data', 'product_updated_at')
+        }
+        stores = {
+            store_id: json.loads(data)
+            for store_id, data in StoreSnapshot.objects.filter(
+                store_id__in={row['store_id'] for row in rows}
+            ).values_list('store_id', 'data')
+        }
+
+        stale = [
+            row['id'] for row in rows
+            if row['id'] not in snapshots
+            or snapshots[row['id']][1] != row['updated_at']
+            or row['store_id'] not in stores
+        ]
+        fresh = self.fallback.load(stale) if stale else {}
+
+        result = []
+        for row in rows:
+            if row['id'] in fresh:
+                result.append(fresh[row['id']])
+                continue
+            product = json.loads(snapshots[row['id']][0])
+            product['store'] = stores[row['store_id']]
+            if self.request is not None:
+                # Снапшот хранит относительные URL; варианты бывают и без image
+                if product['image']:
+                    product['image'] = self.request.build_absolute_uri(product['image'])
+                product['image_variants'] = {
+                    size_name: {
+                        format_name: self.request.build_absolute_uri(url)
+                        for format_name, url in formats.items()
+                    }
+                    for size_name, formats in product['image_variants'].items()
+                }
+            result.append(product)
+        return result
@@ -0,0 +1,86 @@
+"""
+Celery задачи для обработки изображений и остатков товаров
+
+Каждое изображение обрабатывается отдельной задачей, поэтому при
+импорте с тысячами изображений работа распределяется по процессам
+воркеров (celery -A procurement worker --concurrency N).
+"""
+import logging
+from celery import group, shared_task
+from django.core.files.storage import default_storage
+from .images import (
+    ImageSourceError, ensure_variants, link_products, read_image_source, store_image
+)
+from .models import Product
+from .shards import sync_stock_shards as sync_shards
+from .snapshots import refresh_stores as refresh_store_data
+
+logger = logging.getLogger(__name__)
+
+# Товаров в одном UPDATE при привязке изображения
+LINK_BATCH_SIZE = 1000
+
+
+@shared_task
+def attach_product_image(source, product_ids):
+    """Загружает изображение из файла импорта и привязывает его к товарам"""
+    try:
+        content = read_image_source(source)
+        asset = ensure_variants(store_image(content), content)
+    except ImageSourceError as e:
+        logger.warning("Изображение не обработано: %s", e)
+        return 0
+
+    linked = 0
+    for start in range(0, len(product_ids), LINK_BATCH_SIZE):
+        linked += link_products(asset, product_ids[start:start + LINK_BATCH_SIZE], source)
+    return linked
+
+
+@shared_task
+def process_uploaded_product_image(product_id):
+    """Переводит изображение, загруженное в Product.image, в общее хранилище с вариантами"""
+    product = Product.objects.filter(id=product_id).only('id', 'image').first()
+    if product is None or not product.image:
+        return 0
+
+    uploaded_name = product.image.name
+    try:
+        with product.image.open('rb') as file:
+            content = file.read()
+        asset = ensure_variants(store_image(content), content)
+    except (OSError, ImageSourceError) as e:
+        logger.warning("Изображение товара #%s не обработано: %s", product_id, e)
+        return 0
+
+    link_products(asset, [product_id])
+    # Загруженная копия больше не нужна, если на нее не ссылаются другие товары
+    if uploaded_name != asset.original.name and not Product.objects.filter(image=uploaded_name).exists():
+        default_storage.delete(uploaded_name)
+    return 1
+
+
+@shared_task
+def sync_stock_shards(product_ids):
+    """Записывает суммы шардов остатков в товары и выравнивает шарды"""
+    return len(sync_shards(product_ids))
+
+
+@shared_task
+def refresh_stores(store_ids):
+    """Пересчитывает снапшоты и сводки магазинов после изменения остатков"""
+    return refresh_store_data(store_ids)
+
+
+def schedule_image_attachments(images):
+    """
+    Ставит в очередь привязку изображений: одна задача на уникальный источник
+
+    Args:
+        images: Словарь {источник: список ID товаров}
+    """
+    if images:
+        group(
+            attach_product_image.s(source, sorted(product_ids))
+            for source, product_ids in images.items()
+        ).apply_async()
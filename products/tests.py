@@ -1,3 +1,190 @@
-from django.test import TestCase
+import gzip
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from stores.models import Store
+from users.models import User
+from .models import Product, ProductSnapshot
+from .parsers import FileParser
+from .snapshots import SnapshotProductSerializer, refresh_snapshots
 
-# Create your tests here.
+
+class ProductExportTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(name='Магазин, "А"')
+        self.other_store = Store.objects.create(name='Другой магазин')
+        Product.objects.create(
+            store=self.store, name='Товар; 1', description='описание, с запятой\nи переносом',
+            sku='SKU-1', price=Decimal('10.50'), stock_quantity=3
+        )
+        Product.objects.create(
+            store=self.store, name='Скрытый товар', sku='SKU-2', price=Decimal('20.00'),
+            stock_quantity=0, is_available=False
+        )
+        Product.objects.create(
+            store=self.other_store, name='Скрытый товар другого магазина', price=Decimal('5.00'),
+            stock_quantity=1, is_available=False
+        )
+        self.client = APIClient()
+
+    def export(self, user=None, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/products/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    @staticmethod
+    def catalogue():
+        return sorted(
+            Product.objects.values_list(
+                'store__name', 'name', 'description', 'sku', 'price', 'stock_quantity', 'is_available'
+            )
+        )
+
+    def exported_names(self, user=None, **params):
+        path = self.write_file(self.export(user, export_format='ndjson', **params), '.ndjson')
+        return {row['data']['name'] for row in FileParser.parse_ndjson(path)}
+
+    def write_file(self, content, suffix):
+        file, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(file, 'wb') as output:
+            output.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_anonymous_export_has_only_available_products(self):
+        self.assertEqual(self.exported_names(), {'Товар; 1'})
+        self.assertEqual(self.exported_names(is_available='false'), set())
+
+    def test_manager_sees_unavailable_products_of_own_store(self):
+        manager = User.objects.create_user(email='manager@example.com', username='manager', password='secret')
+        self.store.managers.add(manager)
+        self.assertEqual(self.exported_names(manager), {'Товар; 1', 'Скрытый товар'})
+
+    def test_staff_sees_whole_catalogue(self):
+        staff = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret', is_staff=True
+        )
+        self.assertEqual(len(self.exported_names(staff)), 3)
+
+    def test_export_can_be_imported_back(self):
+        staff = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret', is_staff=True
+        )
+        before = self.catalogue()
+        self.client.force_authenticate(staff)
+        response = self.client.get(
+            '/api/products/export/', {'export_format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        files = {
+            '.ndjson': gzip.decompress(b''.join(response.streaming_content)),
+            '.csv': self.export(staff),
+        }
+        for suffix, content in files.items():
+            with self.subTest(format=suffix):
+                path = self.write_file(content, suffix)
+                Product.objects.all().delete()
+                Store.objects.all().delete()
+                call_command('import_products', path, quiet=True, stdout=StringIO())
+                self.assertEqual(self.catalogue(), before)
+
+
+@override_settings(CHANGE_FEED_SAFETY_LAG=0)
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(name='Магазин')
+        self.products = [
+            Product.objects.create(store=self.store, name=f'Товар {index}', price=Decimal('10.00'))
+            for index in range(5)
+        ]
+        self.client = APIClient()
+
+    def changes(self, cursor='', limit=2):
+        response = self.client.get('/api/products/changes/', {'cursor': cursor, 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def read_feed(self, cursor=''):
+        """Читает ленту до конца; возвращает (ID товаров, ID удаленных, курсор)"""
+        product_ids, deleted = [], []
+        while True:
+            page = self.changes(cursor)
+            product_ids += [row['id'] for row in page['results']]
+            deleted += page['deleted']
+            cursor = page['next_cursor']
+            if not page['has_more']:
+                return product_ids, deleted, cursor
+
+    def test_cursor_round_trip(self):
+        product_ids, deleted, cursor = self.read_feed()
+        self.assertEqual(product_ids, [product.id for product in self.products])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.read_feed(cursor), ([], [], cursor))
+
+        changed = self.products[1]
+        changed.is_available = False
+        changed.save()
+        product_ids, deleted, cursor = self.read_feed(cursor)
+        self.assertEqual((product_ids, deleted), ([changed.id], []))
+        page = self.changes(cursor)
+        self.assertEqual((page['results'], page['has_more']), ([], False))
+
+    def test_deleted_products_are_reported(self):
+        _, _, cursor = self.read_feed()
+        removed = [self.products[0].id, self.products[3].id]
+        Product.objects.filter(id__in=removed).delete()
+        product_ids, deleted, cursor = self.read_feed(cursor)
+        self.assertEqual((product_ids, sorted(deleted)), ([], removed))
+        self.assertEqual(self.read_feed(cursor), ([], [], cursor))
+
+        # Курсор с начала ленты: удаленных товаров нет среди результатов
+        product_ids, deleted, _ = self.read_feed()
+        self.assertEqual(product_ids, [product.id for product in self.products if product.id not in removed])
+        self.assertEqual(sorted(deleted), removed)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not a cursor', 'eyJwIjpbMV19', 'W10'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/products/changes/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/products/changes/', {'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG=60)
+    def test_recent_changes_wait_for_safety_lag(self):
+        page = self.changes()
+        self.assertEqual((page['results'], page['has_more']), ([], False))
+        # Курсор не сдвинулся - изменения придут следующим запросом после паузы
+        with override_settings(CHANGE_FEED_SAFETY_LAG=0):
+            self.assertEqual(len(self.read_feed(page['next_cursor'])[0]), 5)
+
+
+class SnapshotProductSerializerTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(name='Магазин')
+        self.context = {'request': RequestFactory().get('/api/products/')}
+
+    def render(self, product):
+        serializer = SnapshotProductSerializer(context=self.context)
+        return serializer.render(serializer.prepare_queryset(Product.objects.filter(id=product.id)))[0]
+
+    def test_variants_are_absolute_without_image(self):
+        # Исходное изображение удалено, варианты остались
+        product = Product.objects.create(
+            store=self.store, name='Товар', price=Decimal('10.00'),
+            image_variants={'thumb': {'webp': 'products/variants/1/thumb.webp'}}
+        )
+        fresh = self.render(product)
+        refresh_snapshots(product_ids=[product.id], store_ids=[self.store.id])
+        self.assertTrue(ProductSnapshot.objects.filter(product=product).exists())
+        from_snapshot = self.render(product)
+        self.assertEqual(from_snapshot, fresh)
+        self.assertTrue(from_snapshot['image_variants']['thumb']['webp'].startswith('http://testserver/'))
@@ -1,26 +1,60 @@
+import hashlib
+import re
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.http import StreamingHttpResponse
+from django.utils.text import compress_sequence
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Product
-from .serializers import ProductSerializer, ProductDetailSerializer
+from .models import Product, ProductGroup
+from .serializers import (
+    ProductSerializer, ProductDetailSerializer, ProductBulkLookupSerializer, ProductGroupSerializer
+)
+from .snapshots import SnapshotProductSerializer
+from .exporters import ProductExporter
+from .filters import ProductFilter
+from .catalogue import get_catalogue_version
+from .changes import ChangeFeed, InvalidCursor
 from stores.models import Store
+from procurement.mixins import ConditionalGetMixin, FastReadMixin, SparseFieldsetMixin
 
+re_accepts_gzip = re.compile(r"\bgzip\b")
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastReadMixin,
+                     viewsets.ReadOnlyModelViewSet):
     """ViewSet для работы с товарами"""
     queryset = Product.objects.select_related('store').filter(is_available=True)
     serializer_class = ProductSerializer
+    # Список и детали собираются из готовых снапшотов (products/snapshots.py)
+    fast_list_serializer_class = SnapshotProductSerializer
+    fast_retrieve = True
+    # Товар отдается вместе с вложенным магазином - учитываем оба изменения
+    conditional_timestamp_fields = ('updated_at', 'store__updated_at')
     permission_classes = []  # Разрешаем просмотр товаров без авторизации
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['store', 'is_available']
+    filterset_class = ProductFilter
     search_fields = ['name', 'description', 'sku']
     ordering_fields = ['price', 'created_at', 'name']
     ordering = ['-created_at']
+    # Нижние границы ценовых интервалов для фасетов; последний интервал открыт сверху
+    facet_price_buckets = (
+        Decimal('0'), Decimal('1000'), Decimal('5000'),
+        Decimal('10000'), Decimal('50000'), Decimal('100000'),
+    )
+    
+    def get_queryset(self):
+        return self.get_sparse_queryset(super().get_queryset())
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProductDetailSerializer
+        if self.action == 'bulk':
+            return ProductBulkLookupSerializer
         return ProductSerializer
     
     @action(detail=True, methods=['get'])
@@ -28,20 +62,275 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         """Получение спецификации товара"""
         product = self.get_object()
         serializer = ProductDetailSerializer(product)
+        return Response(self.build_specification(serializer.data))
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Пакетное получение спецификаций товаров по ID или парам магазин/артикул
+        
+        Количество запросов к БД не зависит от числа товаров: выбор строк
+        и сборка представлений из снапшотов.
+        """
+        serializer = ProductBulkLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids', [])
+        keys = [(item['store'], item['sku']) for item in serializer.validated_data.get('items', [])]
+        
+        # Одним запросом выбираем товары и по ID, и по парам магазин/артикул;
+        # для пар условие по store/sku шире нужного, точное совпадение - ниже
+        condition = Q(id__in=ids)
+        if keys:
+            condition |= Q(
+                store_id__in={store for store, _ in keys},
+                sku__in={sku for _, sku in keys},
+            )
+        snapshot_serializer = SnapshotProductSerializer()
+        rows = list(
+            self.get_queryset().filter(condition).values(*snapshot_serializer.fields, 'sku')
+        )
+        by_id = {row['id']: row for row in rows}
+        by_key = {(row['store_id'], row['sku']): row for row in rows}
         
-        # Дополнительная информация для спецификации
-        specification_data = serializer.data
-        specification_data['store_info'] = {
-            'name': product.store.name,
-            'address': product.store.address,
-            'phone': product.store.phone,
-            'email': product.store.email,
+        requested = []
+        not_found = {'ids': [], 'items': []}
+        for product_id in ids:
+            if product_id in by_id:
+                requested.append(by_id[product_id])
+            else:
+                not_found['ids'].append(product_id)
+        for store, sku in keys:
+            if (store, sku) in by_key:
+                requested.append(by_key[(store, sku)])
+            else:
+                not_found['items'].append({'store': store, 'sku': sku})
+        
+        products = {
+            product['id']: product
+            for product in snapshot_serializer.render(
+                {row['id']: row for row in requested}.values()
+            )
+        }
+        return Response({
+            'results': [self.build_specification(dict(products[row['id']])) for row in requested],
+            'not_found': not_found,
+        })
+    
+    @staticmethod
+    def build_specification(product_data):
+        """Дополняет представление товара блоками store_info и availability"""
+        store = product_data['store']
+        stock_quantity = product_data['stock_quantity']
+        is_available = product_data['is_available']
+        product_data['store_info'] = {
+            'name': store['name'],
+            'address': store['address'],
+            'phone': store['phone'],
+            'email': store['email'],
         }
-        specification_data['availability'] = {
-            'is_available': product.is_available,
-            'stock_quantity': product.stock_quantity,
-            'is_in_stock': product.is_in_stock(),
-            'can_be_ordered': product.can_be_ordered(1),
+        product_data['availability'] = {
+            'is_available': is_available,
+            'stock_quantity': stock_quantity,
+            'is_in_stock': product_data['is_in_stock'],
+            'can_be_ordered': is_available and stock_quantity >= 1,
         }
+        return product_data
+    
+    @action(detail=True, methods=['get'])
+    def offers(self, request, pk=None):
+        """Предложения этого же товара во всех магазинах, от дешевых к дорогим"""
+        product = self.get_object()
+        return self.comparison_response(product.match_key)
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """
+        Сравнение предложений товара по артикулу или названию
+        
+        Параметры: sku или name. Ключ нормализуется так же, как при сохранении
+        товара, поэтому регистр и разделители в артикуле не важны.
+        """
+        sku = request.query_params.get('sku', '').strip()
+        name = request.query_params.get('name', '').strip()
+        if not sku and not name:
+            return Response(
+                {'error': 'Укажите sku или name'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.comparison_response(Product.build_match_key(sku, name))
+    
+    def comparison_response(self, match_key):
+        """Группа предложений и все ее товары: оба чтения идут по индексам match_key"""
+        group = ProductGroup.objects.filter(key=match_key).first()
+        if group is None:
+            return Response(
+                {'error': 'Предложения не найдены'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = SnapshotProductSerializer(context=self.get_serializer_context())
+        rows = (
+            Product.objects.filter(match_key=match_key, is_available=True)
+            .order_by('price', 'id')
+            .values(*serializer.fields)
+        )
+        return Response({
+            'group': ProductGroupSerializer(group).data,
+            'offers': serializer.render(rows),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка каталога в CSV или NDJSON
+        
+        Параметры: export_format (csv/ndjson), store, is_available.
+        Ответ сжимается gzip'ом, если клиент передал Accept-Encoding: gzip.
+        Недоступные товары видят только сотрудники (is_staff) и менеджеры
+        магазина - товары своих магазинов; остальным выгружаются доступные.
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in ProductExporter.FORMATS:
+            return Response(
+                {'error': f'Неподдерживаемый формат выгрузки. '
+                          f'Доступные форматы: {", ".join(ProductExporter.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(specification_data)
+        queryset = Product.objects.all()
+        user = request.user
+        if not user.is_staff:
+            visible = Q(is_available=True)
+            if user.is_authenticated:
+                visible |= Q(store_id__in=user.managed_stores.values('id'))
+            queryset = queryset.filter(visible)
+        queryset = self.filter_queryset(queryset)
+        exporter = ProductExporter(queryset)
+        content = exporter.encode(exporter.iter_chunks(export_format))
+        
+        use_gzip = re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if use_gzip:
+            content = compress_sequence(content)
+        
+        response = StreamingHttpResponse(
+            content, content_type=ProductExporter.FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+        response['Vary'] = 'Accept-Encoding'
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Лента изменений каталога для инкрементальной синхронизации
+        
+        Параметры: cursor (из предыдущего ответа, без него - с начала), limit.
+        Возвращает созданные и измененные товары, включая ставшие недоступными,
+        и ID удаленных товаров. Запросы повторяются с next_cursor, пока has_more.
+        """
+        try:
+            limit = int(request.query_params.get('limit', ChangeFeed.DEFAULT_LIMIT))
+        except ValueError:
+            return Response(
+                {'error': 'limit должен быть целым числом'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = SnapshotProductSerializer(context=self.get_serializer_context())
+        try:
+            feed = ChangeFeed(Product.objects.all()).fetch(
+                request.query_params.get('cursor', ''), limit, fields=serializer.fields
+            )
+        except InvalidCursor:
+            return Response(
+                {'error': 'Некорректный курсор'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'results': serializer.render(feed['products']),
+            'deleted': feed['deleted'],
+            'next_cursor': feed['next_cursor'],
+            'has_more': feed['has_more'],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Фасеты каталога для текущего фильтра: количество товаров по магазинам,
+        гистограмма по ценовым интервалам и наличие на складе
+        
+        Все считается одним GROUP BY запросом и кэшируется по версии каталога.
+        """
+        params = sorted(
+            (key, value) for key, values in request.query_params.lists()
+            for value in values if key not in ('page', 'ordering', 'format')
+        )
+        cache_key = 'products:facets:{}:{}'.format(
+            get_catalogue_version(),
+            hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.build_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(cache_key, data, settings.CATALOGUE_CACHE_TIMEOUT)
+        return Response(data)
+    
+    def build_facets(self, queryset):
+        """Считает фасеты одним агрегирующим запросом с группировкой по магазину"""
+        bounds = self.facet_price_buckets
+        annotations = {
+            'count': Count('id'),
+            'in_stock': Count('id', filter=Q(is_available=True, stock_quantity__gt=0)),
+            'min_price': Min('price'),
+            'max_price': Max('price'),
+        }
+        for index, lower in enumerate(bounds):
+            condition = Q(price__gte=lower)
+            if index + 1 < len(bounds):
+                condition &= Q(price__lt=bounds[index + 1])
+            annotations[f'bucket_{index}'] = Count('id', filter=condition)
+        
+        rows = list(
+            queryset.order_by()
+            .values('store_id', 'store__name')
+            .annotate(**annotations)
+        )
+        
+        total = sum(row['count'] for row in rows)
+        in_stock = sum(row['in_stock'] for row in rows)
+        min_prices = [row['min_price'] for row in rows if row['min_price'] is not None]
+        max_prices = [row['max_price'] for row in rows if row['max_price'] is not None]
+        
+        buckets = []
+        for index, lower in enumerate(bounds):
+            upper = bounds[index + 1] if index + 1 < len(bounds) else None
+            buckets.append({
+                'min': self.format_price(lower),
+                'max': self.format_price(upper) if upper is not None else None,
+                'count': sum(row[f'bucket_{index}'] for row in rows),
+            })
+        
+        return {
+            'count': total,
+            'stores': [
+                {'id': row['store_id'], 'name': row['store__name'], 'count': row['count']}
+                for row in sorted(rows, key=lambda row: (-row['count'], row['store__name']))
+            ],
+            'price': {
+                'min': self.format_price(min(min_prices)) if min_prices else None,
+                'max': self.format_price(max(max_prices)) if max_prices else None,
+                'buckets': buckets,
+            },
+            'in_stock': {
+                'true': in_stock,
+                'false': total - in_stock,
+            },
+        }
+    
+    @staticmethod
+    def format_price(value):
+        """Цена строкой с двумя знаками, как в сериализаторе"""
+        return '{:f}'.format(Decimal(value).quantize(Decimal('0.01')))
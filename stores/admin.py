@@ -8,6 +8,7 @@ class StoreAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'created_at')
     search_fields = ('name', 'description', 'address')
     readonly_fields = ('created_at', 'updated_at')
+    filter_horizontal = ('managers',)
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'description', 'is_active')
@@ -15,6 +16,9 @@ class StoreAdmin(admin.ModelAdmin):
         ('Контакты', {
             'fields': ('address', 'phone', 'email')
         }),
+        ('Сотрудники', {
+            'fields': ('managers',)
+        }),
         ('Даты', {
             'fields': ('created_at', 'updated_at')
         }),
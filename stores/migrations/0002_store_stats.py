@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreStats',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='stores.store', verbose_name='Магазин')),
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Доступных товаров')),
+                ('in_stock_count', models.PositiveIntegerField(default=0, verbose_name='Товаров в наличии')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Минимальная цена')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Максимальная цена')),
+                ('median_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Медианная цена')),
+                ('catalogue_updated_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее обновление каталога')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчета')),
+            ],
+            options={
+                'verbose_name': 'Сводка по магазину',
+                'verbose_name_plural': 'Сводки по магазинам',
+            },
+        ),
+    ]
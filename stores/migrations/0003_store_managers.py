@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stores', '0002_store_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='managers',
+            field=models.ManyToManyField(blank=True, help_text='Пользователи, которые видят входящие позиции заказов магазина', related_name='managed_stores', to=settings.AUTH_USER_MODEL, verbose_name='Сотрудники'),
+        ),
+    ]
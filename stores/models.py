@@ -10,6 +10,13 @@ class Store(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True, verbose_name='Телефон')
     email = models.EmailField(blank=True, null=True, verbose_name='Email')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
+    managers = models.ManyToManyField(
+        'users.User',
+        blank=True,
+        related_name='managed_stores',
+        verbose_name='Сотрудники',
+        help_text='Пользователи, которые видят входящие позиции заказов магазина'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
@@ -24,3 +31,41 @@ class Store(models.Model):
     def get_active_products_count(self):
         """Возвращает количество активных товаров в магазине"""
         return self.products.filter(is_available=True).count()
+
+
+class StoreStats(models.Model):
+    """
+    Сводка по каталогу магазина для справочника магазинов
+
+    Пересчитывается пакетно после изменений товаров и импорта
+    (см. stores/stats.py), чтобы список магазинов не агрегировал товары.
+    """
+    store = models.OneToOneField(
+        Store,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Магазин'
+    )
+    products_count = models.PositiveIntegerField(default=0, verbose_name='Доступных товаров')
+    in_stock_count = models.PositiveIntegerField(default=0, verbose_name='Товаров в наличии')
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Минимальная цена'
+    )
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Максимальная цена'
+    )
+    median_price = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Медианная цена'
+    )
+    catalogue_updated_at = models.DateTimeField(
+        blank=True, null=True, verbose_name='Последнее обновление каталога'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата пересчета')
+    
+    class Meta:
+        verbose_name = 'Сводка по магазину'
+        verbose_name_plural = 'Сводки по магазинам'
+    
+    def __str__(self):
+        return f"Сводка по магазину #{self.store_id}"
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Store
+from procurement.fieldsets import SparseFieldsetSerializerMixin
 
 
-class StoreSerializer(serializers.ModelSerializer):
+class StoreSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для магазина"""
     active_products_count = serializers.IntegerField(read_only=True)
     
@@ -18,6 +19,37 @@ class StoreSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Добавляем вычисляемое поле active_products_count"""
         representation = super().to_representation(instance)
-        representation['active_products_count'] = instance.get_active_products_count()
+        if 'active_products_count' in self.fields:
+            representation['active_products_count'] = instance.get_active_products_count()
         return representation
 
+
+class StoreDirectorySerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для справочника магазинов со сводкой по каталогу
+
+    Счетчики товаров аннотирует StoreViewSet.get_queryset: у магазина может
+    еще не быть строки StoreStats, а source='stats.*' тогда отдает null.
+    """
+    products_count = serializers.IntegerField(read_only=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(
+        source='stats.min_price', max_digits=10, decimal_places=2, read_only=True, default=None
+    )
+    max_price = serializers.DecimalField(
+        source='stats.max_price', max_digits=10, decimal_places=2, read_only=True, default=None
+    )
+    median_price = serializers.DecimalField(
+        source='stats.median_price', max_digits=10, decimal_places=2, read_only=True, default=None
+    )
+    catalogue_updated_at = serializers.DateTimeField(
+        source='stats.catalogue_updated_at', read_only=True, default=None
+    )
+    
+    class Meta:
+        model = Store
+        fields = (
+            'id', 'name', 'description', 'address', 'phone', 'email',
+            'products_count', 'in_stock_count', 'min_price', 'max_price',
+            'median_price', 'catalogue_updated_at'
+        )
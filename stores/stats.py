@@ -0,0 +1,98 @@
+"""
+Пересчет сводок по каталогам магазинов (StoreStats)
+
+Количество товаров, цены и дата обновления считаются одним GROUP BY
+запросом на пакет магазинов. Медиана на PostgreSQL считается в том же
+запросе через percentile_cont, на других СУБД - по отсортированным ценам.
+"""
+from decimal import Decimal
+from typing import Iterable
+from django.db import connection
+from django.db.models import Aggregate, Count, DecimalField, Max, Min, Q
+from products.catalogue import bump_catalogue_version
+from products.models import Product
+from .models import Store, StoreStats
+
+BATCH_SIZE = 1000
+
+
+class Median(Aggregate):
+    """Медиана (только PostgreSQL)"""
+    function = 'PERCENTILE_CONT'
+    name = 'median'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = DecimalField(max_digits=10, decimal_places=2)
+
+
+def refresh_store_stats(store_ids: Iterable[int]) -> int:
+    """
+    Пересчитывает сводки магазинов пакетами по BATCH_SIZE
+
+    Returns:
+        int: Количество пересчитанных магазинов
+    """
+    # Удаленные магазины пропускаем - их сводки удаляются каскадно
+    store_ids = sorted(Store.objects.filter(id__in=set(store_ids)).values_list('id', flat=True))
+    use_median_aggregate = connection.vendor == 'postgresql'
+    refreshed = 0
+    for start in range(0, len(store_ids), BATCH_SIZE):
+        batch = store_ids[start:start + BATCH_SIZE]
+        available = Q(is_available=True)
+        annotations = {
+            'products_count': Count('id', filter=available),
+            'in_stock_count': Count('id', filter=available & Q(stock_quantity__gt=0)),
+            'min_price': Min('price', filter=available),
+            'max_price': Max('price', filter=available),
+            'catalogue_updated_at': Max('updated_at'),
+        }
+        if use_median_aggregate:
+            annotations['median_price'] = Median('price', filter=available)
+        rows = {
+            row['store_id']: row
+            for row in Product.objects.filter(store_id__in=batch)
+            .order_by().values('store_id').annotate(**annotations)
+        }
+        if not use_median_aggregate:
+            for store_id, median in python_medians(batch).items():
+                rows[store_id]['median_price'] = median
+
+        StoreStats.objects.bulk_create(
+            [
+                StoreStats(store_id=store_id, **{
+                    field: value for field, value in rows.get(store_id, {}).items()
+                    if field != 'store_id'
+                })
+                for store_id in batch
+            ],
+            update_conflicts=True,
+            unique_fields=['store'],
+            update_fields=[
+                'products_count', 'in_stock_count', 'min_price', 'max_price',
+                'median_price', 'catalogue_updated_at', 'updated_at',
+            ],
+        )
+        refreshed += len(batch)
+
+    if refreshed:
+        # Сводки обновляются после коммита - кэш справочника должен их увидеть
+        bump_catalogue_version()
+    return refreshed
+
+
+def python_medians(store_ids):
+    """Медианы цен доступных товаров по магазинам без поддержки СУБД"""
+    prices = {}
+    queryset = Product.objects.filter(store_id__in=store_ids, is_available=True).order_by(
+        'store_id', 'price'
+    ).values_list('store_id', 'price')
+    for store_id, price in queryset.iterator(chunk_size=10000):
+        prices.setdefault(store_id, []).append(price)
+
+    medians = {}
+    for store_id, values in prices.items():
+        middle = len(values) // 2
+        if len(values) % 2:
+            medians[store_id] = values[middle]
+        else:
+            medians[store_id] = ((values[middle - 1] + values[middle]) / 2).quantize(Decimal('0.01'))
+    return medians
@@ -1,3 +1,36 @@
+from decimal import Decimal
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from products.models import Product
+from .models import Store, StoreStats
+from .stats import refresh_store_stats
 
-# Create your tests here.
+
+class StoreDirectoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='Магазин')
+        self.client = APIClient()
+
+    def directory(self):
+        response = self.client.get('/api/stores/')
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.data['results']}
+
+    def test_store_without_stats_has_zero_counts(self):
+        StoreStats.objects.filter(store=self.store).delete()
+        for row in (self.directory()[self.store.id], self.client.get(f'/api/stores/{self.store.id}/').data):
+            self.assertEqual(
+                (row['products_count'], row['in_stock_count'], row['min_price']), (0, 0, None)
+            )
+
+    def test_counts_come_from_stats(self):
+        Product.objects.create(store=self.store, name='Товар', price=Decimal('10.00'), stock_quantity=3)
+        Product.objects.create(store=self.store, name='Нет в наличии', price=Decimal('20.00'))
+        refresh_store_stats([self.store.id])
+        row = self.directory()[self.store.id]
+        self.assertEqual(
+            (row['products_count'], row['in_stock_count'], row['min_price']), (2, 1, '10.00')
+        )
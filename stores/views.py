@@ -1,3 +1,133 @@
-from django.shortcuts import render
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from rest_framework import viewsets, filters, permissions, status
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import Store
+from .serializers import StoreDirectorySerializer
+from products.catalogue import get_catalogue_version
+from orders.models import Order, OrderItem, ReplenishmentSuggestion
+from orders.serializers import ReplenishmentSuggestionSerializer, StoreOrderItemSerializer
 
-# Create your views here.
+
+class StoreInboxPagination(CursorPagination):
+    """Курсор по (created_at, id): страницы не сдвигаются при поступлении новых позиций"""
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class StoreViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet для справочника магазинов
+    
+    Сводка по каталогу читается из StoreStats (одна таблица через JOIN),
+    страницы списка кэшируются до следующего изменения каталога.
+    """
+    queryset = Store.objects.filter(is_active=True).select_related('stats')
+    serializer_class = StoreDirectorySerializer
+    permission_classes = []  # Справочник магазинов доступен без авторизации
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['name', 'address']
+    ordering_fields = [
+        'name', 'stats__products_count', 'stats__in_stock_count',
+        'stats__min_price', 'stats__median_price', 'stats__catalogue_updated_at',
+    ]
+    ordering = ['name']
+    
+    def get_queryset(self):
+        # Строка StoreStats появляется после первого пересчета сводки магазина
+        return super().get_queryset().annotate(
+            products_count=Coalesce('stats__products_count', 0),
+            in_stock_count=Coalesce('stats__in_stock_count', 0),
+        )
+    
+    def list(self, request, *args, **kwargs):
+        cache_key = 'stores:directory:{}:{}'.format(
+            get_catalogue_version(),
+            hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        )
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+        
+        response = super().list(request, *args, **kwargs)
+        cache.set(cache_key, response.data, settings.CATALOGUE_CACHE_TIMEOUT)
+        return response
+    
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='order-items',
+        permission_classes=[permissions.IsAuthenticated],
+        pagination_class=StoreInboxPagination,
+        filter_backends=[],
+    )
+    def order_items(self, request, pk=None):
+        """
+        Входящие позиции заказов магазина (для сотрудников магазина)
+        
+        Позиции хранят магазин и статус заказа, поэтому страница читается
+        по индексу (store, status, created_at) без JOIN с товарами магазина.
+        Фильтр: ?status=confirmed (по умолчанию)
+        """
+        store = self.get_object()
+        if not request.user.is_staff and not store.managers.filter(pk=request.user.pk).exists():
+            return Response(
+                {'error': 'Недостаточно прав'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        status_filter = request.query_params.get('status', 'confirmed')
+        # Позиции корзин (pending) магазину не показываются
+        allowed = [value for value, _ in Order.STATUS_CHOICES if value != 'pending']
+        if status_filter not in allowed:
+            return Response(
+                {'error': f'Неизвестный статус. Допустимые: {", ".join(allowed)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = OrderItem.objects.filter(store=store, status=status_filter).select_related(
+            'product'
+        ).only(
+            'id', 'order_id', 'product_id', 'product__name', 'product__sku',
+            'quantity', 'price', 'status', 'created_at'
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = StoreOrderItemSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        filter_backends=[],
+    )
+    def replenishment(self, request, pk=None):
+        """
+        Рекомендации по пополнению остатков товаров магазина (для сотрудников магазина)
+        
+        Прогноз спроса пересчитывается ежедневно (orders/forecasting.py).
+        По умолчанию - только товары, которые пора дозаказать, самые срочные
+        первыми; ?all=true - все товары магазина с продажами.
+        """
+        store = self.get_object()
+        if not request.user.is_staff and not store.managers.filter(pk=request.user.pk).exists():
+            return Response(
+                {'error': 'Недостаточно прав'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        queryset = ReplenishmentSuggestion.objects.filter(store=store).select_related('product')
+        if request.query_params.get('all', '').lower() not in ('true', '1'):
+            queryset = queryset.filter(suggested_quantity__gt=0)
+        queryset = queryset.order_by(F('days_of_cover').asc(nulls_last=True), 'product_id')
+        page = self.paginate_queryset(queryset)
+        serializer = ReplenishmentSuggestionSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)